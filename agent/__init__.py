@@ -23,11 +23,12 @@ except Exception:  # pragma: no cover - provide dummy fallback
 # Default configuration used when keys are missing from the YAML file.
 # ---------------------------------------------------------------------------
 DEFAULT_CFG: Dict[str, Any] = {
-    "window": {"title_substr": "Metin2"},
+    "window": {"title_substr": "Metin2", "stream": False, "stream_fps": 30},
     "paths": {
         "templates_dir": "assets/templates",
         "model": "runs/detect/train/weights/best.pt",
     },
+    "templates": {"preload": False, "workers": 0, "pyramid": 0, "hints": False},
     "controls": {
         "keys": {
             "forward": "w",
@@ -43,7 +44,31 @@ DEFAULT_CFG: Dict[str, Any] = {
     "detector": {
         "classes": ["metin", "boss", "potwory"],
         "conf_thr": 0.5,
+        "class_conf": {},
         "iou_thr": 0.45,
+        "max_age": 0.1,
+        "backend": "auto",
+        "async": False,
+        "max_fps": None,
+        "track": False,
+        "track_max_age": 1.0,
+        "roi_full_every": 0,
+        "roi_pad": 1.0,
+        "roi_min": 160,
+        "tiles": None,
+        "tile_overlap": 0.2,
+        "dynamic_resize": False,
+        "min_scale": 0.5,
+        "target_latency": None,
+        "gate_thr": None,
+        "gate_max_age": 2.0,
+        "prefilter": {
+            "enabled": False,
+            "hsv_ranges": [],
+            "diff_thr": 25,
+            "max_cover": 0.3,
+            "full_every": 15,
+        },
     },
     "policy": {"deadzone_x": 0.05, "desired_box_w": 0.12},
     "stuck": {"flow_window": 0.8, "min_flow_mag": 0.7, "rotate_ms_on_stuck": 250},
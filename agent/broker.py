@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, List, NamedTuple, Sequence
+
+import numpy as np
+
+from .targets import Detection
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from recorder.frame_source import FrameSource
+
+    from .detector import ObjectDetector
+
+logger = logging.getLogger(__name__)
+
+
+class Tick(NamedTuple):
+    """Wynik jednego taktu: klatka BGR, detekcje, czas i numer taktu."""
+
+    frame: np.ndarray
+    dets: List[Detection]
+    ts: float
+    seq: int
+
+
+class FrameBroker:
+    """Przechwytuje klatkę i uruchamia detektor raz na takt.
+
+    ``HuntDestroy.step`` wywołuje :meth:`tick`, a pozostali konsumenci
+    (np. ``CycleFarm``) czytają ten sam wynik przez :meth:`current` albo
+    subskrybują kolejne takty przez :meth:`subscribe`.  Dzięki temu w jednej
+    iteracji pętli jest tylko jedno przechwycenie i jedna inferencja.
+
+    ``Tick.frame`` jest buforem wielokrotnego użytku – kolejny takt go
+    nadpisuje, więc klatkę trzeba skopiować, jeśli ma przeżyć takt.
+
+    Parameters
+    ----------
+    source:
+        Źródło klatek (``WindowCapture``, ``ReplaySource``…).
+    detector:
+        Obiekt z metodą ``infer(frame_bgr)``.
+    max_age:
+        Jak długo (w sekundach) :meth:`current` może zwracać ostatni wynik
+        zamiast wykonać nowy takt.
+    roi_pad:
+        Margines wycinka wokół celu ustawionego przez :meth:`focus`, jako
+        ułamek większego boku ramki.
+    roi_min:
+        Minimalny bok wycinka w pikselach.
+    full_every:
+        Co ile taktów z aktywnym celem wykonać pełną detekcję całej klatki
+        (nowe cele poza wycinkiem); ``0`` wyłącza detekcję w wycinku.
+        Wycinek ma sens tylko dla detektora, który dobiera rozmiar wejścia
+        modelu do obrazu (``dynamic_input``) – przy stałym wejściu model
+        i tak liczy pełny rozmiar, więc detekcja w wycinku jest wyłączana.
+    """
+
+    def __init__(
+        self,
+        source: FrameSource,
+        detector: ObjectDetector,
+        max_age: float = 0.1,
+        roi_pad: float = 1.0,
+        roi_min: int = 160,
+        full_every: int = 0,
+    ):
+        self.source = source
+        self.detector = detector
+        self.max_age = max_age
+        self.roi_pad = roi_pad
+        self.roi_min = roi_min
+        self.full_every = full_every
+        self.roi: tuple[int, int, int, int] | None = None
+        self._focus: tuple[str, Sequence[float]] | None = None
+        self._since_full = 0
+        # ostatni wynik detektora i jego wersja w układzie okna
+        self._raw: List[Detection] | None = None
+        self._mapped: List[Detection] = []
+        if full_every and hasattr(detector, "submit"):
+            # wynik asynchroniczny nie wiadomo z którego wycinka pochodzi
+            logger.info("Detekcja w wycinku wyłączona dla detektora async")
+            self.full_every = 0
+        if self.full_every and not getattr(detector, "dynamic_input", True):
+            logger.info("Detekcja w wycinku wyłączona – stałe wejście modelu")
+            self.full_every = 0
+        self._buf = np.empty((0, 0, 3), dtype=np.uint8)
+        self._last: Tick | None = None
+        self._seq = 0
+        self._subs: list[Callable[[Tick], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def last(self) -> Tick | None:
+        """Ostatni wykonany takt (``None`` przed pierwszym)."""
+        return self._last
+
+    def tick(self) -> Tick:
+        """Przechwyć nową klatkę, uruchom detektor i powiadom subskrybentów."""
+        return self._tick()
+
+    def fresh(self, timeout: float = 1.0) -> Tick:
+        """Takt z detekcjami z właśnie przechwyconej klatki.
+
+        Do decyzji (czy po teleporcie lub zmianie kanału jest cel).
+        Detektor asynchroniczny (z metodą ``detect``) jest odpytywany
+        z czekaniem na wynik tej klatki – najwyżej ``timeout`` s, potem
+        takt ma pustą listę detekcji.  Dla zwykłego detektora to :meth:`tick`.
+        """
+        return self._tick(timeout)
+
+    def invalidate(self) -> None:
+        """Scena się zmieniła: zapomnij ostatni takt, cel i wyniki detektora.
+
+        Wywołuje też ``detector.invalidate`` (``ObjectDetector``: limit
+        ``max_fps`` i bramka zmian; ``AsyncDetector``: wyniki w locie).
+        """
+        with self._lock:
+            self._last = None
+            self._raw = None
+            self._mapped = []
+            self._focus = None
+            self.roi = None
+        invalidate = getattr(self.detector, "invalidate", None)
+        if invalidate is not None:
+            invalidate()
+
+    def _tick(self, timeout: float | None = None) -> Tick:
+        detect = getattr(self.detector, "detect", None)
+        with self._lock:
+            frame = self._buf = self.source.grab_bgr(self._buf)
+            if timeout is not None and detect is not None:
+                # tryb async – zawsze pełna klatka (``full_every`` = 0)
+                dets = self._raw = self._mapped = detect(frame, timeout)
+            else:
+                dets = self._detect(frame)
+            self._seq += 1
+            t = Tick(frame, dets, time.time(), self._seq)
+            self._last = t
+        for cb in list(self._subs):
+            cb(t)
+        return t
+
+    def focus(self, det: Detection | None) -> None:
+        """Ustaw cel, wokół którego kolejne takty wykrywają w wycinku.
+
+        ``None`` (brak celu) przywraca detekcję pełnej klatki.
+        """
+        if det is None:
+            self._focus = None
+        else:
+            self._focus = (det.get("name", ""), det["bbox"])
+
+    def _roi_for(self, bbox: Sequence[float], W: int, H: int):
+        x1, y1, x2, y2 = bbox
+        side = max(x2 - x1, y2 - y1)
+        pad = side * self.roi_pad
+        w = min(W, max(self.roi_min, int(x2 - x1 + 2 * pad)))
+        h = min(H, max(self.roi_min, int(y2 - y1 + 2 * pad)))
+        cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+        x = int(min(max(0, cx - w / 2), W - w))
+        y = int(min(max(0, cy - h / 2), H - h))
+        return x, y, w, h
+
+    def _infer(
+        self, img: np.ndarray, x: int = 0, y: int = 0, force: bool = False
+    ) -> tuple[List[Detection], bool]:
+        """Detekcja na ``img`` z ramkami przesuniętymi o ``(x, y)`` do okna.
+
+        Zwraca detekcje i ``True``, gdy pochodzą z nowego przebiegu modelu.
+        ``force`` pomija limit ``max_fps`` detektora.
+        """
+        raw = (
+            self.detector.infer(img, force=True) if force else self.detector.infer(img)
+        )
+        if raw is self._raw:
+            # detektor z limitem ``max_fps`` oddał poprzedni wynik – jest już
+            # w układzie okna (i zachowuje tożsamość listy dla trackera)
+            return self._mapped, False
+        self._raw = raw
+        if x == 0 and y == 0:
+            self._mapped = raw
+        else:
+            self._mapped = [Detection.from_dict(d).shifted(x, y) for d in raw]
+        return self._mapped, True
+
+    def _full(self, frame: np.ndarray, force: bool = False) -> List[Detection]:
+        dets, new = self._infer(frame, force=force)
+        if new:
+            # licznik od ostatniej rzeczywistej pełnej detekcji, nie od
+            # wyniku z pamięci detektora
+            self._since_full = 0
+        return dets
+
+    def _detect(self, frame: np.ndarray) -> List[Detection]:
+        self.roi = None
+        if not self.full_every or self._focus is None:
+            return self._infer(frame)[0]
+        if self._since_full >= self.full_every:
+            return self._full(frame)
+        name, bbox = self._focus
+        H, W = frame.shape[:2]
+        x, y, w, h = self._roi_for(bbox, W, H)
+        dets, _ = self._infer(frame[y : y + h, x : x + w], x, y)
+        if not any(d.get("name", "") == name for d in dets):
+            # cel zgubiony w wycinku – od razu pełna klatka, z pominięciem
+            # limitu ``max_fps`` (inaczej wróciłby wynik z wycinka)
+            logger.debug("Cel %s poza wycinkiem, pełna detekcja", name)
+            return self._full(frame, force=True)
+        self._since_full += 1
+        self.roi = (x, y, w, h)
+        return dets
+
+    def current(self, max_age: float | None = None) -> Tick:
+        """Zwróć ostatni takt, jeśli jest młodszy niż ``max_age``; inaczej nowy."""
+        age = self.max_age if max_age is None else max_age
+        last = self._last
+        if last is not None and time.time() - last.ts <= age:
+            return last
+        return self.tick()
+
+    def subscribe(self, cb: Callable[[Tick], None]) -> Callable[[], None]:
+        """Wywołuj ``cb(tick)`` po każdym takcie; zwraca funkcję wypisującą."""
+        self._subs.append(cb)
+
+        def _unsubscribe() -> None:
+            try:
+                self._subs.remove(cb)
+            except ValueError:
+                pass
+
+        return _unsubscribe
@@ -3,16 +3,17 @@ from __future__ import annotations
 import os
 import time
 from dataclasses import dataclass
-from typing import Callable, Optional, Tuple
+from typing import TYPE_CHECKING, Callable, Optional, Tuple
 
 import numpy as np
 import pyautogui
 
-from recorder.window_capture import WindowCapture
-
 from .template_matcher import TemplateMatcher
 from .wasd import KeyHold
 
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from recorder.frame_source import FrameSource
+
 
 @dataclass
 class TemplateMatch:
@@ -44,12 +45,15 @@ class ChannelSwitcher:
 
     def __init__(
         self,
-        win: WindowCapture,
+        win: FrameSource,
         templates_dir: str,
         dry: bool = False,
         *,
         keys: KeyHold | None = None,
         hotkeys: dict[int, str] | None = None,
+        preload: bool = False,
+        workers: int = 0,
+        hints: bool = False,
     ):
         self.win = win
         if not os.path.isdir(templates_dir):
@@ -62,7 +66,9 @@ class ChannelSwitcher:
             raise FileNotFoundError(
                 f"Brak plików w {templates_dir}: {', '.join(missing)}"
             )
-        self.tm = TemplateMatcher(templates_dir)
+        self.tm = TemplateMatcher(
+            templates_dir, preload=preload, workers=workers, hints=hints
+        )
         self.dry = dry
         self.keys = keys
         self.hotkeys = hotkeys or {i: str(i) for i in range(1, 9)}
@@ -88,10 +94,9 @@ class ChannelSwitcher:
     # ------------------------------------------------------------------
     # Frame helpers
     def _frame(self) -> np.ndarray:
-        """Return the current game frame as an RGB numpy array."""
+        """Return the current game frame as a (non-contiguous) BGR view."""
 
-        fr = self.win.grab()
-        return np.array(fr)[:, :, :3].copy()
+        return self.win.grab_bgr()
 
     def _minimap_roi(self) -> Tuple[int, int, int, int]:
         """Region of interest containing the minimap in the top‑right corner."""
@@ -103,13 +108,16 @@ class ChannelSwitcher:
     # Low level helpers
     def find_button(
         self,
-        frame: np.ndarray,
+        frame: Optional[np.ndarray],
         ch: int,
         thresh: float = 0.82,
         roi: Optional[Tuple[int, int, int, int]] = None,
     ) -> TemplateMatch | None:
         """Find channel button ``ch`` within ``frame``.
 
+        When ``frame`` is ``None`` only ``roi`` is captured from the window
+        (see :meth:`WindowCapture.grab_roi`) instead of the whole frame.
+
         Returns
         -------
         TemplateMatch | None
@@ -119,8 +127,32 @@ class ChannelSwitcher:
 
         if roi is None:
             roi = self._minimap_roi()
+        if frame is None:
+            return self._match(self.win.grab_roi(roi), ch, thresh, origin=roi[:2])
+        return self._match(frame, ch, thresh, roi=roi)
+
+    def _match(
+        self,
+        frame: np.ndarray,
+        ch: int,
+        thresh: float,
+        roi: Optional[Tuple[int, int, int, int]] = None,
+        origin: Tuple[int, int] = (0, 0),
+    ) -> TemplateMatch | None:
         name = f"ch{ch}"
-        res = self.tm.find(frame, name, thresh=thresh, roi=roi, multi_scale=True)
+        res = self.tm.find(
+            frame,
+            name,
+            thresh=thresh,
+            roi=roi,
+            multi_scale=True,
+            origin=origin,
+            window_region=self.win.region,
+        )
+        return self._to_match(res)
+
+    @staticmethod
+    def _to_match(res) -> TemplateMatch | None:
         if not res:
             return None
         if isinstance(res, TemplateMatch):
@@ -134,11 +166,18 @@ class ChannelSwitcher:
     def color_at(
         self, x: int, y: int, frame: Optional[np.ndarray] = None
     ) -> Tuple[int, int, int]:
-        """Return RGB colour at coordinates relative to the minimap ROI."""
+        """Return RGB colour at coordinates relative to the minimap ROI.
 
+        ``frame`` is a full window frame; when omitted only the minimap ROI is
+        captured.
+        """
+
+        roi = self._minimap_roi()
         if frame is None:
-            frame = self._frame()
-        rx, ry, _, _ = self._minimap_roi()
+            frame = self.win.grab_roi(roi)
+            rx = ry = 0
+        else:
+            rx, ry, _, _ = roi
         px = rx + int(x)
         py = ry + int(y)
         r, g, b = frame[py, px]
@@ -172,8 +211,7 @@ class ChannelSwitcher:
 
         roi = self._minimap_roi()
         for _ in range(tries):
-            frame = self._frame()
-            m = self.find_button(frame, ch, thresh=thresh, roi=roi)
+            m = self.find_button(None, ch, thresh=thresh, roi=roi)
             if m:
                 L, T, _, _ = self.win.region
                 cx, cy = m.center
@@ -204,14 +242,24 @@ class ChannelSwitcher:
     def current_channel_guess(self, thresh: float = 0.82) -> Optional[int]:
         """Guess currently selected channel by looking for gold buttons."""
 
-        frame = self._frame()
         roi = self._minimap_roi()
+        crop = self.win.grab_roi(roi)
+        rx, ry = roi[:2]
+        # wszystkie przyciski w jednym przebiegu po wycinku minimapy
+        hits = self.tm.find_many(
+            crop,
+            [f"ch{ch}" for ch in range(1, 9)],
+            thresh=thresh,
+            multi_scale=True,
+            origin=(rx, ry),
+            window_region=self.win.region,
+        )
         for ch in range(1, 9):
-            m = self.find_button(frame, ch, thresh=thresh, roi=roi)
+            m = self._to_match(hits.get(f"ch{ch}"))
             if m:
                 cx, cy = m.center
-                color = self.color_at(cx, cy, frame)
-                if self.is_gold(color):
+                r, g, b = crop[cy - ry, cx - rx]
+                if self.is_gold((int(r), int(g), int(b))):
                     return ch
         return None
 
@@ -2,17 +2,17 @@ from __future__ import annotations
 
 import logging
 import time
-
-import numpy as np
+from typing import TYPE_CHECKING
 
 from agent import get_config
 from agent.channel import ChannelSwitcher
-from agent.detector import ObjectDetector
 from agent.hunt_destroy import HuntDestroy
 from agent.scanner import AreaScanner
 from agent.teleport import Teleporter
 from agent.wasd import KeyHold
-from recorder.window_capture import WindowCapture
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from recorder.frame_source import FrameSource
 
 logger = logging.getLogger(__name__)
 
@@ -23,14 +23,23 @@ class CycleFarm:
     Na każdym slocie: teleport -> poluj (z autoskanem 'E').
     Brak celu -> krótki skan E; nadal brak -> kolejny slot.
     Ma cooldown slotów (minuty) by nie wracać od razu.
+
+    ``source`` pozwala podać dowolne źródło klatek (``FrameSource``), np.
+    ``ReplaySource`` do pomiarów offline; domyślnie przechwytywane jest okno gry.
     """
 
-    def __init__(self, cfg: dict | None = None):
+    def __init__(self, cfg: dict | None = None, source: FrameSource | None = None):
         cfg = cfg or get_config()
         self.cfg = cfg
-        self.win = WindowCapture(cfg["window"]["title_substr"])
-        if not self.win.locate(timeout=5):
-            raise RuntimeError("Nie znaleziono okna – sprawdź title_substr")
+        if source is None:
+            from recorder.window_capture import WindowCapture
+
+            source = WindowCapture(cfg["window"]["title_substr"])
+            if not source.locate(timeout=5):
+                raise RuntimeError("Nie znaleziono okna – sprawdź title_substr")
+            # przechwytywanie w tle – grab() zwraca najnowszą klatkę z bufora
+            source.apply_stream_cfg(cfg.get("window"))
+        self.win = source
 
         self.dry = cfg.get("dry_run", False)
         tdir = cfg["paths"]["templates_dir"]
@@ -44,9 +53,14 @@ class CycleFarm:
             dry=self.dry,
             keys=self.keys,
             hotkeys=cfg.get("channel", {}).get("hotkeys"),
+            preload=cfg.get("templates", {}).get("preload", False),
+            workers=cfg.get("templates", {}).get("workers", 0),
+            hints=cfg.get("templates", {}).get("hints", False),
         )
         self.agent = HuntDestroy(cfg, self.win)
-        self.det = ObjectDetector(cfg["paths"]["model"], cfg["detector"]["classes"])
+        # klatka i detekcje z bieżącego taktu agenta – bez drugiego modelu
+        self.broker = self.agent.broker
+        self.det = self.agent.det
         self._stop = False
 
         ch_cfg = cfg.get("channel", {})
@@ -90,17 +104,27 @@ class CycleFarm:
             self.keys.stop()
         except Exception:
             pass
+        if hasattr(self.det, "stop"):
+            self.det.stop()
         try:
             self.win.close()
         except Exception:
             pass
 
     # ---- detekcje ----
-    def _any_target_seen(self) -> bool:
-        fr = self.win.grab()
-        frame = np.array(fr)[:, :, :3].copy()
-        dets = self.det.infer(frame)
-        return bool(dets)
+    def _any_target_seen(self, fresh: bool = False) -> bool:
+        """Czy widać cel; ``fresh`` – tylko detekcje z nowej klatki.
+
+        Po teleporcie lub zmianie kanału ostatni wynik (zwłaszcza detektora
+        async) może pochodzić z poprzedniej mapy, więc decyzje podejmowane
+        zaraz po zmianie sceny używają ``fresh=True``.
+        """
+        if fresh:
+            return bool(self.broker.fresh().dets)
+        return bool(self.broker.current().dets)
+
+    def _fresh_target_seen(self) -> bool:
+        return self._any_target_seen(fresh=True)
 
     # ---- główna pętla cyklu ----
     def run(self, page_label, ch_from, ch_to, slots, per_spot_sec, clear_sec):
@@ -131,6 +155,7 @@ class CycleFarm:
                 self.ch.switch(ch, post_wait=self.ch_settle)
             except Exception:
                 logger.warning("Nie udało się zmienić kanału na %s", ch)
+            self.agent.invalidate()
 
             for slot in slots:
                 if self._stop:
@@ -160,14 +185,16 @@ class CycleFarm:
                     # jeśli teleportacja się nie udała, pomijamy slot
                     self.cooldown[key] = now
                     continue
+                # detekcje sprzed teleportu dotyczą innej mapy
+                self.agent.invalidate()
 
                 # ewentualne skanowanie po teleportacji
-                if self.scanner and not self._any_target_seen():
+                if self.scanner and not self._fresh_target_seen():
                     logger.debug("Brak celu po teleportacji – skanuję otoczenie")
                     self.scanner.scan()
 
                 # jeżeli nadal brak celu, od razu kolejny slot
-                if not self._any_target_seen() or self._stop:
+                if not self._fresh_target_seen() or self._stop:
                     logger.info("Brak celu na slocie %s kanału %s", slot, ch)
                     self.cooldown[key] = time.time()
                     continue
@@ -184,14 +211,15 @@ class CycleFarm:
                         # spróbuj przeskanować otoczenie
                         if self.scanner:
                             self.scanner.scan()
-                        if not self._any_target_seen():
+                        if not self._fresh_target_seen():
+                            self.agent.invalidate()
                             self.ch.cycle_until_target_seen(
-                                check_fn=self._any_target_seen,
+                                check_fn=self._fresh_target_seen,
                                 settle=self.ch_settle,
                                 timeout_per_ch=self.ch_check,
                                 max_rounds=1,
                             )
-                        if not self._any_target_seen():
+                        if not self._fresh_target_seen():
                             logger.debug("Pole czyste – przechodzę dalej")
                             break
                         last_seen = time.time()
@@ -1,15 +1,533 @@
 from __future__ import annotations
 
+import ast
+import logging
+import os
+import threading
 import time
-from typing import Dict, List
+from typing import Dict, List, NamedTuple
 
 import cv2
 import numpy as np
-from ultralytics import YOLO
+
+from .targets import Detection
+
+logger = logging.getLogger(__name__)
 
 # ogranicz wątki OpenCV na Windows (stabilniej na CPU)
 cv2.setNumThreads(1)
 
+# ``ultralytics.YOLO`` – importowane leniwie, bo pociąga za sobą cały torch,
+# a backend ONNX go nie potrzebuje.
+YOLO = None
+
+BACKENDS = ("ultralytics", "onnx")
+
+# tablica strukturalna z detekcjami jednej klatki (``infer(..., as_array=True)``)
+DET_DTYPE = np.dtype(
+    [("bbox", np.float64, (4,)), ("conf", np.float64), ("cls", np.int64)]
+)
+
+
+def _load_yolo(model_path: str):
+    global YOLO
+    if YOLO is None:
+        from ultralytics import YOLO as _YOLO
+
+        YOLO = _YOLO
+    return YOLO(model_path)
+
+
+def _to_numpy(t) -> np.ndarray:
+    """Tensor torch (lub tablica) → numpy, jedną konwersją na całą klatkę."""
+    if hasattr(t, "cpu"):
+        t = t.cpu()
+    if hasattr(t, "numpy"):
+        t = t.numpy()
+    return np.asarray(t)
+
+
+def resolve_backend(backend: str, model_path: str) -> str:
+    """Zamień ``"auto"`` na nazwę backendu na podstawie rozszerzenia wag."""
+    if backend == "auto":
+        return "onnx" if str(model_path).lower().endswith(".onnx") else "ultralytics"
+    if backend not in BACKENDS:
+        raise ValueError(f"Nieznany backend detektora: {backend!r}")
+    return backend
+
+
+def nms(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    iou_thr: float,
+    classes: np.ndarray | None = None,
+    max_det: int = 300,
+) -> np.ndarray:
+    """Zachłanne NMS na tablicach numpy; zwraca indeksy zachowanych ramek.
+
+    Z ``classes`` ramki różnych klas nie tłumią się nawzajem (przesunięcie
+    współrzędnych o numer klasy, jak w Ultralytics).
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+    b = boxes.astype(np.float32, copy=False)
+    if classes is not None:
+        b = b + (classes.astype(np.float32) * (float(b.max()) + 1.0))[:, None]
+    x1, y1, x2, y2 = b[:, 0], b[:, 1], b[:, 2], b[:, 3]
+    areas = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    order = scores.argsort()[::-1]
+    keep: List[int] = []
+    while order.size and len(keep) < max_det:
+        i = order[0]
+        keep.append(int(i))
+        rest = order[1:]
+        w = (np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest])).clip(0)
+        h = (np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest])).clip(0)
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_thr]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def tile_grid(
+    shape: tuple[int, int], grid: tuple[int, int], overlap: float = 0.2
+) -> List[tuple[int, int, int, int]]:
+    """Podział obrazu ``(h, w)`` na ``grid = (wiersze, kolumny)`` kafli.
+
+    Sąsiednie kafle zachodzą na siebie o ``overlap`` swojego rozmiaru, aby
+    obiekt na granicy był w całości widoczny w co najmniej jednym kaflu.
+    Zwraca listę ``(x, y, w, h)``; wszystkie kafle mają ten sam rozmiar.
+    """
+    h, w = shape[:2]
+    rows, cols = (max(1, int(v)) for v in grid)
+    overlap = min(max(0.0, overlap), 0.9)
+
+    def _axis(size: int, n: int) -> tuple[int, List[int]]:
+        tile = min(size, int(np.ceil(size / (n - (n - 1) * overlap))))
+        if n == 1:
+            return tile, [0]
+        step = (size - tile) / (n - 1)
+        return tile, [int(round(i * step)) for i in range(n)]
+
+    th, ys = _axis(h, rows)
+    tw, xs = _axis(w, cols)
+    return [(x, y, tw, th) for y in ys for x in xs]
+
+
+def letterbox(
+    img: np.ndarray, new_shape: tuple[int, int], color: int = 114
+) -> tuple[np.ndarray, float, tuple[float, float]]:
+    """Przeskaluj z zachowaniem proporcji i dopełnij do ``new_shape`` (h, w).
+
+    Zwraca obraz, współczynnik skali i przesunięcie (dw, dh) – tak samo jak
+    ``LetterBox`` w Ultralytics, więc wyniki ONNX pokrywają się z ``predict``.
+    """
+    h, w = img.shape[:2]
+    nh, nw = new_shape
+    r = min(nh / h, nw / w)
+    rw, rh = int(round(w * r)), int(round(h * r))
+    dw, dh = (nw - rw) / 2, (nh - rh) / 2
+    if (rw, rh) != (w, h):
+        img = cv2.resize(img, (rw, rh), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    img = cv2.copyMakeBorder(
+        img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(color,) * 3
+    )
+    return img, r, (left, top)
+
+
+class OnnxResult(NamedTuple):
+    """Wynik :class:`OnnxYOLO` dla jednej klatki (współrzędne w pikselach)."""
+
+    names: Dict[int, str]
+    xyxy: np.ndarray
+    conf: np.ndarray
+    cls: np.ndarray
+
+
+class OnnxYOLO:
+    """Model YOLOv8 wyeksportowany do ONNX, uruchamiany przez onnxruntime.
+
+    Preprocessing (letterbox, BGR→RGB, /255) i NMS są liczone tutaj, więc
+    nie jest potrzebny ani torch, ani ultralytics. Nazwy klas i rozmiar
+    wejścia są czytane z metadanych zapisanych przez ``YOLO.export``.
+    """
+
+    def __init__(self, model_path: str, device=None, threads: int | None = None):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        if threads:
+            opts.intra_op_num_threads = int(threads)
+        providers = ["CPUExecutionProvider"]
+        if str(device or "cpu") != "cpu" and (
+            "CUDAExecutionProvider" in ort.get_available_providers()
+        ):
+            providers.insert(0, "CUDAExecutionProvider")
+        self.session = ort.InferenceSession(
+            str(model_path), sess_options=opts, providers=providers
+        )
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        self.batch_dynamic = not isinstance(inp.shape[0], int)
+        self.input_dtype = np.float16 if "float16" in inp.type else np.float32
+        meta = self.session.get_modelmeta().custom_metadata_map or {}
+        self.names = self._parse_names(meta.get("names"))
+        h, w = inp.shape[2:4]
+        # eksport z ``dynamic=True`` – rozmiar wejścia wybierany per obraz
+        self.dynamic_shape = not isinstance(h, int) or not isinstance(w, int)
+        if self.dynamic_shape:
+            imgsz = ast.literal_eval(meta.get("imgsz", "[640, 640]"))
+            h, w = (imgsz, imgsz) if isinstance(imgsz, int) else imgsz
+        self.imgsz = (int(h), int(w))
+        self.stride = int(meta.get("stride", 32))
+
+    @staticmethod
+    def _parse_names(raw) -> Dict[int, str]:
+        if not raw:
+            return {}
+        names = ast.literal_eval(raw) if isinstance(raw, str) else raw
+        if isinstance(names, (list, tuple)):
+            names = dict(enumerate(names))
+        return {int(k): str(v) for k, v in names.items()}
+
+    def input_shape(
+        self, shape: tuple[int, int], imgsz: int | None = None
+    ) -> tuple[int, int]:
+        """Rozmiar wejścia ``(h, w)`` modelu dla obrazu o kształcie ``shape``.
+
+        Model o stałym wejściu zawsze dostaje :attr:`imgsz`.  Przy wejściu
+        dynamicznym dłuższy bok obrazu jest skalowany do ``imgsz``, a oba
+        boki zaokrąglane w górę do wielokrotności ``stride`` (minimalne
+        dopełnienie, jak ``LetterBox(auto=True)`` w Ultralytics).
+        """
+        if not self.dynamic_shape or not imgsz:
+            return self.imgsz
+        h, w = shape[:2]
+        r = imgsz / max(h, w)
+        st = self.stride
+        return (
+            max(st, int(np.ceil(h * r / st)) * st),
+            max(st, int(np.ceil(w * r / st)) * st),
+        )
+
+    def preprocess(self, frame_bgr: np.ndarray, imgsz: int | None = None):
+        img, r, pad = letterbox(frame_bgr, self.input_shape(frame_bgr.shape, imgsz))
+        blob = img[:, :, ::-1].transpose(2, 0, 1)[None].astype(self.input_dtype)
+        blob /= 255.0
+        return blob, r, pad
+
+    def postprocess(
+        self,
+        pred: np.ndarray,
+        r: float,
+        pad: tuple[float, float],
+        shape: tuple[int, int],
+        conf: float | np.ndarray,
+        iou: float,
+        classes: np.ndarray | None = None,
+    ) -> OnnxResult:
+        """Wyjście modelu → ramki w układzie klatki.
+
+        ``conf`` może być tablicą progów indeksowaną numerem klasy, a
+        ``classes`` listą dozwolonych klas – oba filtry działają przed NMS.
+        """
+        pred = np.asarray(pred, dtype=np.float32)
+        if classes is not None and not len(classes):
+            empty = np.empty((0, 4))
+            return OnnxResult(self.names, empty, np.empty(0), np.empty(0, np.int64))
+        if pred.shape[-1] == 6 and pred.shape[0] != 6:
+            # eksport z ``nms=True``: wiersze [x1, y1, x2, y2, conf, cls]
+            boxes, scores, cls = pred[:, :4], pred[:, 4], pred[:, 5].astype(int)
+            keep = self._keep(scores, cls, conf, classes)
+            boxes, scores, cls = boxes[keep], scores[keep], cls[keep]
+        else:
+            p = pred.T  # (N, 4 + nc)
+            cls_scores = p[:, 4:]
+            if classes is not None:
+                # najlepsza klasa spośród dozwolonych
+                cls_scores = cls_scores[:, classes]
+                cls = np.asarray(classes)[cls_scores.argmax(1)]
+                scores = cls_scores.max(1)
+            else:
+                cls = cls_scores.argmax(1)
+                scores = cls_scores[np.arange(len(p)), cls]
+            keep = self._keep(scores, cls, conf, None)
+            p, cls, scores = p[keep], cls[keep], scores[keep]
+            cx, cy, bw, bh = p[:, 0], p[:, 1], p[:, 2], p[:, 3]
+            boxes = np.stack(
+                [cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2], axis=1
+            )
+            idx = nms(boxes, scores, iou, cls)
+            boxes, scores, cls = boxes[idx], scores[idx], cls[idx]
+        boxes = (boxes - np.array([pad[0], pad[1], pad[0], pad[1]])) / r
+        h, w = shape
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, w)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, h)
+        return OnnxResult(self.names, boxes, scores, cls.astype(np.int64))
+
+    @staticmethod
+    def _keep(scores, cls, conf, classes) -> np.ndarray:
+        if isinstance(conf, np.ndarray):
+            keep = scores >= conf[np.minimum(cls, len(conf) - 1)]
+        else:
+            keep = scores >= conf
+        if classes is not None:
+            keep &= np.isin(cls, classes)
+        return keep
+
+    def predict(
+        self,
+        source,
+        conf: float | np.ndarray = 0.25,
+        iou: float = 0.7,
+        classes=None,
+        imgsz: int | None = None,
+        **_,
+    ):
+        """Zgodne z ``YOLO.predict`` co do argumentów; zwraca ``[OnnxResult]``.
+
+        ``source`` może być listą klatek – są wtedy sklejane w jeden batch,
+        o ile model ma dynamiczny wymiar batcha (eksport z ``--dynamic``)
+        i wszystkie klatki dają ten sam rozmiar wejścia; w przeciwnym razie
+        klatki idą kolejno.  ``imgsz`` działa tylko dla modelu o dynamicznym
+        rozmiarze wejścia (zob. :meth:`input_shape`).
+        """
+        frames = source if isinstance(source, (list, tuple)) else [source]
+        preps = [self.preprocess(f, imgsz) for f in frames]
+        same = len({p[0].shape for p in preps}) == 1
+        if len(frames) > 1 and self.batch_dynamic and same:
+            blob = np.concatenate([p[0] for p in preps])
+            preds = self.session.run(None, {self.input_name: blob})[0]
+        else:
+            preds = [
+                self.session.run(None, {self.input_name: p[0]})[0][0] for p in preps
+            ]
+        if classes is not None:
+            classes = np.asarray(classes, dtype=np.int64)
+        return [
+            self.postprocess(pred, r, pad, f.shape[:2], conf, iou, classes)
+            for pred, (_, r, pad), f in zip(preds, preps, frames)
+        ]
+
+
+class SharedModel:
+    """Współdzielony uchwyt do załadowanego modelu YOLO.
+
+    Jedna instancja na (ścieżka wag, urządzenie, backend) w procesie; wywołania
+    ``predict`` są serializowane blokadą, bo model nie jest bezpieczny
+    wątkowo.
+    """
+
+    def __init__(self, model, key: tuple):
+        self.model = model
+        self.key = key
+        self.lock = threading.Lock()
+
+    def predict(self, **kwargs):
+        with self.lock:
+            return self.model.predict(**kwargs)
+
+
+_MODELS: Dict[tuple, SharedModel] = {}
+_MODELS_LOCK = threading.Lock()
+
+
+def _model_key(
+    model_path: str, device=None, backend: str = "ultralytics", threads=None
+) -> tuple:
+    key = (os.path.abspath(str(model_path)), str(device), backend)
+    return key + (int(threads),) if threads else key
+
+
+def _load_model(
+    model_path: str, device=None, backend: str = "ultralytics", threads=None
+):
+    if backend == "onnx":
+        return OnnxYOLO(model_path, device, threads)
+    # torch ustawia liczbę wątków globalnie dla procesu – zob. torch.set_num_threads
+    return _load_yolo(model_path)
+
+
+def load_shared_model(
+    model_path: str, device=None, backend: str = "ultralytics", threads=None
+) -> SharedModel:
+    """Zwróć współdzielony model dla ``model_path``/``device`` (ładuje raz)."""
+    key = _model_key(model_path, device, backend, threads)
+    with _MODELS_LOCK:
+        shared = _MODELS.get(key)
+        if shared is None:
+            model = _load_model(model_path, device, backend, threads)
+            shared = SharedModel(model, key)
+            _MODELS[key] = shared
+        return shared
+
+
+def loaded_models() -> List[tuple]:
+    """Klucze modeli aktualnie trzymanych w rejestrze."""
+    with _MODELS_LOCK:
+        return list(_MODELS)
+
+
+def clear_model_cache() -> None:
+    """Usuń wszystkie modele z rejestru (kolejne detektory załadują je od nowa)."""
+    with _MODELS_LOCK:
+        _MODELS.clear()
+
+
+class ResolutionController:
+    """Regulator skali wejścia detektora dla zadanego budżetu czasu inferencji.
+
+    Czas inferencji jest wygładzany średnią wykładniczą (``alpha``), a skala
+    zmienia się dopiero, gdy średnia wyjdzie poza pas ``target ± hysteresis``
+    i od ostatniej zmiany minęło ``patience`` pomiarów. Krok jest
+    proporcjonalny: koszt modelu rośnie z liczbą pikseli, więc nowa skala to
+    ``scale * sqrt(target / ema)`` (ograniczona do ``max_step`` na raz).
+    Skala dotyczy rozmiaru wejścia modelu (``imgsz``), nie klatki – ma
+    sens tylko dla modelu o dynamicznym wejściu.  Rozmiar jest zaokrąglany
+    do wielokrotności ``stride``, więc model widzi niewiele różnych kształtów.
+
+    Parameters
+    ----------
+    target:
+        Budżet czasu jednej inferencji w sekundach.
+    min_scale, max_scale:
+        Zakres skali względem rozmiaru klatki.
+    alpha:
+        Waga nowego pomiaru w średniej wykładniczej.
+    hysteresis:
+        Względna szerokość martwej strefy wokół ``target``.
+    patience:
+        Minimalna liczba pomiarów między zmianami skali.
+    stride:
+        Krok wyrównania rozmiaru wejścia (stride modelu YOLO).
+    """
+
+    def __init__(
+        self,
+        target: float = 0.1,
+        min_scale: float = 0.5,
+        max_scale: float = 1.0,
+        alpha: float = 0.2,
+        hysteresis: float = 0.2,
+        patience: int = 5,
+        stride: int = 32,
+        max_step: float = 0.25,
+    ):
+        self.target = target
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.alpha = alpha
+        self.hysteresis = hysteresis
+        self.patience = patience
+        self.stride = stride
+        self.max_step = max_step
+        self.scale = max_scale
+        self.ema: float | None = None
+        self.last: float | None = None
+        self.samples = 0
+        self.changes = 0
+        self._since_change = 0
+
+    @property
+    def stats(self) -> Dict[str, float | int | None]:
+        """Bieżąca skala i statystyki czasu inferencji."""
+        return {
+            "scale": self.scale,
+            "target": self.target,
+            "latency": self.last,
+            "latency_ema": self.ema,
+            "samples": self.samples,
+            "changes": self.changes,
+        }
+
+    def update(self, latency: float) -> float:
+        """Dodaj pomiar czasu inferencji i zwróć (ew. nową) skalę."""
+        self.last = latency
+        a = self.alpha
+        self.ema = latency if self.ema is None else a * latency + (1 - a) * self.ema
+        self.samples += 1
+        self._since_change += 1
+        if self._since_change < self.patience:
+            return self.scale
+        ratio = self.ema / self.target
+        if abs(ratio - 1.0) <= self.hysteresis:
+            return self.scale
+        factor = min(max(ratio**-0.5, 1.0 - self.max_step), 1.0 + self.max_step)
+        new = min(max(self.scale * factor, self.min_scale), self.max_scale)
+        if new != self.scale:
+            # przewidywany czas dla nowej skali, zanim spłyną nowe pomiary
+            self.ema *= (new / self.scale) ** 2
+            self.scale = new
+            self.changes += 1
+            self._since_change = 0
+        return self.scale
+
+    def input_size(self, size: int) -> int:
+        """Bok wejścia modelu dla pełnego rozmiaru ``size``, wyrównany do ``stride``."""
+        if self.scale >= 1.0:
+            return size
+        st = self.stride
+        return min(size, max(st, int(round(size * self.scale / st)) * st))
+
+    def reset(self) -> None:
+        self.scale = self.max_scale
+        self.ema = self.last = None
+        self.samples = self.changes = self._since_change = 0
+
+
+class FrameGate:
+    """Bramka zmian obrazu: czy klatka różni się od ostatnio wykrywanej.
+
+    Klatka jest zmniejszana do miniatury ``size`` w skali szarości; gdy
+    średnia bezwzględna różnica z miniaturą ostatniej klatki, na której
+    uruchomiono model, jest poniżej ``threshold`` (jednostki jasności 0–255),
+    a wynik nie jest starszy niż ``max_age`` sekund, detekcję można pominąć.
+    Porównanie zawsze z klatką odniesienia, więc powolne zmiany się sumują.
+    """
+
+    def __init__(self, threshold: float = 2.0, max_age: float = 2.0, size=(32, 18)):
+        self.threshold = threshold
+        self.max_age = max_age
+        self.size = tuple(size)
+        self.hits = 0
+        self.misses = 0
+        self._ref: np.ndarray | None = None
+        self._ref_shape: tuple | None = None
+        self._ref_ts = 0.0
+        self._cand: np.ndarray | None = None
+
+    def _thumb(self, frame_bgr: np.ndarray) -> np.ndarray:
+        small = cv2.resize(frame_bgr, self.size, interpolation=cv2.INTER_AREA)
+        return small.mean(axis=2, dtype=np.float32)
+
+    def unchanged(self, frame_bgr: np.ndarray, now: float) -> bool:
+        """Czy scena jest praktycznie ta sama co przy ostatniej detekcji."""
+        self._cand = thumb = self._thumb(frame_bgr)
+        same = (
+            self._ref is not None
+            and self._ref_shape == frame_bgr.shape
+            and now - self._ref_ts <= self.max_age
+            and float(np.abs(thumb - self._ref).mean()) < self.threshold
+        )
+        if same:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return same
+
+    def accept(self, frame_bgr: np.ndarray, now: float) -> None:
+        """Zapamiętaj klatkę, na której właśnie uruchomiono model."""
+        self._ref = self._cand if self._cand is not None else self._thumb(frame_bgr)
+        self._ref_shape = frame_bgr.shape
+        self._ref_ts = now
+        self._cand = None
+
+    def reset(self) -> None:
+        self._ref = self._cand = None
+        self._ref_shape = None
+
 
 class ObjectDetector:
     """Lekka nakładka na Ultralytics YOLO do detekcji na klatce BGR (numpy array).
@@ -17,6 +535,46 @@ class ObjectDetector:
     Dodatkowo umożliwia ograniczenie częstotliwości detekcji oraz
     dynamiczne skalowanie rozdzielczości wejściowej w celu redukcji
     obciążenia CPU/GPU.
+
+    Wagi są ładowane przez :func:`load_shared_model`, więc kilka detektorów
+    na tym samym modelu i urządzeniu (agent, cykl, podgląd GUI) dzieli jedną
+    kopię. Progi, klasy i throttling pozostają osobne dla każdego detektora.
+    ``shared=False`` wymusza prywatną kopię modelu.
+
+    ``backend`` wybiera silnik: ``"ultralytics"`` (``YOLO.predict``),
+    ``"onnx"`` (:class:`OnnxYOLO`, onnxruntime na CPU) lub ``"auto"`` –
+    według rozszerzenia pliku wag. ``threads`` ogranicza liczbę wątków
+    sesji onnxruntime.
+
+    Nazwy z ``classes`` są zamieniane na numery klas modelu przy ładowaniu
+    i przekazywane do ``predict(classes=...)``, więc NMS nie liczy ramek
+    odrzucanych klas. ``class_conf`` ustawia progi pewności per klasa (np.
+    niższy dla ``boss``); pozostałe klasy używają ``conf``.
+
+    ``tiles=(wiersze, kolumny)`` włącza tryb kafelkowy: klatka jest dzielona
+    na zachodzące na siebie (``tile_overlap``) kafle w pełnej rozdzielczości,
+    przepuszczane przez model w jednej paczce i scalane globalnym NMS.
+    Pomaga przy małych, odległych celach; ``dynamic_resize`` jest wtedy
+    pomijane. Obrazy o dłuższym boku poniżej ``tile_min`` (np. wycinki
+    wokół celu) nie są dzielone.
+
+    ``dynamic_resize`` zmniejsza wejście modelu (``imgsz`` przekazywane do
+    ``predict``), gdy wygładzony czas inferencji przekracza
+    ``target_latency`` (domyślnie ``1 / max_fps`` lub 0.1 s) – zob.
+    :class:`ResolutionController`; stan w :attr:`scale` i
+    :attr:`latency_stats`.  Model o stałym wejściu liczy zawsze ten sam
+    rozmiar, więc regulator jest wtedy wyłączany.
+
+    ``gate_thr`` włącza :class:`FrameGate`: na klatce wizualnie
+    niezmienionej od ostatniej detekcji (np. postać czeka na respawn)
+    zwracany jest poprzedni wynik, nie starszy niż ``gate_max_age`` s.
+
+    Rozmiar wejścia modelu jest dobierany do obrazu: wycinek mniejszy niż
+    ``imgsz`` (domyślnie z metadanych ONNX albo 640) idzie do modelu
+    w swoim rozmiarze wyrównanym do 32 px, zamiast być powiększany do
+    pełnego wejścia.  Wymaga backendu z dynamicznym wejściem
+    (:attr:`dynamic_input`: Ultralytics lub ONNX z eksportu
+    ``dynamic=True``); model o stałym wejściu zawsze liczy pełne ``imgsz``.
     """
 
     def __init__(
@@ -29,76 +587,437 @@ class ObjectDetector:
         max_fps: float | None = None,
         dynamic_resize: bool = False,
         min_scale: float = 0.5,
+        shared: bool = True,
+        backend: str = "auto",
+        tiles: tuple[int, int] | None = None,
+        tile_overlap: float = 0.2,
+        tile_min: int = 640,
+        target_latency: float | None = None,
+        gate_thr: float | None = None,
+        gate_max_age: float = 2.0,
+        threads: int | None = None,
+        class_conf: Dict[str, float] | None = None,
+        imgsz: int | None = None,
     ):
         self.model_path = model_path
-        self.model = YOLO(model_path)
+        self.backend = resolve_backend(backend, model_path)
+        if shared:
+            self._shared = load_shared_model(model_path, device, self.backend, threads)
+        else:
+            self._shared = SharedModel(
+                _load_model(model_path, device, self.backend, threads),
+                _model_key(model_path, device, self.backend, threads),
+            )
+        self.model = self._shared.model
+        # rozmiar wejścia modelu – stały albo dobierany do obrazu
+        self.stride = 32
+        if self.backend == "onnx":
+            self.dynamic_input = bool(getattr(self.model, "dynamic_shape", False))
+            self.stride = getattr(self.model, "stride", self.stride)
+            model_imgsz = getattr(self.model, "imgsz", None)
+        else:
+            self.dynamic_input, model_imgsz = True, None
+        self.imgsz = int(imgsz or (max(model_imgsz) if model_imgsz else 640))
         self.classes = classes
         self.conf = conf
+        self.class_conf = dict(class_conf or {})
         self.iou = iou
         self.device = device
         # limit detekcji do ``max_fps`` razy na sekundę
         self.max_fps = max_fps
         self._last_infer_time = 0.0
-        self._last_result: List[Dict] = []
+        self._last_result: List[Detection] | None = []
         # dynamiczne skalowanie rozdzielczości
+        if dynamic_resize and not self.dynamic_input:
+            logger.warning(
+                "dynamic_resize wyłączone: %s ma stały rozmiar wejścia", model_path
+            )
+            dynamic_resize = False
         self.dynamic_resize = dynamic_resize
         self.min_scale = min_scale
-        self.scale = 1.0
+        if target_latency is None:
+            target_latency = 1.0 / max_fps if max_fps else 0.1
+        self.resolution = ResolutionController(
+            target_latency, min_scale, stride=self.stride
+        )
+        # pomijanie detekcji na niezmienionych klatkach
+        self.gate = FrameGate(gate_thr, gate_max_age) if gate_thr else None
+        # tryb kafelkowy
+        self.tiles = tuple(tiles) if tiles else None
+        self.tile_overlap = tile_overlap
+        self.tile_min = tile_min
+        # mapa id → nazwa z ostatniego wyniku modelu
+        self.names: Dict[int, str] = {}
+        self._last_array = np.empty(0, dtype=DET_DTYPE)
+        self._class_ids_key: tuple | None = None
+        self._class_ids = np.empty(0, dtype=np.int64)
+        self._conf_key: tuple | None = None
+        self._conf_by_id = np.empty(0, dtype=np.float64)
+        # filtr klas i progi w wywołaniu modelu – gdy nazwy klas są znane
+        # już po załadowaniu wag
+        self._model_filter = False
+        names = getattr(self.model, "names", None)
+        if isinstance(names, (list, tuple)):
+            names = dict(enumerate(names))
+        if isinstance(names, dict) and names:
+            self.names = {int(k): str(v) for k, v in names.items()}
+            if self.classes:
+                self._allowed_ids(self.names)
+            self._model_filter = True
+
+    @property
+    def scale(self) -> float:
+        """Bieżąca skala wejścia (1.0 bez ``dynamic_resize``)."""
+        return self.resolution.scale if self.dynamic_resize else 1.0
+
+    @scale.setter
+    def scale(self, value: float) -> None:
+        self.resolution.scale = value
+
+    @property
+    def latency_stats(self) -> Dict[str, float | int | None]:
+        """Statystyki regulatora rozdzielczości (skala, czasy inferencji)."""
+        return self.resolution.stats
 
-    def infer(self, frame_bgr: np.ndarray) -> List[Dict]:
+    def infer(self, frame_bgr: np.ndarray, as_array: bool = False, force: bool = False):
+        """Detekcje na klatce BGR.
+
+        Domyślnie lista :class:`~agent.targets.Detection`; z
+        ``as_array=True`` tablica strukturalna :data:`DET_DTYPE` (nazwy klas
+        w :attr:`names`), bez budowania obiektów Pythona dla każdej ramki.
+        ``force=True`` pomija limit ``max_fps`` i bramkę zmian – model
+        zawsze liczy tę klatkę (np. pełna detekcja po zgubieniu celu).
+        """
         now = time.time()
-        if self.max_fps:
+        if self.max_fps and not force:
             min_interval = 1.0 / self.max_fps
             if now - self._last_infer_time < min_interval:
-                return self._last_result
+                return self._last_array if as_array else self._last_detections()
+        if self.gate is not None:
+            if not force and self.gate.unchanged(frame_bgr, now):
+                return self._last_array if as_array else self._last_detections()
+            self.gate.accept(frame_bgr, now)
         self._last_infer_time = now
 
-        frame_in = frame_bgr
-        if self.dynamic_resize and self.scale < 1.0:
-            h, w = frame_bgr.shape[:2]
-            new_w = max(1, int(w * self.scale))
-            new_h = max(1, int(h * self.scale))
-            frame_in = cv2.resize(frame_bgr, (new_w, new_h))
+        if self._use_tiles(frame_bgr):
+            arr = self._infer_tiled(frame_bgr)
+            self._set_last(arr)
+            return arr if as_array else self._last_detections()
 
         start = time.time()
-        res = self.model.predict(
-            source=frame_in,
+        res = self._predict(frame_bgr, self._input_size(frame_bgr))[0]
+        infer_time = time.time() - start
+
+        arr = self._to_array(res)
+        self._set_last(arr)
+        self._adapt_scale(infer_time)
+        return arr if as_array else self._last_detections()
+
+    def infer_batch(self, frames: List[np.ndarray], as_array: bool = False) -> list:
+        """Detekcja na kilku klatkach w jednym przebiegu modelu.
+
+        Zwraca listę detekcji dla każdej klatki (w tej samej kolejności).
+        Filtr ``classes`` i skalowanie ``dynamic_resize`` działają jak w
+        :meth:`infer`; limit ``max_fps`` i tryb kafelkowy nie są stosowane,
+        a zapamiętany wynik :meth:`infer` pozostaje bez zmian.  Klatki
+        o tym samym rozmiarze wejścia modelu idą jedną paczką – wycinki
+        różnej wielkości nie są powiększane do największego.
+        """
+        if not frames:
+            return []
+        sizes = [self._input_size(f) for f in frames]
+        results: list = [None] * len(frames)
+        start = time.time()
+        for size in dict.fromkeys(sizes):
+            idx = [i for i, s in enumerate(sizes) if s == size]
+            out = self._predict([frames[i] for i in idx], size)
+            for i, res in zip(idx, out):
+                results[i] = res
+        infer_time = time.time() - start
+        # bez ``_set_last``/``_last_infer_time`` – paczka to zwykle wycinki,
+        # a wynik ``infer`` (limit ``max_fps``, bramka) dotyczy pełnej klatki
+        arrays = [self._to_array(res) for res in results]
+        self._adapt_scale(infer_time / len(frames))
+        if as_array:
+            return arrays
+        return [self.to_detections(a) for a in arrays]
+
+    def invalidate(self) -> None:
+        """Scena się zmieniła (teleport, kanał): zapomnij ostatni wynik.
+
+        Kolejne :meth:`infer` zawsze uruchamia model – bez limitu
+        ``max_fps`` liczonego od poprzedniej detekcji i bez bramki zmian.
+        """
+        self._last_infer_time = 0.0
+        self._set_last(np.empty(0, dtype=DET_DTYPE))
+        if self.gate is not None:
+            self.gate.reset()
+
+    def to_dicts(self, arr: np.ndarray) -> List[Dict]:
+        """Zamień tablicę :data:`DET_DTYPE` na listę słowników (np. do JSON)."""
+        names = self.names
+        return [
+            {"name": names.get(k, str(k)), "bbox": b, "conf": c}
+            for b, c, k in zip(
+                arr["bbox"].tolist(), arr["conf"].tolist(), arr["cls"].tolist()
+            )
+        ]
+
+    def to_detections(self, arr: np.ndarray) -> List[Detection]:
+        """Zamień tablicę :data:`DET_DTYPE` na listę :class:`Detection`."""
+        names = self.names
+        return [
+            Detection(names.get(k, str(k)), b, c, k)
+            for b, c, k in zip(
+                arr["bbox"].tolist(), arr["conf"].tolist(), arr["cls"].tolist()
+            )
+        ]
+
+    def _set_last(self, arr: np.ndarray) -> None:
+        self._last_array = arr
+        self._last_result = None
+
+    def _last_detections(self) -> List[Detection]:
+        if self._last_result is None:
+            self._last_result = self.to_detections(self._last_array)
+        return self._last_result
+
+    def _use_tiles(self, frame_bgr: np.ndarray) -> bool:
+        return self.tiles is not None and max(frame_bgr.shape[:2]) >= self.tile_min
+
+    def _infer_tiled(self, frame_bgr: np.ndarray) -> np.ndarray:
+        """Detekcja kafelkowa: jedna paczka kafli, ramki w układzie klatki."""
+        grid = tile_grid(frame_bgr.shape, self.tiles, self.tile_overlap)
+        crops = [frame_bgr[y : y + h, x : x + w] for x, y, w, h in grid]
+        results = self._predict(crops, self._input_size(crops[0], scaled=False))
+        parts = []
+        for (x, y, _, _), res in zip(grid, results):
+            arr = self._to_array(res)
+            arr["bbox"] += (x, y, x, y)
+            parts.append(arr)
+        arr = np.concatenate(parts) if parts else np.empty(0, dtype=DET_DTYPE)
+        if len(parts) > 1 and len(arr):
+            keep = nms(arr["bbox"], arr["conf"], self.iou, classes=arr["cls"])
+            arr = arr[keep]
+        return arr
+
+    def _input_size(self, img: np.ndarray, scaled: bool = True) -> int | None:
+        """Dłuższy bok wejścia modelu dla ``img`` (``None`` – stałe wejście).
+
+        Z ``dynamic_resize`` (i ``scaled``) pomniejszony według
+        :attr:`resolution`.
+        """
+        if not self.dynamic_input:
+            return None
+        st = self.stride
+        side = int(np.ceil(max(img.shape[:2]) / st)) * st
+        side = max(st, min(self.imgsz, side))
+        if scaled and self.dynamic_resize:
+            side = self.resolution.input_size(side)
+        return side
+
+    def _predict(self, source, imgsz: int | None = None):
+        kwargs = {}
+        if imgsz:
+            kwargs["imgsz"] = imgsz
+        conf = self.conf
+        if self._model_filter:
+            if self.classes:
+                kwargs["classes"] = self._class_ids.tolist()
+            if self.class_conf:
+                thr = self._conf_thresholds(self.names)
+                if self.backend == "onnx":
+                    conf = thr
+                else:
+                    # Ultralytics ma jeden próg – reszta w ``_to_array``
+                    conf = float(thr.min()) if len(thr) else self.conf
+        return self._shared.predict(
+            source=source,
             verbose=False,
-            conf=self.conf,
+            conf=conf,
             iou=self.iou,
             device=self.device,
-        )[0]
-        infer_time = time.time() - start
+            **kwargs,
+        )
 
-        out: List[Dict] = []
-        names = res.names
-        for box in res.boxes:
-            cls_id = int(box.cls)
-            name = names.get(cls_id, str(cls_id))
-            if self.classes and name not in self.classes:
-                continue
-            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().tolist()
-            if self.dynamic_resize and self.scale < 1.0:
-                # przeskaluj współrzędne do rozmiaru oryginalnego
-                x1 /= self.scale
-                y1 /= self.scale
-                x2 /= self.scale
-                y2 /= self.scale
-            out.append(
-                {
-                    "name": name,
-                    "bbox": [x1, y1, x2, y2],
-                    "conf": float(box.conf.cpu().numpy()),
-                }
-            )
+    def _to_array(self, res) -> np.ndarray:
+        """Wynik modelu → tablica :data:`DET_DTYPE` po filtrze klas."""
+        if self.backend == "onnx":
+            xyxy, conf, cls = res.xyxy, res.conf, res.cls
+        else:
+            boxes = res.boxes
+            xyxy = _to_numpy(boxes.xyxy)
+            conf = _to_numpy(boxes.conf)
+            cls = _to_numpy(boxes.cls)
+        self.names = res.names
+        xyxy = np.asarray(xyxy, dtype=np.float64).reshape(-1, 4)
+        conf = np.asarray(conf, dtype=np.float64).reshape(-1)
+        cls = np.asarray(cls).reshape(-1).astype(np.int64)
+        if self.classes and not self._model_filter:
+            keep = np.isin(cls, self._allowed_ids(res.names))
+            xyxy, conf, cls = xyxy[keep], conf[keep], cls[keep]
+        if self.class_conf and not (self._model_filter and self.backend == "onnx"):
+            thr = self._conf_thresholds(res.names)
+            keep = conf >= thr[np.minimum(cls, len(thr) - 1)]
+            xyxy, conf, cls = xyxy[keep], conf[keep], cls[keep]
+        arr = np.empty(len(cls), dtype=DET_DTYPE)
+        arr["bbox"] = xyxy
+        arr["conf"] = conf
+        arr["cls"] = cls
+        return arr
 
-        self._last_result = out
+    def _allowed_ids(self, names: Dict[int, str]) -> np.ndarray:
+        key = (id(names), tuple(self.classes))
+        if key != self._class_ids_key:
+            wanted = set(self.classes)
+            ids = [k for k, v in names.items() if v in wanted]
+            self._class_ids = np.asarray(ids, dtype=np.int64)
+            self._class_ids_key = key
+        return self._class_ids
 
+    def _conf_thresholds(self, names: Dict[int, str]) -> np.ndarray:
+        """Progi pewności indeksowane numerem klasy (``class_conf`` lub ``conf``)."""
+        key = (id(names), tuple(sorted(self.class_conf.items())), self.conf)
+        if key != self._conf_key:
+            n = max(names, default=-1) + 1
+            thr = np.full(max(n, 1), self.conf, dtype=np.float32)
+            for k, v in names.items():
+                if v in self.class_conf:
+                    thr[k] = self.class_conf[v]
+            self._conf_by_id = thr
+            self._conf_key = key
+        return self._conf_by_id
+
+    def _adapt_scale(self, infer_time: float) -> None:
         if self.dynamic_resize:
-            target = 1.0 / self.max_fps if self.max_fps else 0.1
-            if infer_time > target and self.scale > self.min_scale:
-                self.scale = max(self.min_scale, self.scale * 0.8)
-            elif infer_time < target * 0.5 and self.scale < 1.0:
-                self.scale = min(1.0, self.scale / 0.8)
+            self.resolution.update(infer_time)
+
+
+class DetectionResult(NamedTuple):
+    """Ostatni ukończony wynik :class:`AsyncDetector`."""
+
+    dets: List[Detection]
+    seq: int  # numer klatki, z której pochodzą detekcje (0 – brak wyniku)
+    frame_ts: float  # czas przekazania tej klatki do ``submit``
+    done_ts: float  # czas zakończenia inferencji
 
-        return out
+    @property
+    def age(self) -> float:
+        """Wiek detekcji liczony od momentu przechwycenia klatki (sekundy)."""
+        return time.time() - self.frame_ts if self.seq else float("inf")
+
+
+class AsyncDetector:
+    """Uruchamia ``detector.infer`` w osobnym wątku.
+
+    ``submit`` kopiuje klatkę do bufora wejściowego i wraca od razu; wątek
+    zawsze bierze najnowszą oczekującą klatkę (starsze są pomijane).
+    ``latest`` zwraca ostatni ukończony wynik z numerem klatki i jego wiekiem,
+    więc sterowanie może działać w tempie przechwytywania, a detekcja
+    we własnym tempie.  :meth:`infer` jest zamiennikiem
+    ``ObjectDetector.infer`` (np. dla ``FrameBroker``) zwracającym ostatni
+    gotowy wynik.  Decyzje po zmianie sceny (teleport, zmiana kanału)
+    powinny używać :meth:`detect`, które czeka na wynik z przekazanej
+    klatki; :meth:`invalidate` odrzuca wyniki z klatek sprzed wywołania.
+    """
+
+    def __init__(self, detector: ObjectDetector):
+        self.detector = detector
+        self._cond = threading.Condition()
+        self._in_buf = np.empty((0, 0, 3), dtype=np.uint8)
+        self._work_buf = np.empty((0, 0, 3), dtype=np.uint8)
+        self._pending: tuple[int, float] | None = None
+        self._seq = 0
+        self._result = DetectionResult([], 0, 0.0, 0.0)
+        # wyniki z klatek o numerze <= ``_barrier`` są nieaktualne
+        self._barrier = 0
+        self._empty: List[Detection] = []
+        self._stop = False
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "AsyncDetector":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop = False
+            self._thread = threading.Thread(
+                target=self._run, name="AsyncDetector", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 1.0) -> None:
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, frame_bgr: np.ndarray, ts: float | None = None) -> int:
+        """Przekaż klatkę do detekcji; zwraca jej numer sekwencyjny."""
+        if self._thread is None:
+            self.start()
+        with self._cond:
+            if self._in_buf.shape != frame_bgr.shape:
+                self._in_buf = np.empty(frame_bgr.shape, dtype=np.uint8)
+            np.copyto(self._in_buf, frame_bgr)
+            self._seq += 1
+            self._pending = (self._seq, time.time() if ts is None else ts)
+            self._cond.notify_all()
+            return self._seq
+
+    def latest(self) -> DetectionResult:
+        return self._result
+
+    def wait_for(self, seq: int, timeout: float | None = None) -> DetectionResult:
+        """Czekaj na wynik z klatki ``seq`` lub nowszej (do ``timeout`` s)."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._result.seq >= seq, timeout)
+            return self._result
+
+    def infer(self, frame_bgr: np.ndarray) -> List[Detection]:
+        """Wyślij klatkę i zwróć ostatnie gotowe detekcje (bez czekania).
+
+        Wynik może pochodzić z dowolnie starej klatki – poza wynikami
+        unieważnionymi przez :meth:`invalidate` (wtedy pusta lista).
+        """
+        self.submit(frame_bgr)
+        res = self._result
+        return res.dets if res.seq > self._barrier else self._empty
+
+    def detect(
+        self, frame_bgr: np.ndarray, timeout: float | None = 1.0
+    ) -> List[Detection]:
+        """Wyślij klatkę i poczekaj na detekcje z niej (lub nowszej klatki).
+
+        Gdy wynik nie nadejdzie w ``timeout`` s, zwraca pustą listę zamiast
+        starszych detekcji.
+        """
+        seq = self.submit(frame_bgr)
+        res = self.wait_for(seq, timeout)
+        return res.dets if res.seq >= seq else self._empty
+
+    def invalidate(self) -> None:
+        """Odrzuć wyniki z klatek przekazanych do tej pory (zmiana sceny)."""
+        with self._cond:
+            self._barrier = self._seq
+        invalidate = getattr(self.detector, "invalidate", None)
+        if invalidate is not None:
+            invalidate()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stop or self._pending is not None)
+                if self._stop:
+                    return
+                seq, ts = self._pending
+                self._pending = None
+                self._in_buf, self._work_buf = self._work_buf, self._in_buf
+            try:
+                dets = self.detector.infer(self._work_buf)
+            except Exception:
+                logger.exception("Błąd detekcji w wątku AsyncDetector")
+                continue
+            with self._cond:
+                self._result = DetectionResult(dets, seq, ts, time.time())
+                self._cond.notify_all()
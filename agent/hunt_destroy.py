@@ -1,35 +1,91 @@
 from __future__ import annotations
 
 import logging
-
-import numpy as np
+from typing import TYPE_CHECKING
 
 from . import get_config
 from .avoid import CollisionAvoid
+from .broker import FrameBroker
 from .channel import ChannelSwitcher
-from .detector import ObjectDetector
+from .detector import AsyncDetector, ObjectDetector
 from .interaction import click_bbox_center
 from .movement import MovementController
+from .prefilter import CascadeDetector, MotionColorPrefilter
 from .scanner import AreaScanner
 from .search import SearchManager
-from .targets import pick_target
+from .targets import Detection, pick_target
 from .teleport import Teleporter
+from .tracker import Tracker
 from .wasd import KeyHold
 
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from recorder.frame_source import FrameSource
+
 logger = logging.getLogger(__name__)
 
 
 class HuntDestroy:
-    def __init__(self, cfg=None, window_capture=None):
+    """Pętla polowania: detekcja, wybór celu, ruch i atak.
+
+    ``window_capture`` może być dowolnym :class:`recorder.frame_source.FrameSource`
+    – oknem gry albo np. :class:`recorder.frame_source.ReplaySource`.
+    """
+
+    def __init__(
+        self,
+        cfg=None,
+        window_capture: FrameSource | None = None,
+        broker: FrameBroker | None = None,
+    ):
         cfg = cfg or get_config()
         self.cfg = cfg
         self.win = window_capture
+        dcfg = cfg["detector"]
         self.det = ObjectDetector(
             cfg["paths"]["model"],
-            cfg["detector"]["classes"],
-            cfg["detector"].get("conf_thr", 0.5),
-            cfg["detector"].get("iou_thr", 0.45),
+            dcfg["classes"],
+            dcfg.get("conf_thr", 0.5),
+            dcfg.get("iou_thr", 0.45),
+            backend=dcfg.get("backend", "auto"),
+            max_fps=dcfg.get("max_fps"),
+            tiles=dcfg.get("tiles"),
+            tile_overlap=dcfg.get("tile_overlap", 0.2),
+            dynamic_resize=dcfg.get("dynamic_resize", False),
+            min_scale=dcfg.get("min_scale", 0.5),
+            target_latency=dcfg.get("target_latency"),
+            gate_thr=dcfg.get("gate_thr"),
+            gate_max_age=dcfg.get("gate_max_age", 2.0),
+            class_conf=dcfg.get("class_conf"),
+        )
+        pf_cfg = dcfg.get("prefilter") or {}
+        if pf_cfg.get("enabled", False):
+            # tani filtr ruchu/koloru decyduje, czy (i gdzie) uruchomić YOLO
+            self.det = CascadeDetector(
+                self.det,
+                MotionColorPrefilter(
+                    pf_cfg.get("hsv_ranges"),
+                    diff_thr=pf_cfg.get("diff_thr", 25),
+                    max_cover=pf_cfg.get("max_cover", 0.3),
+                ),
+                full_every=pf_cfg.get("full_every", 15),
+            )
+        if dcfg.get("async", False):
+            # detekcja we własnym wątku; step() steruje na ostatnim wyniku
+            self.det = AsyncDetector(self.det).start()
+        # jeden takt = jedno przechwycenie + jedna inferencja (wspólne z CycleFarm)
+        self.broker = broker or FrameBroker(
+            self.win,
+            self.det,
+            dcfg.get("max_age", 0.1),
+            roi_pad=dcfg.get("roi_pad", 1.0),
+            roi_min=dcfg.get("roi_min", 160),
+            full_every=dcfg.get("roi_full_every", 0),
         )
+        # tracker przewiduje ramki, gdy detektor zwraca wynik z poprzedniego
+        # przebiegu (limit ``max_fps`` lub tryb async)
+        self.tracker: Tracker | None = None
+        if cfg["detector"].get("track", False):
+            self.tracker = Tracker(max_age=cfg["detector"].get("track_max_age", 1.0))
         self.avoid = CollisionAvoid()
         dry = cfg.get("dry_run", False)
         self.keys = KeyHold(dry=dry, active_fn=getattr(self.win, "is_foreground", None))
@@ -37,7 +93,14 @@ class HuntDestroy:
         self.teleporter = Teleporter(self.win, tdir, use_ocr=True, dry=dry, cfg=cfg)
         ch_hotkeys = cfg.get("channel", {}).get("hotkeys")
         self.channel_switcher = ChannelSwitcher(
-            self.win, tdir, dry=dry, keys=self.keys, hotkeys=ch_hotkeys
+            self.win,
+            tdir,
+            dry=dry,
+            keys=self.keys,
+            hotkeys=ch_hotkeys,
+            preload=cfg.get("templates", {}).get("preload", False),
+            workers=cfg.get("templates", {}).get("workers", 0),
+            hints=cfg.get("templates", {}).get("hints", False),
         )
         self.desired_w = float(cfg.get("policy", {}).get("desired_box_w", 0.12))
         self.deadzone = float(cfg.get("policy", {}).get("deadzone_x", 0.05))
@@ -73,14 +136,27 @@ class HuntDestroy:
         self.movement = MovementController(
             self.keys, self.desired_w, self.deadzone, enabled=move_enabled
         )
-        self._last_tgt = None
+        self._last_tgt: Detection | None = None
         self._prev_names: set[str] = set()
 
+    def invalidate(self) -> None:
+        """Scena się zmieniła (teleport, kanał): zapomnij detekcje i ślady.
+
+        Unieważnia takt brokera (i wynik detektora) oraz czyści tracker,
+        żeby ``pick_target`` nie wybrał ekstrapolowanego śladu z poprzedniej
+        mapy.
+        """
+        self.broker.invalidate()
+        if self.tracker is not None:
+            self.tracker.reset()
+        self._last_tgt = None
+        self._prev_names = set()
+
     def step(self):
-        fr = self.win.grab()
-        frame = np.array(fr)[:, :, :3].copy()
+        frame, dets, _, _ = self.broker.tick()
+        if self.tracker is not None:
+            dets = self.tracker.step(dets)
         H, W = frame.shape[:2]
-        dets = self.det.infer(frame)
         logger.debug("Wykryto %s obiektów", len(dets))
         cur_names = {d["name"] for d in dets}
         disappeared = self._prev_names - cur_names
@@ -90,13 +166,16 @@ class HuntDestroy:
 
         steer = self.avoid.steer(frame)
         tgt = pick_target(dets, (W, H), priority_order=self.priority)
+        # kolejne takty wykrywają w wycinku wokół wybranego celu
+        self.broker.focus(tgt)
         if tgt is None and self._last_tgt is not None:
             logger.debug("Cel %s zniknął", self._last_tgt.get("name", "?"))
         if tgt is None:
             logger.debug("Brak celu w zasięgu")
             if self.scanner:
                 self.scanner.scan()
-                self.search.handle_no_target(True)
+                if self.search.handle_no_target(True):
+                    self.invalidate()
                 self._last_tgt = None
                 return
             self._last_tgt = None
@@ -106,7 +185,7 @@ class HuntDestroy:
 
         bw = None
         if tgt:
-            x1, y1, x2, y2 = tgt["bbox"]
+            x1, y1, x2, y2 = tgt.bbox
             bw = (x2 - x1) / W
 
         if tgt and bw is not None and bw >= self.desired_w * 0.9:
@@ -115,7 +194,7 @@ class HuntDestroy:
             if hasattr(self.keys, "dry") and self.keys.dry:
                 return
             logger.debug("Atakuję cel")
-            click_bbox_center(tgt["bbox"], (left, top, w, h), win=self.win)
+            click_bbox_center(tgt.bbox, (left, top, w, h), win=self.win)
         else:
             self.movement.move(tgt, steer, (W, H))
         self._last_tgt = tgt
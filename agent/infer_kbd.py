@@ -3,7 +3,6 @@ from __future__ import annotations
 import time
 
 import cv2
-import numpy as np
 import torch
 import torchvision.models as models
 
@@ -16,6 +15,7 @@ from .wasd import KeyHold
 
 class KbdVisionAgent:
     def __init__(self, cfg):
+        self.cfg = cfg
         self.win = WindowCapture(cfg["window"]["title_substr"])
         self.keys = KeyHold()
         self.period = 1 / 15
@@ -34,10 +34,10 @@ class KbdVisionAgent:
         try:
             if not self.win.locate(timeout=5):
                 raise RuntimeError("Nie znaleziono okna – sprawdź title_substr")
+            self.win.apply_stream_cfg(self.cfg.get("window"))
             while True:
                 t0 = time.time()
-                fr = self.win.grab()
-                frame = np.array(fr)[:, :, :3]
+                frame = self.win.grab_bgr()
                 gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
                 stuck = self.flow.update(gray)
                 img = cv2.resize(frame, (224, 224))[:, :, ::-1]
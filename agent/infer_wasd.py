@@ -53,6 +53,7 @@ class WasdVisionAgent:
         try:
             if not self.win.locate(timeout=5):
                 raise RuntimeError("Nie znaleziono okna – sprawdź title_substr")
+            self.win.apply_stream_cfg(self.cfg.get("window"))
             self.hd = HuntDestroy(self.cfg, self.win)
             while True:
                 self.hd.step()
@@ -1,9 +1,13 @@
 from __future__ import annotations
 
 import logging
+from typing import TYPE_CHECKING
 
 from .wasd import KeyHold
 
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from .targets import Detection
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,14 +23,18 @@ class MovementController:
         self.enabled = enabled
 
     def move(
-        self, tgt: dict | None, steer: str | None, frame_size: tuple[int, int]
+        self,
+        tgt: Detection | dict | None,
+        steer: str | None,
+        frame_size: tuple[int, int],
     ):
         """Update pressed keys to move towards the target and avoid obstacles.
 
         Parameters
         ----------
-        tgt: dict or None
-            Target detection dictionary with ``bbox``.
+        tgt: Detection or None
+            Target chosen by :func:`agent.targets.pick_target` (plain
+            detection dictionaries with ``bbox`` work as well).
         steer: str or None
             Direction suggested by the obstacle avoidance system (``"left"`` or
             ``"right"``).
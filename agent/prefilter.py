@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import logging
+from typing import Dict, List, Sequence
+
+import cv2
+import numpy as np
+
+from .targets import Detection
+
+logger = logging.getLogger(__name__)
+
+Region = tuple[int, int, int, int]
+
+
+def merge_regions(regions: Sequence[Region]) -> List[Region]:
+    """Połącz nachodzące na siebie prostokąty ``(x, y, w, h)`` w jeden."""
+    boxes = [[x, y, x + w, y + h] for x, y, w, h in regions]
+    merged = True
+    while merged and len(boxes) > 1:
+        merged = False
+        out: List[List[int]] = []
+        for b in boxes:
+            for m in out:
+                if b[0] < m[2] and m[0] < b[2] and b[1] < m[3] and m[1] < b[3]:
+                    m[0], m[1] = min(m[0], b[0]), min(m[1], b[1])
+                    m[2], m[3] = max(m[2], b[2]), max(m[3], b[3])
+                    merged = True
+                    break
+            else:
+                out.append(list(b))
+        boxes = out
+    return [(x1, y1, x2 - x1, y2 - y1) for x1, y1, x2, y2 in boxes]
+
+
+def _bounding(regions: Sequence[Region]) -> Region:
+    x1 = min(x for x, _, _, _ in regions)
+    y1 = min(y for _, y, _, _ in regions)
+    x2 = max(x + w for x, _, w, _ in regions)
+    y2 = max(y + h for _, y, _, h in regions)
+    return x1, y1, x2 - x1, y2 - y1
+
+
+class MotionColorPrefilter:
+    """Tani filtr wstępny: różnica klatek i plamy koloru w HSV.
+
+    Działa na pomniejszonej klatce (szerokość ``width``) i zwraca obszary,
+    które mogą zawierać cel, ``[]`` gdy nic się nie zmieniło i żaden kolor
+    nie pasuje, albo ``None`` gdy sygnał jest niewiarygodny (pierwsza
+    klatka, ruch kamery – maska pokrywa więcej niż ``max_cover`` obrazu).
+
+    Parameters
+    ----------
+    hsv_ranges:
+        Lista par ``(dolny, górny)`` progów HSV (skala OpenCV) kolorów
+        charakterystycznych dla celów; pusta – tylko ruch.
+    diff_thr:
+        Minimalna zmiana jasności piksela uznawana za ruch.
+    min_area:
+        Minimalny obszar plamy jako ułamek klatki.
+    max_cover:
+        Powyżej tego ułamka zajętej klatki filtr nie rozstrzyga.
+    """
+
+    def __init__(
+        self,
+        hsv_ranges: Sequence[tuple[Sequence[int], Sequence[int]]] | None = None,
+        diff_thr: int = 25,
+        min_area: float = 0.0005,
+        max_cover: float = 0.3,
+        width: int = 160,
+    ):
+        self.hsv_ranges = [
+            (np.array(lo, dtype=np.uint8), np.array(hi, dtype=np.uint8))
+            for lo, hi in (hsv_ranges or [])
+        ]
+        self.diff_thr = diff_thr
+        self.min_area = min_area
+        self.max_cover = max_cover
+        self.width = width
+        self._prev: np.ndarray | None = None
+        self._kernel = np.ones((3, 3), dtype=np.uint8)
+
+    def reset(self) -> None:
+        self._prev = None
+
+    def regions(self, frame_bgr: np.ndarray) -> List[Region] | None:
+        h, w = frame_bgr.shape[:2]
+        f = min(1.0, self.width / w)
+        size = (max(1, int(w * f)), max(1, int(h * f)))
+        small = cv2.resize(frame_bgr, size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        prev, self._prev = self._prev, gray
+        if prev is None or prev.shape != gray.shape:
+            return None
+        diff = cv2.absdiff(gray, prev)
+        mask = cv2.threshold(diff, self.diff_thr, 255, cv2.THRESH_BINARY)[1]
+        if self.hsv_ranges:
+            hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+            for lo, hi in self.hsv_ranges:
+                mask |= cv2.inRange(hsv, lo, hi)
+        cover = cv2.countNonZero(mask) / mask.size
+        if cover > self.max_cover:
+            return None
+        if cover == 0:
+            return []
+        mask = cv2.dilate(mask, self._kernel, iterations=2)
+        _, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+        min_px = self.min_area * mask.size
+        return [
+            (int(x / f), int(y / f), int(np.ceil(bw / f)), int(np.ceil(bh / f)))
+            for x, y, bw, bh, area in stats[1:].tolist()
+            if area >= min_px
+        ]
+
+
+class CascadeDetector:
+    """Filtr wstępny przed ``detector.infer`` – YOLO tylko gdy ma sens.
+
+    Gdy :class:`MotionColorPrefilter` nie widzi żadnej wskazówki, model nie
+    jest uruchamiany; gdy wskazuje kilka obszarów, detekcja działa tylko na
+    ich wycinkach (``infer_batch``, każdy wycinek w swoim rozmiarze).
+    Detektor o stałym rozmiarze wejścia (``dynamic_input`` fałszywe)
+    powiększa każdy wycinek do pełnego wejścia, więc dostaje jeden wycinek
+    obejmujący wszystkie obszary – nigdy więcej niż jedną inferencję
+    na klatkę.  Obszary ostatnich
+    detekcji są zawsze dołączane, bo kamienie metin stoją w miejscu, a co
+    ``full_every`` wywołań (i przy niepewnym filtrze) wykonywana jest pełna
+    detekcja.  Ma ten sam interfejs ``infer`` co ``ObjectDetector``.
+
+    Parameters
+    ----------
+    detector:
+        Detektor z metodą ``infer`` (opcjonalnie ``infer_batch``).
+    prefilter:
+        Filtr wstępny; domyślnie :class:`MotionColorPrefilter` bez kolorów.
+    full_every:
+        Co ile wywołań wymusić pełną detekcję.
+    pad:
+        Margines wokół obszaru jako ułamek jego większego boku.
+    min_side:
+        Minimalny bok wycinka przekazywanego do modelu.
+    max_regions, max_region_cover:
+        Przy większej liczbie obszarów lub łącznej powierzchni (ułamek
+        klatki) tańsza jest pełna detekcja.
+    """
+
+    def __init__(
+        self,
+        detector,
+        prefilter: MotionColorPrefilter | None = None,
+        full_every: int = 15,
+        pad: float = 0.5,
+        min_side: int = 96,
+        max_regions: int = 4,
+        max_region_cover: float = 0.5,
+    ):
+        self.detector = detector
+        self.prefilter = prefilter or MotionColorPrefilter()
+        self.full_every = full_every
+        self.pad = pad
+        self.min_side = min_side
+        self.max_regions = max_regions
+        self.max_region_cover = max_region_cover
+        self._since_full = full_every
+        self._last: List[Detection] = []
+        self._empty: List[Detection] = []
+        self.counts = {"full": 0, "regions": 0, "skipped": 0}
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Ile razy wykonano pełną detekcję, detekcję w obszarach i pominięto."""
+        return dict(self.counts)
+
+    def invalidate(self) -> None:
+        """Zmiana sceny: kolejne wywołanie to pełna detekcja od zera."""
+        self.prefilter.reset()
+        self._last = self._empty
+        self._since_full = self.full_every
+        invalidate = getattr(self.detector, "invalidate", None)
+        if invalidate is not None:
+            invalidate()
+
+    def stop(self) -> None:
+        stop = getattr(self.detector, "stop", None)
+        if stop is not None:
+            stop()
+
+    def infer(self, frame_bgr: np.ndarray, force: bool = False) -> List[Detection]:
+        """Detekcje na klatce; ``force=True`` – pełna detekcja bez limitów."""
+        regions = self.prefilter.regions(frame_bgr)
+        self._since_full += 1
+        if force:
+            return self._full(frame_bgr, force=True)
+        if regions is None or self._since_full >= self.full_every:
+            return self._full(frame_bgr)
+        for d in self._last:
+            x1, y1, x2, y2 = d["bbox"]
+            regions.append((int(x1), int(y1), int(x2 - x1), int(y2 - y1)))
+        if not regions:
+            self.counts["skipped"] += 1
+            self._last = self._empty
+            return self._empty
+        H, W = frame_bgr.shape[:2]
+        rois = merge_regions([self._padded(r, W, H) for r in regions])
+        if len(rois) > 1 and not getattr(self.detector, "dynamic_input", False):
+            rois = [_bounding(rois)]
+        area = sum(w * h for _, _, w, h in rois)
+        if len(rois) > self.max_regions or area > self.max_region_cover * W * H:
+            return self._full(frame_bgr)
+        crops = [frame_bgr[y : y + h, x : x + w] for x, y, w, h in rois]
+        batch = getattr(self.detector, "infer_batch", None)
+        if batch is not None:
+            results = batch(crops)
+        else:
+            results = [self.detector.infer(c) for c in crops]
+        dets: List[Detection] = []
+        for (x, y, _, _), res in zip(rois, results):
+            dets.extend(Detection.from_dict(d).shifted(x, y) for d in res)
+        self.counts["regions"] += 1
+        self._last = dets
+        return dets
+
+    def _full(self, frame_bgr: np.ndarray, force: bool = False) -> List[Detection]:
+        self._since_full = 0
+        self.counts["full"] += 1
+        if force:
+            self._last = self.detector.infer(frame_bgr, force=True)
+        else:
+            self._last = self.detector.infer(frame_bgr)
+        return self._last
+
+    def _padded(self, r: Region, W: int, H: int) -> Region:
+        x, y, w, h = r
+        side = max(self.min_side, int(max(w, h) * (1 + 2 * self.pad)))
+        bw, bh = min(W, max(w, side)), min(H, max(h, side))
+        x = int(min(max(0, x + w / 2 - bw / 2), W - bw))
+        y = int(min(max(0, y + h / 2 - bh / 2), H - bh))
+        return x, y, bw, bh
@@ -37,7 +37,7 @@ class SearchManager:
     def update_last_target(self) -> None:
         self.last_target_time = time.time()
 
-    def handle_no_target(self, spin_done: bool) -> None:
+    def handle_no_target(self, spin_done: bool) -> bool:
         """Teleport and optionally change channel when no target for a while.
 
         Parameters
@@ -45,16 +45,24 @@ class SearchManager:
         spin_done: bool
             Whether a full rotation search was completed. If ``False`` the
             method returns immediately without performing any action.
+
+        Returns
+        -------
+        bool
+            ``True`` when a teleport or channel switch was attempted, i.e.
+            earlier detections no longer describe the scene.
         """
         if not spin_done:
-            return
+            return False
         now = time.time()
         if now - self.last_target_time <= self.no_target_sec:
-            return
+            return False
         slot = None
+        moved = False
         try:
             if self.tp_slots:
                 slot = self.tp_slots[self.location_idx % len(self.tp_slots)]
+                moved = True
                 self.teleporter.teleport_slot(slot, self.tp_page)
                 self._teleports += 1
                 self.location_idx = (self.location_idx + 1) % len(self.tp_slots)
@@ -71,3 +79,4 @@ class SearchManager:
         except Exception:
             logger.warning("Teleportacja na slot %s nie powiodła się", slot)
         self.last_target_time = now
+        return moved
@@ -1,44 +1,163 @@
 from __future__ import annotations
 
-from typing import Dict, List, Tuple
+from functools import lru_cache
+from typing import Dict, Mapping, Sequence, Tuple
+
+import numpy as np
 
 DEFAULT_PRIORITY = ["boss", "metin", "potwory"]
 
 
-def _rank(name: str, priority_order: list[str]) -> int:
-    try:
-        return len(priority_order) - priority_order.index(name)
-    except ValueError:
-        return 0
+class Detection:
+    """Pojedyncza detekcja (klasa, ramka ``xyxy``, pewność, id śladu).
+
+    Lekki obiekt ze ``__slots__`` zamiast słownika; obsługuje też dostęp
+    jak do słownika (``d["bbox"]``, ``d.get("name")``, ``{**d}``), więc
+    może zastąpić dotychczasowe słowniki detekcji.  ``bbox`` jest
+    przechowywany bez kopiowania (lista z detektora albo krotka).
+    """
+
+    __slots__ = ("name", "bbox", "conf", "cls", "track_id")
+
+    def __init__(
+        self,
+        name: str,
+        bbox: Sequence[float],
+        conf: float = 0.0,
+        cls: int = -1,
+        track_id: int | None = None,
+    ):
+        self.name = name
+        self.bbox = bbox
+        self.conf = conf
+        self.cls = cls
+        self.track_id = track_id
+
+    @classmethod
+    def from_dict(cls, d: Mapping) -> "Detection":
+        if isinstance(d, Detection):
+            return d
+        return cls(
+            d.get("name", ""),
+            d["bbox"],
+            float(d.get("conf", 0.0)),
+            int(d.get("cls", -1)),
+            d.get("track_id"),
+        )
+
+    @classmethod
+    def from_row(cls, row, names: Mapping[int, str]) -> "Detection":
+        """Detekcja z wiersza tablicy ``agent.detector.DET_DTYPE``."""
+        k = int(row["cls"])
+        return cls(names.get(k, str(k)), row["bbox"].tolist(), float(row["conf"]), k)
+
+    def shifted(self, dx: float, dy: float) -> "Detection":
+        """Kopia z ramką przesuniętą o ``(dx, dy)`` (wycinek → klatka)."""
+        x1, y1, x2, y2 = self.bbox
+        return Detection(
+            self.name,
+            [x1 + dx, y1 + dy, x2 + dx, y2 + dy],
+            self.conf,
+            self.cls,
+            self.track_id,
+        )
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def keys(self):
+        return [k for k in self.__slots__ if getattr(self, k) is not None]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.keys()
+
+    def to_dict(self) -> Dict:
+        return {k: getattr(self, k) for k in self.keys()}
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Detection):
+            return NotImplemented
+        # ramka może być listą albo krotką – porównujemy wartości
+        return (
+            self.name == other.name
+            and tuple(self.bbox) == tuple(other.bbox)
+            and self.conf == other.conf
+            and self.cls == other.cls
+            and self.track_id == other.track_id
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"Detection({self.name!r}, {self.bbox}, conf={self.conf:.2f}, "
+            f"cls={self.cls}, track_id={self.track_id})"
+        )
+
+
+@lru_cache(maxsize=32)
+def rank_table(priority_order: Tuple[str, ...]) -> Dict[str, int]:
+    """Ranga klasy: ``len(order) - pozycja`` (pierwsza na liście najwyższa)."""
+    n = len(priority_order)
+    table: Dict[str, int] = {}
+    for i, name in enumerate(priority_order):
+        table.setdefault(name, n - i)
+    return table
 
 
 def pick_target(
-    dets: List[Dict],
+    dets,
     wh: Tuple[int, int],
     priority_order: list[str] | None = None,
     center_bias: float = 2.0,
     size_bias: float = 1.0,
     center_y: float = 0.55,
-):
-    if not dets:
+    names: Mapping[int, str] | None = None,
+) -> Detection | None:
+    """Wybierz cel: priorytet klasy, bliskość środka ekranu, rozmiar, pewność.
+
+    ``dets`` to lista :class:`Detection` (słowniki są zamieniane) albo
+    tablica ``agent.detector.DET_DTYPE`` z mapą ``names`` (id → nazwa).
+    Tablica jest oceniana jednym wyrażeniem numpy; lista – w pętli, bez
+    budowania tablic, a zwracany jest wybrany obiekt z listy.
+    """
+    if dets is None or len(dets) == 0:
         return None
     W, H = wh
-    order = priority_order or DEFAULT_PRIORITY
-
-    def score(d):
-        x1, y1, x2, y2 = d["bbox"]
-        cx = (x1 + x2) / 2 / W
-        cy = (y1 + y2) / 2 / H
-        bw = (x2 - x1) / W
-        bh = (y2 - y1) / H
-        pr = _rank(d.get("name", ""), order)
-        dist = abs(cx - 0.5) + abs(cy - center_y)
-        return (
-            pr * 10
-            - center_bias * dist
-            + size_bias * (bw * bh)
-            + 0.2 * float(d.get("conf", 0))
-        )
-
-    dets = sorted(dets, key=score, reverse=True)
-    return dets[0]
+    table = rank_table(tuple(priority_order or DEFAULT_PRIORITY))
+    if not isinstance(dets, np.ndarray):
+        best, best_score = None, float("-inf")
+        for d in dets:
+            d = Detection.from_dict(d)
+            x1, y1, x2, y2 = d.bbox
+            cx = (x1 + x2) / (2 * W)
+            cy = (y1 + y2) / (2 * H)
+            area = (x2 - x1) * (y2 - y1) / (W * H)
+            dist = abs(cx - 0.5) + abs(cy - center_y)
+            score = (
+                table.get(d.name, 0) * 10
+                - center_bias * dist
+                + size_bias * area
+                + 0.2 * d.conf
+            )
+            # ``>`` – pierwszy z równych, jak stabilne sortowanie malejące
+            if score > best_score:
+                best, best_score = d, score
+        return best
+    names = names or {}
+    boxes = dets["bbox"]
+    ids, inv = np.unique(dets["cls"], return_inverse=True)
+    per_id = [table.get(names.get(k, str(k)), 0) for k in ids.tolist()]
+    ranks = np.asarray(per_id)[inv.reshape(-1)]
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    cx = (x1 + x2) / (2 * W)
+    cy = (y1 + y2) / (2 * H)
+    area = (x2 - x1) * (y2 - y1) / (W * H)
+    dist = np.abs(cx - 0.5) + np.abs(cy - center_y)
+    score = ranks * 10 - center_bias * dist + size_bias * area + 0.2 * dets["conf"]
+    # argmax bierze pierwszy z równych – jak stabilne sortowanie malejące
+    return Detection.from_row(dets[int(np.argmax(score))], names)
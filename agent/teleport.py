@@ -4,23 +4,27 @@ import logging
 import os
 import time
 from enum import Enum, auto
+from typing import TYPE_CHECKING
 
 import easyocr
 import numpy as np
 import pyautogui
 from PIL import Image
 
-from recorder.window_capture import WindowCapture
-
 from . import get_config
 from .template_matcher import TemplateMatcher
 from .wasd import KeyHold
 
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from recorder.frame_source import FrameSource
+
 CFG = get_config()
 pyautogui.PAUSE = CFG.get("controls", {}).get("mouse_pause", 0.02)
 
 logger = logging.getLogger(__name__)
 
+PAGES = ["I", "II", "III", "IV", "V", "VI", "VII", "VIII"]
+
 
 class TeleportResult(Enum):
     OK = "ok"
@@ -41,7 +45,7 @@ class Teleporter:
 
     def __init__(
         self,
-        win: WindowCapture,
+        win: FrameSource,
         templates_dir: str,
         use_ocr: bool = True,
         dry: bool = False,
@@ -51,10 +55,7 @@ class Teleporter:
         self.win = win
         if not os.path.isdir(templates_dir):
             raise FileNotFoundError(f"Brak katalogu z szablonami: {templates_dir}")
-        required = ["wczytaj.png"] + [
-            f"strona_{r}.png"
-            for r in ["I", "II", "III", "IV", "V", "VI", "VII", "VIII"]
-        ]
+        required = ["wczytaj.png"] + [f"strona_{r}.png" for r in PAGES]
         missing = [
             p for p in required if not os.path.isfile(os.path.join(templates_dir, p))
         ]
@@ -62,7 +63,14 @@ class Teleporter:
             raise FileNotFoundError(
                 f"Brak plików w {templates_dir}: {', '.join(missing)}"
             )
-        self.tm = TemplateMatcher(templates_dir)
+        tm_cfg = self.cfg.get("templates", {})
+        self.tm = TemplateMatcher(
+            templates_dir,
+            preload=tm_cfg.get("preload", False),
+            workers=tm_cfg.get("workers", 0),
+            pyramid=tm_cfg.get("pyramid", 0),
+            hints=tm_cfg.get("hints", False),
+        )
         self.reader = easyocr.Reader(["pl", "en"], gpu=False) if use_ocr else None
         self.dry = dry
         self.keys = KeyHold(
@@ -78,8 +86,27 @@ class Teleporter:
         self.after_load_delay = tp_cfg.get("after_load_delay", 0.35)
 
     def _frame(self) -> np.ndarray:
-        fr = self.win.grab()
-        return np.array(fr)[:, :, :3].copy()
+        return self.win.grab_bgr()
+
+    def _tabs_roi(self) -> tuple[int, int, int, int]:
+        _, _, w, h = self.win.region
+        return int(w * 0.05), int(h * 0.82), int(w * 0.9), int(h * 0.16)
+
+    def _find(self, frame, name, thresh, origin=(0, 0)) -> dict | None:
+        """``TemplateMatcher.find`` z podpowiedzią z ostatniego położenia."""
+        return self.tm.find(
+            frame,
+            name,
+            thresh=thresh,
+            multi_scale=True,
+            origin=origin,
+            window_region=self.win.region,
+        )
+
+    def _find_tab(self, name: str, thresh: float) -> dict | None:
+        """Szablon ``name`` na wycinku paska stron (współrzędne okna)."""
+        roi = self._tabs_roi()
+        return self._find(self.win.grab_roi(roi), name, thresh, roi[:2])
 
     def _save_panel(self, frame: np.ndarray, reason: TeleportResult) -> None:
         """Save current panel frame for debugging failures."""
@@ -120,13 +147,8 @@ class Teleporter:
             if not self.win.is_foreground():
                 return False
 
-        L, T, w, h = self.win.region
-        roi = (
-            int(w * 0.05),
-            int(h * 0.82),
-            int(w * 0.9),
-            int(h * 0.16),
-        )
+        L, T, _, _ = self.win.region
+        roi = self._tabs_roi()
         screen_roi = (L + roi[0], T + roi[1], roi[2], roi[3])
         template_path = self.tm.dir / f"{ref_name}.png"
 
@@ -138,15 +160,7 @@ class Teleporter:
                 return True
             time.sleep(self.open_panel_delay)
 
-            frame = self._frame()
-
-            found = self.tm.find(
-                frame,
-                ref_name,
-                thresh=self.page_thresh,
-                roi=roi,
-                multi_scale=True,
-            )
+            found = self._find_tab(ref_name, self.page_thresh)
 
             if not found:
                 try:
@@ -175,12 +189,7 @@ class Teleporter:
     def go_page(self, page_label: str, thresh: float | None = None) -> bool:
         token = page_label.split()[-1].upper().replace(" ", "_")
         name = f"strona_{token}"
-        _, _, w, h = self.win.region
-        roi = (int(w * 0.05), int(h * 0.82), int(w * 0.9), int(h * 0.16))
-        frame = self._frame()
-        m = self.tm.find(
-            frame, name, thresh=thresh or self.page_thresh, roi=roi, multi_scale=True
-        )
+        m = self._find_tab(name, thresh or self.page_thresh)
         if not m:
             return False
         L, T, _, _ = self.win.region
@@ -243,9 +252,7 @@ class Teleporter:
 
         # przycisk "wczytaj"
         frame = self._frame()
-        m = self.tm.find(
-            frame, "wczytaj", thresh=self.load_btn_thresh, multi_scale=True
-        )
+        m = self._find(frame, "wczytaj", self.load_btn_thresh)
         if not m:
             logger.info("Load button not found for slot %s", slot)
             self._save_panel(frame, TeleportResult.TEMPLATE_NOT_FOUND)
@@ -1,21 +1,112 @@
 from __future__ import annotations
 
-from math import hypot
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict, Iterable, Sequence, Tuple
 
 import cv2
 import numpy as np
 
+logger = logging.getLogger(__name__)
+
+# skale używane przez ``find``/``find_all`` z ``multi_scale=True``
+DEFAULT_SCALES = (1.0, 0.9, 1.1, 0.8)
+
+
+def local_peaks(res: np.ndarray, thresh: float, radius: int):
+    """Położenia ``(ys, xs)`` lokalnych maksimów ``res`` co najmniej ``thresh``.
+
+    Maksimum lokalne to piksel równy dylatacji mapy oknem ``radius`` – zamiast
+    wszystkich pikseli powyżej progu zostają tylko wierzchołki dopasowań.
+    """
+    k = 2 * max(1, int(radius) // 2) + 1
+    peak = res >= cv2.dilate(res, np.ones((k, k), dtype=np.uint8))
+    return np.nonzero(peak & (res >= thresh))
+
+
+def suppress(centers: np.ndarray, scores: np.ndarray, min_dist: float) -> np.ndarray:
+    """Zachłanne NMS po odległości środków; indeksy od najlepszego wyniku.
+
+    Kandydat jest odrzucany, gdy leży bliżej niż ``min_dist`` od już
+    wybranego dopasowania o wyższym wyniku.
+    """
+    order = np.argsort(-scores, kind="stable")
+    pts = centers[order].astype(np.float64)
+    alive = np.ones(len(order), dtype=bool)
+    keep = []
+    for i in range(len(order)):
+        if not alive[i]:
+            continue
+        keep.append(order[i])
+        d = pts[i + 1 :] - pts[i]
+        alive[i + 1 :] &= np.hypot(d[:, 0], d[:, 1]) >= min_dist
+    return np.asarray(keep, dtype=np.int64)
+
 
 class TemplateMatcher:
+    """Dopasowanie szablonów z ``templates_dir`` (pliki ``<nazwa>.png``).
+
+    Szablony są wczytywane raz, a ich przeskalowane warianty trzymane w
+    pamięci podręcznej per ``(nazwa, skala)``, więc ``find``/``find_all``
+    nie skalują szablonów przy każdym wywołaniu. ``preload=True`` wczytuje
+    od razu cały katalog we wszystkich ``scales``; zajętość pamięci podaje
+    :meth:`cache_info`.  ``workers > 1`` pozwala :meth:`find_many`
+    dopasowywać szablony równolegle (``cv2.matchTemplate`` zwalnia GIL).
+
+    ``pyramid > 0`` włącza wyszukiwanie od zgrubnego do dokładnego w
+    :meth:`find`/:meth:`find_many`: obraz i szablon są pomniejszane
+    ``pyramid`` razy o połowę, a pełna rozdzielczość jest liczona tylko w
+    małych oknach wokół ``pyramid_candidates`` najlepszych szczytów (z
+    progiem obniżonym o ``pyramid_margin``).  Szablony mniejsze niż
+    ``pyramid_min`` px na zgrubnym poziomie są dopasowywane zwykle.
+
+    ``hints=True`` zapamiętuje ostatnie położenie każdego szablonu (per
+    rozmiar okna).  Gdy wywołujący poda ``window_region`` (np.
+    ``WindowCapture.region``), najpierw przeszukiwane jest okno
+    ``hint_pad`` px wokół poprzedniego trafienia, a pełne ROI dopiero przy
+    chybieniu – także gdy wynik w oknie jest o więcej niż ``hint_drop``
+    niższy od ostatnio zaakceptowanego (np. słabszy, podobny element obok
+    właściwego).  Zmiana ``window_region`` czyści pamięć położeń.
+    """
+
     def __init__(
         self,
         templates_dir: str = "assets/templates",
         method: int = cv2.TM_CCOEFF_NORMED,
+        preload: bool = False,
+        scales: Iterable[float] = DEFAULT_SCALES,
+        workers: int = 0,
+        pyramid: int = 0,
+        pyramid_margin: float = 0.2,
+        pyramid_candidates: int = 5,
+        pyramid_min: int = 10,
+        hints: bool = False,
+        hint_pad: int = 8,
+        hint_drop: float = 0.05,
     ):
         self.dir = Path(templates_dir)
         self.method = method
-        self.cache = {}
+        self.cache: Dict[str, np.ndarray] = {}
+        self.scaled: Dict[Tuple[str, float], np.ndarray] = {}
+        self.nbytes = 0
+        self.workers = workers
+        self._pool: ThreadPoolExecutor | None = None
+        self.pyramid = pyramid
+        self.pyramid_margin = pyramid_margin
+        self.pyramid_candidates = pyramid_candidates
+        self.pyramid_min = pyramid_min
+        self.coarse: Dict[Tuple[str, float, int], np.ndarray | None] = {}
+        self.hints = hints
+        self.hint_pad = hint_pad
+        self.hint_drop = hint_drop
+        # (nazwa, (szer., wys.) okna) → ostatnie trafienie ``(x, y, w, h)``
+        self.last_hits: Dict[Tuple[str, Tuple[int, int]], Tuple[int, ...]] = {}
+        self._last_scores: Dict[Tuple[str, Tuple[int, int]], float] = {}
+        self._hint_region: Tuple[int, ...] | None = None
+        self.hint_stats = {"hits": 0, "misses": 0}
+        if preload:
+            self.preload(scales=scales)
 
     def load(self, name: str):
         if name in self.cache:
@@ -26,9 +117,92 @@ class TemplateMatcher:
             raise FileNotFoundError(f"Brak szablonu: {p}")
         img = cv2.GaussianBlur(img, (3, 3), 0)
         self.cache[name] = img
+        self.nbytes += img.nbytes
         return img
 
-    def _prep(self, frame_bgr, roi):
+    def template(self, name: str, scale: float = 1.0) -> np.ndarray:
+        """Szablon ``name`` przeskalowany o ``scale`` (z pamięci podręcznej)."""
+        key = (name, round(float(scale), 4))
+        tpl = self.scaled.get(key)
+        if tpl is None:
+            tpl0 = self.load(name)
+            if key[1] == 1.0:
+                tpl = tpl0
+            else:
+                tpl = cv2.resize(
+                    tpl0,
+                    (
+                        max(1, int(tpl0.shape[1] * scale)),
+                        max(1, int(tpl0.shape[0] * scale)),
+                    ),
+                    interpolation=cv2.INTER_AREA,
+                )
+                self.nbytes += tpl.nbytes
+            self.scaled[key] = tpl
+        return tpl
+
+    def coarse_template(self, name: str, scale: float, levels: int):
+        """Szablon pomniejszony ``levels`` razy o połowę lub ``None`` gdy za mały."""
+        key = (name, round(float(scale), 4), levels)
+        if key not in self.coarse:
+            tpl = self.template(name, scale)
+            for _ in range(levels):
+                tpl = cv2.pyrDown(tpl)
+            if min(tpl.shape[:2]) < self.pyramid_min:
+                tpl = None
+            else:
+                self.nbytes += tpl.nbytes
+            self.coarse[key] = tpl
+        return self.coarse[key]
+
+    def preload(
+        self,
+        names: Iterable[str] | None = None,
+        scales: Iterable[float] = DEFAULT_SCALES,
+    ) -> int:
+        """Wczytaj szablony (domyślnie cały katalog) we wszystkich skalach.
+
+        Zwraca liczbę wczytanych szablonów; brakujące są pomijane z
+        ostrzeżeniem.
+        """
+        if names is None:
+            names = sorted(p.stem for p in self.dir.glob("*.png"))
+        scales = tuple(scales)
+        n = 0
+        for name in names:
+            try:
+                for s in scales:
+                    self.template(name, s)
+            except FileNotFoundError as exc:
+                logger.warning("%s", exc)
+                continue
+            n += 1
+        info = self.cache_info()
+        logger.info(
+            "Szablony: %d wczytanych, %d wariantów skali, %.1f KiB",
+            info["templates"],
+            info["variants"],
+            info["bytes"] / 1024,
+        )
+        return n
+
+    def cache_info(self) -> Dict[str, int]:
+        """Liczba szablonów, wariantów ``(nazwa, skala)`` i zajęte bajty."""
+        return {
+            "templates": len(self.cache),
+            "variants": len(self.scaled),
+            "bytes": self.nbytes,
+        }
+
+    def clear_cache(self) -> None:
+        self.cache.clear()
+        self.scaled.clear()
+        self.coarse.clear()
+        self.last_hits.clear()
+        self._last_scores.clear()
+        self.nbytes = 0
+
+    def _prep(self, frame_bgr, roi, origin=(0, 0)):
         if roi is not None:
             x, y, w, h = roi
             crop = frame_bgr[y : y + h, x : x + w]
@@ -41,7 +215,7 @@ class TemplateMatcher:
             if crop.size == 0:
                 raise ValueError("Empty frame for template matching")
         gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
-        return gray, x, y
+        return gray, origin[0] + x, origin[1] + y
 
     def find(
         self,
@@ -51,20 +225,171 @@ class TemplateMatcher:
         roi=None,
         multi_scale=False,
         scales=(1.0, 0.9, 1.1),
+        origin=(0, 0),
+        pyramid: int | None = None,
+        window_region=None,
     ):
-        gray, offx, offy = self._prep(frame_bgr, roi)
-        tpl0 = self.load(name)
+        """Najlepsze dopasowanie szablonu ``name`` lub ``None``.
+
+        ``origin`` to położenie lewego górnego rogu ``frame_bgr`` w oknie –
+        pozwala podać wycinek przechwycony przez ``WindowCapture.grab_roi``
+        i dostać współrzędne w układzie całego okna.  ``pyramid`` nadpisuje
+        liczbę poziomów piramidy (``0`` – pełne przeszukanie), a
+        ``window_region`` włącza podpowiedź z ostatniego położenia.
+        """
+        gray, offx, offy = self._prep(frame_bgr, roi, origin)
+        scales = [1.0] if not multi_scale else scales
+        levels, small = self._pyramid(gray, pyramid)
+        size = self._hint_size(window_region)
+        return self._hinted(gray, name, thresh, scales, offx, offy, small, levels, size)
+
+    def find_many(
+        self,
+        frame_bgr: np.ndarray,
+        names: Sequence[str],
+        thresh=0.82,
+        roi=None,
+        multi_scale=False,
+        scales=(1.0, 0.9, 1.1),
+        origin=(0, 0),
+        pyramid: int | None = None,
+        window_region=None,
+    ) -> Dict[str, dict | None]:
+        """Najlepsze dopasowanie każdego z ``names`` (jak :meth:`find`).
+
+        ROI jest wycinane i konwertowane do skali szarości raz dla całego
+        zestawu szablonów.  Zwraca słownik ``nazwa → dopasowanie | None`` w
+        kolejności ``names``.
+        """
+        gray, offx, offy = self._prep(frame_bgr, roi, origin)
+        names = list(dict.fromkeys(names))
+        sc = [1.0] if not multi_scale else list(scales)
+        levels, small = self._pyramid(gray, pyramid)
+        size = self._hint_size(window_region)
+        # pamięć podręczna wypełniana w tym wątku – wątki puli tylko czytają
+        for name in names:
+            for s in sc:
+                self.template(name, s)
+                if small is not None:
+                    self.coarse_template(name, s, levels)
+
+        def best(name):
+            return self._hinted(gray, name, thresh, sc, offx, offy, small, levels, size)
+
+        if self.workers > 1 and len(names) > 1:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix="template"
+                )
+            hits = list(self._pool.map(best, names))
+        else:
+            hits = [best(n) for n in names]
+        return dict(zip(names, hits))
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def _pyramid(self, gray, levels=None):
+        """``(poziomy, pomniejszony obraz)``; ``(0, None)`` gdy tryb wyłączony."""
+        levels = self.pyramid if levels is None else levels
+        if levels <= 0:
+            return 0, None
+        small = gray
+        for _ in range(levels):
+            small = cv2.pyrDown(small)
+        return levels, small
+
+    def _refine(self, gray, small, tpl, ctpl, levels, thresh):
+        """Szczyty zgrubnej mapy doprecyzowane w pełnej rozdzielczości.
+
+        Wynik w oknie jest ten sam co w pełnej mapie dla tych położeń, więc
+        jeśli prawdziwe maksimum jest wśród kandydatów, wynik jest identyczny
+        z pełnym przeszukaniem.
+        """
+        res = cv2.matchTemplate(small, ctpl, self.method)
+        ys, xs = local_peaks(res, thresh - self.pyramid_margin, 1)
+        if len(xs) == 0:
+            return -1.0, None
+        top = np.argsort(-res[ys, xs], kind="stable")[: self.pyramid_candidates]
+        f = 2**levels
+        pad = 2 * f
+        th, tw = tpl.shape[:2]
+        H, W = gray.shape[:2]
+        best_val, best_loc = -1.0, None
+        for i in top.tolist():
+            x0, y0 = max(0, int(xs[i]) * f - pad), max(0, int(ys[i]) * f - pad)
+            x1 = min(W, int(xs[i]) * f + tw + pad)
+            y1 = min(H, int(ys[i]) * f + th + pad)
+            win = gray[y0:y1, x0:x1]
+            if win.shape[0] < th or win.shape[1] < tw:
+                continue
+            _, v, _, loc = cv2.minMaxLoc(cv2.matchTemplate(win, tpl, self.method))
+            if v > best_val:
+                best_val, best_loc = v, (x0 + loc[0], y0 + loc[1])
+        return best_val, best_loc
+
+    def _hint_size(self, window_region):
+        """Rozmiar okna dla pamięci położeń; zmiana regionu ją czyści."""
+        if not self.hints or window_region is None:
+            return None
+        region = tuple(window_region)
+        if region != self._hint_region:
+            self.last_hits.clear()
+            self._last_scores.clear()
+            self._hint_region = region
+        return tuple(region[2:4])
+
+    def _hinted(self, gray, name, thresh, scales, offx, offy, small, levels, size):
+        """``_best`` z próbą w małym oknie wokół ostatniego trafienia."""
+        if size is None:
+            return self._best(gray, name, thresh, scales, offx, offy, small, levels)
+        key = (name, size)
+        last = self.last_hits.get(key)
+        if last is not None:
+            x, y, w, h = last
+            pad = self.hint_pad + int(0.1 * max(w, h)) + 1
+            x0, y0 = max(0, x - pad - offx), max(0, y - pad - offy)
+            x1 = min(gray.shape[1], x + w + pad - offx)
+            y1 = min(gray.shape[0], y + h + pad - offy)
+            if x1 > x0 and y1 > y0:
+                win = gray[y0:y1, x0:x1]
+                hit = self._best(win, name, thresh, scales, offx + x0, offy + y0)
+                floor = self._last_scores.get(key, 0.0) - self.hint_drop
+                if hit is not None and hit["score"] >= floor:
+                    self.hint_stats["hits"] += 1
+                    self._remember(key, hit)
+                    return hit
+            self.hint_stats["misses"] += 1
+        hit = self._best(gray, name, thresh, scales, offx, offy, small, levels)
+        if hit is not None:
+            self._remember(key, hit)
+        else:
+            self.last_hits.pop(key, None)
+            self._last_scores.pop(key, None)
+        return hit
+
+    def _remember(self, key, hit) -> None:
+        self.last_hits[key] = hit["rect"]
+        self._last_scores[key] = hit["score"]
+
+    def _best(self, gray, name, thresh, scales, offx, offy, small=None, levels=0):
         best = None
-        for s in [1.0] if not multi_scale else scales:
-            tpl = cv2.resize(
-                tpl0,
-                (max(1, int(tpl0.shape[1] * s)), max(1, int(tpl0.shape[0] * s))),
-                interpolation=cv2.INTER_AREA,
-            )
+        for s in scales:
+            tpl = self.template(name, s)
             if tpl.shape[0] >= gray.shape[0] or tpl.shape[1] >= gray.shape[1]:
                 continue
-            res = cv2.matchTemplate(gray, tpl, self.method)
-            _, max_val, _, max_loc = cv2.minMaxLoc(res)
+            ctpl = None
+            if small is not None:
+                ctpl = self.coarse_template(name, s, levels)
+            if ctpl is not None and (
+                ctpl.shape[0] < small.shape[0] and ctpl.shape[1] < small.shape[1]
+            ):
+                max_val, max_loc = self._refine(gray, small, tpl, ctpl, levels, thresh)
+            else:
+                res = cv2.matchTemplate(gray, tpl, self.method)
+                _, max_val, _, max_loc = cv2.minMaxLoc(res)
             if max_val >= thresh:
                 x, y = max_loc
                 bw, bh = tpl.shape[1], tpl.shape[0]
@@ -84,47 +409,38 @@ class TemplateMatcher:
         thresh=0.82,
         roi=None,
         multi_scale=True,
-        scales=(1.0, 0.9, 1.1, 0.8),
+        scales=DEFAULT_SCALES,
         dedup_px=12,
+        origin=(0, 0),
     ):
         """Zwraca listę dopasowań (słowniki) posortowanych po Y (od góry)."""
-        gray, offx, offy = self._prep(frame_bgr, roi)
-        tpl0 = self.load(name)
-        found = []
+        gray, offx, offy = self._prep(frame_bgr, roi, origin)
+        rects, scores = [], []
         for s in [1.0] if not multi_scale else scales:
-            tpl = cv2.resize(
-                tpl0,
-                (max(1, int(tpl0.shape[1] * s)), max(1, int(tpl0.shape[0] * s))),
-                interpolation=cv2.INTER_AREA,
-            )
+            tpl = self.template(name, s)
             if tpl.shape[0] >= gray.shape[0] or tpl.shape[1] >= gray.shape[1]:
                 continue
             res = cv2.matchTemplate(gray, tpl, self.method)
-            ys, xs = np.where(res >= thresh)
-            for y, x in zip(ys, xs):
-                bw, bh = tpl.shape[1], tpl.shape[0]
-                cx, cy = offx + x + bw // 2, offy + y + bh // 2
-                score = float(res[y, x])
-                dup = False
-                for f in found:
-                    if hypot(f["center"][0] - cx, f["center"][1] - cy) < dedup_px:
-                        if score > f["score"]:
-                            f.update(
-                                {
-                                    "rect": (offx + x, offy + y, bw, bh),
-                                    "center": (cx, cy),
-                                    "score": score,
-                                }
-                            )
-                        dup = True
-                        break
-                if not dup:
-                    found.append(
-                        {
-                            "rect": (offx + x, offy + y, bw, bh),
-                            "center": (cx, cy),
-                            "score": score,
-                        }
-                    )
-        found.sort(key=lambda d: d["center"][1])
-        return found
+            ys, xs = local_peaks(res, thresh, dedup_px)
+            bh, bw = tpl.shape[:2]
+            r = np.empty((len(xs), 4), dtype=np.int64)
+            r[:, 0], r[:, 1], r[:, 2], r[:, 3] = xs, ys, bw, bh
+            rects.append(r)
+            scores.append(res[ys, xs])
+        if not rects:
+            return []
+        rects = np.concatenate(rects)
+        scores = np.concatenate(scores)
+        rects[:, 0] += offx
+        rects[:, 1] += offy
+        centers = rects[:, :2] + rects[:, 2:] // 2
+        keep = suppress(centers, scores, dedup_px)
+        keep = keep[np.argsort(centers[keep, 1], kind="stable")]
+        return [
+            {
+                "rect": tuple(rects[i].tolist()),
+                "center": tuple(centers[i].tolist()),
+                "score": float(scores[i]),
+            }
+            for i in keep
+        ]
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import List
+
+import numpy as np
+
+from .targets import Detection
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """IoU każdej ramki z ``a`` (N×4, xyxy) z każdą z ``b`` (M×4)."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)))
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+@dataclass
+class Track:
+    """Śledzony obiekt: ramka z chwili ``ts`` i prędkość krawędzi (px/s)."""
+
+    id: int
+    name: str
+    bbox: np.ndarray
+    conf: float
+    ts: float
+    vel: np.ndarray = field(default_factory=lambda: np.zeros(4))
+    hits: int = 1
+    cls: int = -1
+
+    def predict(self, ts: float, horizon: float) -> np.ndarray:
+        dt = min(max(0.0, ts - self.ts), horizon)
+        return self.bbox + self.vel * dt
+
+
+class Tracker:
+    """Lekki tracker wielu obiektów (IoU/centroid + stała prędkość).
+
+    Nadaje detekcjom stałe ``track_id`` i przewiduje położenie ramek między
+    przebiegami YOLO, dzięki czemu ruch może być sterowany częściej niż
+    działa detektor.
+
+    Parameters
+    ----------
+    iou_thr:
+        Minimalne IoU przewidzianej ramki i detekcji, by je powiązać.
+    dist_thr:
+        Gdy IoU nie wystarcza – maksymalna odległość środków względem
+        przekątnej ramki śledzonej (szybko poruszające się małe cele).
+    max_age:
+        Po ilu sekundach bez detekcji ślad jest usuwany; jednocześnie
+        maksymalny horyzont ekstrapolacji.
+    smooth:
+        Waga nowego pomiaru prędkości (wygładzanie wykładnicze).
+    """
+
+    def __init__(
+        self,
+        iou_thr: float = 0.3,
+        dist_thr: float = 0.5,
+        max_age: float = 1.0,
+        smooth: float = 0.5,
+    ):
+        self.iou_thr = iou_thr
+        self.dist_thr = dist_thr
+        self.max_age = max_age
+        self.smooth = smooth
+        self.tracks: List[Track] = []
+        self._next_id = 1
+        self._last_dets: List[Detection] | None = None
+        self._last_update = float("-inf")
+
+    def step(self, dets: List[Detection], ts: float | None = None) -> List[Detection]:
+        """Aktualizuj nowymi detekcjami albo przewiduj, gdy detekcje są stare.
+
+        Detektor z limitem ``max_fps`` (i ``AsyncDetector``) zwraca tę samą
+        listę, dopóki nie policzy nowej – wtedy ślady są tylko
+        ekstrapolowane na chwilę ``ts``.
+        """
+        if dets is self._last_dets:
+            return self.predict(ts)
+        self._last_dets = dets
+        return self.update(dets, ts)
+
+    def update(self, dets: List[Detection], ts: float | None = None) -> List[Detection]:
+        """Powiąż detekcje ze śladami i zwróć je uzupełnione o ``track_id``.
+
+        Wynik to nowe obiekty :class:`Detection` – wejściowa lista (np.
+        zapamiętany wynik detektora) nie jest modyfikowana.
+        """
+        ts = time.time() if ts is None else ts
+        self.tracks = [t for t in self.tracks if ts - t.ts <= self.max_age]
+        dets = [Detection.from_dict(d) for d in dets]
+        boxes = np.array([d.bbox for d in dets], dtype=np.float64).reshape(-1, 4)
+        pred = np.array(
+            [t.predict(ts, self.max_age) for t in self.tracks], dtype=np.float64
+        ).reshape(-1, 4)
+
+        score = iou_matrix(pred, boxes)
+        if len(pred) and len(boxes):
+            same = np.array([[t.name == d.name for d in dets] for t in self.tracks])
+            # odległość środków znormalizowana przekątną śladu
+            pc = (pred[:, :2] + pred[:, 2:]) / 2
+            bc = (boxes[:, :2] + boxes[:, 2:]) / 2
+            diag = np.hypot(pred[:, 2] - pred[:, 0], pred[:, 3] - pred[:, 1])
+            d = pc[:, None] - bc[None]
+            dist = np.hypot(d[..., 0], d[..., 1])
+            dist /= diag[:, None] + 1e-9
+            ok = same & ((score >= self.iou_thr) | (dist <= self.dist_thr))
+            # IoU jako główne kryterium, bliskość środków rozstrzyga przy IoU = 0
+            tie = (1.0 - np.minimum(dist, 1.0)) * 1e-3
+            score = np.where(ok, score + tie, -1.0)
+
+        matched_t: set[int] = set()
+        matched_d: dict[int, Track] = {}
+        if score.size:
+            for flat in np.argsort(score, axis=None)[::-1]:
+                ti, di = np.unravel_index(flat, score.shape)
+                if score[ti, di] < 0:
+                    break
+                if ti in matched_t or di in matched_d:
+                    continue
+                matched_t.add(ti)
+                matched_d[di] = self.tracks[ti]
+
+        out: List[Detection] = []
+        for di, d in enumerate(dets):
+            box = boxes[di]
+            tr = matched_d.get(di)
+            if tr is None:
+                tr = Track(self._next_id, d.name, box, d.conf, ts, cls=d.cls)
+                self._next_id += 1
+                self.tracks.append(tr)
+            else:
+                dt = ts - tr.ts
+                if dt > 0:
+                    v = (box - tr.bbox) / dt
+                    if tr.hits > 1:
+                        v = self.smooth * v + (1 - self.smooth) * tr.vel
+                    tr.vel = v
+                tr.bbox, tr.ts = box, ts
+                tr.conf = d.conf
+                tr.hits += 1
+            out.append(Detection(d.name, d.bbox, d.conf, d.cls, tr.id))
+        self._last_update = ts
+        return out
+
+    def predict(self, ts: float | None = None) -> List[Detection]:
+        """Przewidywane położenia śladów z ostatniej detekcji w chwili ``ts``."""
+        ts = time.time() if ts is None else ts
+        if ts - self._last_update > self.max_age:
+            return []
+        return [
+            Detection(t.name, t.predict(ts, self.max_age).tolist(), t.conf, t.cls, t.id)
+            for t in self.tracks
+            if t.ts >= self._last_update
+        ]
+
+    def reset(self) -> None:
+        self.tracks.clear()
+        self._last_dets = None
+        self._last_update = float("-inf")
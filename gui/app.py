@@ -44,6 +44,7 @@ import keyboard
 from pynput import keyboard as pynput_keyboard
 from PySide6 import QtCore, QtGui, QtWidgets
 
+from agent import get_config
 from agent.channel import ChannelSwitcher
 from agent.cycle import CycleFarm
 from agent.detector import ObjectDetector
@@ -88,15 +89,20 @@ class QtLogHandler(QtCore.QObject, logging.Handler):
         self.log.emit(msg)
 
 
+# kolory ramek overlayu (BGR) według klasy; pozostałe na czerwono
+OVERLAY_COLORS = {"boss": (0, 215, 255), "potwory": (255, 128, 0)}
+
+
 class PreviewWorker(QtCore.QThread):
     """Thread that captures frames from a window and optionally overlays detections."""
 
     frame_ready = QtCore.Signal(np.ndarray)
     status = QtCore.Signal(str)
 
-    def __init__(self, title_substr: str):
+    def __init__(self, title_substr: str, window_cfg: dict | None = None):
         super().__init__()
         self.title = title_substr
+        self.window_cfg = window_cfg
         self._stop = False
         self._det: ObjectDetector | None = None
         self._overlay = False
@@ -126,26 +132,29 @@ class PreviewWorker(QtCore.QThread):
                 if not cap.locate(timeout=5):
                     self.status.emit("Nie znaleziono okna.")
                     return
+                cap.apply_stream_cfg(self.window_cfg)
                 self.status.emit("Znaleziono okno. Podgląd działa.")
+                # bufor przechwytywania używany ponownie; do wątku GUI trafia
+                # kopia, bo sygnał kolejkowany nie czeka na jej wyświetlenie
+                buf = np.empty((0, 0, 3), dtype=np.uint8)
                 while not self._stop:
-                    fr = cap.grab()
-                    frame = np.array(fr)[
-                        :, :, :3
-                    ].copy()  # convert BGRA to BGR and ensure contiguous
+                    frame = buf = cap.grab_bgr(buf)
                     if self._overlay and self._det:
                         try:
-                            dets = self._det.infer(frame)
-                            for d in dets:
-                                x1, y1, x2, y2 = map(int, d["bbox"])
-                                color = (0, 0, 255)
-                                if d["name"] == "boss":
-                                    color = (0, 215, 255)
-                                elif d["name"] == "potwory":
-                                    color = (255, 128, 0)
+                            # tablica DET_DTYPE – bez słownika na każdą ramkę
+                            dets = self._det.infer(frame, as_array=True)
+                            names = self._det.names
+                            for (x1, y1, x2, y2), conf, k in zip(
+                                dets["bbox"].astype(int).tolist(),
+                                dets["conf"].tolist(),
+                                dets["cls"].tolist(),
+                            ):
+                                name = names.get(k, str(k))
+                                color = OVERLAY_COLORS.get(name, (0, 0, 255))
                                 cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
                                 cv2.putText(
                                     frame,
-                                    f"{d['name']} {d['conf']:.2f}",
+                                    f"{name} {conf:.2f}",
                                     (x1, max(12, y1 - 6)),
                                     cv2.FONT_HERSHEY_SIMPLEX,
                                     0.5,
@@ -154,7 +163,7 @@ class PreviewWorker(QtCore.QThread):
                                 )
                         except Exception as exc:
                             self.status.emit(f"Overlay YOLO błąd: {exc}")
-                    self.frame_ready.emit(frame)
+                    self.frame_ready.emit(frame.copy())
                     self.msleep(33)
         except Exception as exc:
             self.status.emit(f"Błąd podglądu: {exc}")
@@ -664,7 +673,7 @@ class MainWindow(QtWidgets.QMainWindow):
             self.btn_preview.setChecked(False)
             return
         # start preview
-        self.preview_thread = PreviewWorker(title)
+        self.preview_thread = PreviewWorker(title, self.build_cfg()["window"])
         self.preview_thread.frame_ready.connect(self.show_frame)
         self.preview_thread.status.connect(self.set_status)
         classes = [c.strip() for c in self.classes_edit.text().split(",") if c.strip()]
@@ -720,7 +729,8 @@ class MainWindow(QtWidgets.QMainWindow):
             i: self.ch_key_edits[i].text().strip() or str(i) for i in range(1, 9)
         }
         cfg = {
-            "window": {"title_substr": title},
+            # ``stream``/``stream_fps`` z config/agent.yaml
+            "window": {**get_config()["window"], "title_substr": title},
             "paths": {
                 "templates_dir": self.templates_dir_edit.text().strip(),
                 "model": self.model_path.text().strip(),
@@ -857,6 +867,7 @@ class MainWindow(QtWidgets.QMainWindow):
                 if not agent.win.locate(timeout=5):
                     self.set_status("Nie znaleziono okna.")
                     return
+                cap.apply_stream_cfg(cfg["window"])
                 period = cfg.get("scan", {}).get("period", 1 / 15)
                 while not self._panic:
                     agent.step()
@@ -899,6 +910,7 @@ class MainWindow(QtWidgets.QMainWindow):
                 if not win.locate(timeout=5):
                     self.set_status("Nie znaleziono okna.")
                     return
+                win.apply_stream_cfg(cfg["window"])
                 try:
                     test_img = pyautogui.screenshot()
                     logger.info(
@@ -1004,6 +1016,7 @@ class MainWindow(QtWidgets.QMainWindow):
                     if not win.locate(timeout=5):
                         self.set_status("Nie znaleziono okna.")
                         return
+                    win.apply_stream_cfg(cfg["window"])
                     ch = int(self.channel_combo.currentText().replace("CH", ""))
                     keys = KeyHold(
                         dry=cfg.get("dry_run", False),
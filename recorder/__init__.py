@@ -3,7 +3,7 @@
 import importlib
 from types import ModuleType
 
-__all__ = ["capture", "align_wasd"]
+__all__ = ["capture", "align_wasd", "frame_source"]
 
 
 def __getattr__(name: str) -> ModuleType:
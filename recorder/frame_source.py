@@ -0,0 +1,230 @@
+"""Frame sources used by the agent loop.
+
+:class:`FrameSource` describes the interface shared by the live
+:class:`recorder.window_capture.WindowCapture` and :class:`ReplaySource`,
+which plays back recordings made by :func:`recorder.capture.record_session`
+(``.mp4`` + ``.jsonl``) or a folder of frames.  The replay source needs only
+OpenCV and numpy, so the agent loop can be benchmarked offline on Linux.
+"""
+
+from __future__ import annotations
+
+import time
+from pathlib import Path
+from typing import Protocol, runtime_checkable
+
+import cv2
+import numpy as np
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+@runtime_checkable
+class FrameSource(Protocol):
+    """Minimal interface of a frame source used by the agent."""
+
+    region: tuple[int, int, int, int] | None
+
+    def grab(self): ...
+
+    def grab_bgr(self, out: np.ndarray | None = None) -> np.ndarray: ...
+
+    def grab_roi(self, roi: tuple[int, int, int, int]) -> np.ndarray: ...
+
+    def is_foreground(self) -> bool: ...
+
+    def focus(self) -> bool: ...
+
+    def close(self) -> None: ...
+
+
+class ReplaySource:
+    """Odtwarza nagranie (``.mp4``/``.jsonl``) lub katalog klatek jak okno gry.
+
+    Każde wywołanie ``grab``/``grab_bgr`` zwraca kolejną klatkę, więc przebieg
+    jest deterministyczny niezależnie od szybkości pętli. Z ``realtime=True``
+    klatka jest wybierana według upływu czasu i ``fps`` nagrania.
+
+    Parameters
+    ----------
+    path:
+        Plik wideo, plik zdarzeń ``.jsonl`` (wideo o tej samej nazwie obok)
+        albo katalog z obrazami (sortowanymi po nazwie).
+    loop:
+        Zaczynaj od początku po ostatniej klatce zamiast zgłaszać ``EOFError``.
+    preload:
+        Zdekoduj wszystkie klatki do pamięci przy starcie – pomiar pętli
+        agenta nie obejmuje wtedy kosztu dekodowania.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        loop: bool = False,
+        realtime: bool = False,
+        fps: float | None = None,
+        preload: bool = False,
+    ):
+        path = Path(path)
+        if path.suffix.lower() == ".jsonl":
+            path = path.with_suffix(".mp4")
+        if not path.exists():
+            raise FileNotFoundError(f"Brak nagrania: {path}")
+        self.path = path
+        self.loop = loop
+        self.realtime = realtime
+        self._files: list[Path] = []
+        self._cap = None
+        self._frames: list[np.ndarray] | None = None
+        if path.is_dir():
+            self._files = sorted(
+                p for p in path.iterdir() if p.suffix.lower() in IMAGE_EXTS
+            )
+            if not self._files:
+                raise FileNotFoundError(f"Katalog {path} nie zawiera klatek")
+            self.fps = float(fps or 15.0)
+        else:
+            self._cap = cv2.VideoCapture(str(path))
+            if not self._cap.isOpened():
+                raise RuntimeError(f"Nie można otworzyć nagrania {path}")
+            self.fps = float(fps or self._cap.get(cv2.CAP_PROP_FPS) or 15.0)
+        self.index = -1  # numer ostatnio zwróconej klatki
+        self._frame: np.ndarray | None = None
+        self._t0: float | None = None
+        if preload:
+            self._frames = list(self._iter_decode())
+            self._release_cap()
+        first = self._peek_first()
+        h, w = first.shape[:2]
+        self.region = (0, 0, w, h)
+
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        if self._frames is not None:
+            return len(self._frames)
+        if self._files:
+            return len(self._files)
+        return int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT)) if self._cap else 0
+
+    def __enter__(self) -> "ReplaySource":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._release_cap()
+
+    def _release_cap(self) -> None:
+        if self._cap is not None:
+            try:
+                self._cap.release()
+            except Exception:
+                pass
+            self._cap = None
+
+    def _iter_decode(self):
+        if self._files:
+            for p in self._files:
+                yield self._read_file(p)
+            return
+        while True:
+            ok, frame = self._cap.read()
+            if not ok:
+                break
+            yield frame
+
+    @staticmethod
+    def _read_file(p: Path) -> np.ndarray:
+        img = cv2.imread(str(p), cv2.IMREAD_COLOR)
+        if img is None:
+            raise RuntimeError(f"Nie można wczytać klatki {p}")
+        return img
+
+    def _peek_first(self) -> np.ndarray:
+        if self._frames is not None:
+            if not self._frames:
+                raise RuntimeError(f"Nagranie {self.path} nie zawiera klatek")
+            return self._frames[0]
+        if self._files:
+            return self._read_file(self._files[0])
+        ok, frame = self._cap.read()
+        if not ok:
+            raise RuntimeError(f"Nagranie {self.path} nie zawiera klatek")
+        self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        return frame
+
+    def _read(self, idx: int) -> np.ndarray | None:
+        if self._frames is not None:
+            return self._frames[idx] if idx < len(self._frames) else None
+        if self._files:
+            if idx >= len(self._files):
+                return None
+            return self._read_file(self._files[idx])
+        if self._cap is None:
+            return None
+        if idx != self.index + 1:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+        ok, frame = self._cap.read()
+        return frame if ok else None
+
+    def _next_index(self) -> int:
+        if not self.realtime:
+            return self.index + 1
+        now = time.perf_counter()
+        if self._t0 is None:
+            self._t0 = now
+        return max(self.index, int((now - self._t0) * self.fps))
+
+    # ------------------------------------------------------------------
+    # FrameSource API
+    def grab(self) -> np.ndarray:
+        """Zwraca kolejną klatkę BGR; ``EOFError`` po końcu nagrania."""
+        idx = self._next_index()
+        if idx == self.index and self._frame is not None:
+            return self._frame
+        frame = self._read(idx)
+        if frame is None:
+            if not self.loop or idx == 0:
+                raise EOFError(f"Koniec nagrania {self.path}")
+            self._t0 = None
+            self.index = -1
+            if self._cap is not None:
+                self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            idx = 0
+            frame = self._read(0)
+        self.index = idx
+        self._frame = frame
+        return frame
+
+    def grab_bgr(self, out: np.ndarray | None = None) -> np.ndarray:
+        frame = self.grab()
+        if out is None:
+            return frame
+        if out.shape != frame.shape or out.dtype != np.uint8:
+            out = np.empty(frame.shape, dtype=np.uint8)
+        np.copyto(out, frame)
+        return out
+
+    def grab_roi(self, roi: tuple[int, int, int, int]) -> np.ndarray:
+        """Wycinek bieżącej klatki (bez przesuwania odtwarzania)."""
+        frame = self._frame if self._frame is not None else self.grab()
+        x, y, w, h = (int(v) for v in roi)
+        crop = frame[y : y + h, x : x + w]
+        if x < 0 or y < 0 or crop.size == 0:
+            h_f, w_f = frame.shape[:2]
+            raise ValueError(f"Invalid ROI {roi} for frame {w_f}x{h_f}")
+        return crop
+
+    def locate(self, timeout: float | None = None) -> bool:
+        return True
+
+    def update_region(self) -> None:
+        pass
+
+    def is_foreground(self) -> bool:
+        return True
+
+    def focus(self) -> bool:
+        return True
@@ -1,15 +1,34 @@
 from __future__ import annotations
 
+import logging
+import threading
 import time
+from typing import NamedTuple
 
 import mss
+import numpy as np
 import pygetwindow as gw
 import win32con
 import win32gui
 
+logger = logging.getLogger(__name__)
+
+
+class StreamFrame(NamedTuple):
+    """Klatka z bufora strumienia: obraz BGRA, czas przechwycenia i numer."""
+
+    image: np.ndarray
+    ts: float
+    seq: int
+
 
 class WindowCapture:
-    """Przechwytuje wskazane okno po fragmencie tytułu + helpery focus/foreground."""
+    """Przechwytuje wskazane okno po fragmencie tytułu + helpery focus/foreground.
+
+    Opcjonalnie (``start_stream``) przechwytywanie działa w osobnym wątku,
+    który zapisuje klatki do małego, prealokowanego bufora pierścieniowego.
+    Wtedy ``grab`` i ``latest`` zwracają najnowszą klatkę bez blokowania.
+    """
 
     def __init__(self, title_substr: str, poll_sec: float = 0.5):
         self.title_substr = title_substr
@@ -17,9 +36,21 @@ class WindowCapture:
         self.win = None  # pygetwindow.Window
         self.region = None  # (left, top, width, height)
         self.sct = mss.mss()
+        # tryb strumieniowy (wątek producenta + bufor pierścieniowy)
+        self._ring: list[np.ndarray] = []
+        self._ring_ts: list[float] = []
+        self._ring_seq: list[int] = []
+        self._ring_size = 3
+        self._ring_lock = threading.Lock()
+        self._seq = 0
+        self._latest_idx = -1
+        self._stream_thread: threading.Thread | None = None
+        self._stream_stop = threading.Event()
+        self._stream_fps: float | None = None
 
     def close(self) -> None:
         """Release underlying screenshot resources."""
+        self.stop_stream()
         try:
             self.sct.close()
         except Exception:
@@ -105,7 +136,16 @@ class WindowCapture:
             return False
 
     def grab(self):
-        """Zwraca mss.base.ScreenShot (BGRA)."""
+        """Zwraca mss.base.ScreenShot (BGRA).
+
+        W trybie strumieniowym zwraca kopię najnowszej klatki z bufora
+        (``np.ndarray`` BGRA) zamiast czekać na mss; do czasu pierwszej klatki
+        przechwytuje synchronicznie.
+        """
+        if self.streaming:
+            fr = self.latest(copy=True)
+            if fr is not None:
+                return fr.image
         if self.region is None:
             self.update_region()
         def _grab():
@@ -121,3 +161,196 @@ class WindowCapture:
             if getattr(img, "width", 0) == 0 or getattr(img, "height", 0) == 0:
                 raise RuntimeError("WindowCapture.grab captured empty image (zero width/height)")
         return img
+
+    def grab_bgr(self, out: np.ndarray | None = None) -> np.ndarray:
+        """Zwraca klatkę BGR bez zbędnych kopii.
+
+        Bez ``out`` wynikiem jest widok (bez kopiowania) na surowe bajty BGRA
+        zrzutu – tablica nie jest ciągła w pamięci.  W trybie strumieniowym
+        bez ``out`` zwracana jest kopia, bo slot bufora pierścieniowego
+        zostanie nadpisany przez wątek przechwytujący. Z ``out`` piksele są
+        kopiowane jednym ``np.copyto`` do podanego bufora (H, W, 3) uint8;
+        gdy rozmiar okna się zmienił, alokowany jest nowy bufor. Zwracany jest
+        bufor, do którego zapisano klatkę – wywołujący powinien go zachować
+        do ponownego użycia (na start wystarczy pusty ``np.empty((0, 0, 3))``).
+        Nie przekazuj jako ``out`` widoku zwróconego bez ``out``.
+        """
+        fr = None
+        if self.streaming:
+            # widok na slot – kopiowany niżej do ``out`` albo jawnie
+            latest = self.latest()
+            fr = latest.image if latest is not None else None
+            if fr is not None and out is None:
+                return fr[:, :, :3].copy()
+        if fr is None:
+            fr = self.grab()
+        src = np.asarray(fr, dtype=np.uint8)
+        if src.ndim == 3 and src.shape[2] == 3:
+            bgr = src
+        else:
+            h = getattr(fr, "height", None) or src.shape[0]
+            w = getattr(fr, "width", None) or src.shape[1]
+            bgr = src.reshape(h, w, 4)[:, :, :3]
+        if out is None:
+            return bgr
+        if out.shape != bgr.shape or out.dtype != np.uint8:
+            out = np.empty(bgr.shape, dtype=np.uint8)
+        np.copyto(out, bgr)
+        return out
+
+    def grab_roi(self, roi: tuple[int, int, int, int]) -> np.ndarray:
+        """Przechwyć tylko prostokąt ``roi`` = (x, y, w, h) względem okna.
+
+        mss pobiera wyłącznie ten fragment ekranu, więc koszt przechwycenia
+        i konwersji jest proporcjonalny do ROI, a nie do całego okna.
+        Prostokąt jest przycinany do prawej/dolnej krawędzi okna. Zwraca
+        widok BGR (jak :meth:`grab_bgr` bez ``out``), a w trybie
+        strumieniowym kopię wycinka z bufora.
+        """
+        if self.region is None:
+            self.update_region()
+        left, top, width, height = self.region
+        x, y, w, h = (int(v) for v in roi)
+        w = min(w, width - x)
+        h = min(h, height - y)
+        if x < 0 or y < 0 or w <= 0 or h <= 0:
+            raise ValueError(f"Invalid ROI {roi} for window {width}x{height}")
+        if self.streaming:
+            fr = self.latest()
+            if fr is not None:
+                return fr.image[y : y + h, x : x + w, :3].copy()
+        img = self.sct.grab({"left": left + x, "top": top + y, "width": w, "height": h})
+        if getattr(img, "width", 0) == 0 or getattr(img, "height", 0) == 0:
+            raise RuntimeError("WindowCapture.grab_roi captured empty image")
+        return np.asarray(img, dtype=np.uint8).reshape(img.height, img.width, 4)[
+            :, :, :3
+        ]
+
+    # --- Tryb strumieniowy ---
+    @property
+    def streaming(self) -> bool:
+        t = self._stream_thread
+        return bool(t and t.is_alive() and not self._stream_stop.is_set())
+
+    def start_stream(self, fps: float | None = 30.0, ring_size: int = 3) -> None:
+        """Uruchom wątek przechwytujący klatki do bufora pierścieniowego.
+
+        Parameters
+        ----------
+        fps: float | None
+            Górny limit liczby klatek na sekundę. ``None`` – bez limitu.
+        ring_size: int
+            Liczba prealokowanych slotów bufora. Klatka zwrócona przez
+            :meth:`latest` pozostaje nienadpisana przez ``ring_size - 1``
+            kolejnych przechwyceń.
+        """
+        if self.streaming:
+            return
+        t = self._stream_thread
+        if t is not None and t.is_alive():
+            logger.warning("Poprzedni wątek przechwytywania jeszcze działa")
+            return
+        if self.region is None:
+            self.update_region()
+        self._ring_size = max(2, int(ring_size))
+        self._stream_fps = fps
+        self._stream_stop.clear()
+        self._stream_thread = threading.Thread(
+            target=self._stream_loop, name="WindowCaptureStream", daemon=True
+        )
+        self._stream_thread.start()
+
+    def apply_stream_cfg(self, window_cfg: dict | None) -> bool:
+        """Włącz strumień, gdy sekcja ``window`` konfiguracji ma ``stream``.
+
+        Wywołuj po :meth:`locate`.  ``stream_fps`` (domyślnie 30) ogranicza
+        tempo przechwytywania.  Zwraca ``True``, gdy wątek przechwytujący
+        działa.
+        """
+        window_cfg = window_cfg or {}
+        if window_cfg.get("stream", False):
+            self.start_stream(fps=window_cfg.get("stream_fps", 30))
+        return self.streaming
+
+    def stop_stream(self, timeout: float = 1.0) -> None:
+        """Zatrzymaj wątek przechwytywania (jeśli działa)."""
+        t = self._stream_thread
+        if t is None:
+            return
+        self._stream_stop.set()
+        if t is not threading.current_thread():
+            t.join(timeout)
+        if t.is_alive():
+            # referencja zostaje – ``start_stream`` nie uruchomi drugiego wątku
+            logger.warning("Wątek przechwytywania nie zakończył się w %.1f s", timeout)
+            return
+        self._stream_thread = None
+
+    def latest(self, copy: bool = False) -> StreamFrame | None:
+        """Zwróć najnowszą klatkę ze strumienia lub ``None`` gdy jej brak.
+
+        Bez ``copy`` obraz jest widokiem na slot bufora – ważnym do czasu,
+        aż producent zapisze ``ring_size - 1`` kolejnych klatek.
+        """
+        with self._ring_lock:
+            idx = self._latest_idx
+            if idx < 0:
+                return None
+            img = self._ring[idx]
+            if copy:
+                img = img.copy()
+            return StreamFrame(img, self._ring_ts[idx], self._ring_seq[idx])
+
+    def _alloc_ring(self, height: int, width: int) -> None:
+        self._ring = [
+            np.empty((height, width, 4), dtype=np.uint8) for _ in range(self._ring_size)
+        ]
+        self._ring_ts = [0.0] * self._ring_size
+        self._ring_seq = [0] * self._ring_size
+        self._latest_idx = -1
+
+    def _stream_loop(self) -> None:
+        # mss trzyma uchwyty per wątek – producent musi mieć własną instancję
+        sct = mss.mss()
+        try:
+            while not self._stream_stop.is_set():
+                t0 = time.time()
+                region = self.region
+                if region is None:
+                    time.sleep(self.poll_sec)
+                    continue
+                left, top, width, height = region
+                try:
+                    img = sct.grab(
+                        {"left": left, "top": top, "width": width, "height": height}
+                    )
+                except Exception:
+                    time.sleep(self.poll_sec)
+                    continue
+                h = getattr(img, "height", 0)
+                w = getattr(img, "width", 0)
+                if h == 0 or w == 0:
+                    time.sleep(self.poll_sec)
+                    continue
+                src = np.asarray(img, dtype=np.uint8).reshape(h, w, 4)
+                with self._ring_lock:
+                    if not self._ring or self._ring[0].shape[:2] != (h, w):
+                        self._alloc_ring(h, w)
+                    idx = (self._latest_idx + 1) % self._ring_size
+                # zapis poza blokadą – konsumenci czytają tylko ``_latest_idx``
+                np.copyto(self._ring[idx], src)
+                with self._ring_lock:
+                    self._seq += 1
+                    self._ring_ts[idx] = t0
+                    self._ring_seq[idx] = self._seq
+                    self._latest_idx = idx
+                if self._stream_fps:
+                    dt = time.time() - t0
+                    period = 1.0 / self._stream_fps
+                    if dt < period:
+                        self._stream_stop.wait(period - dt)
+        finally:
+            try:
+                sct.close()
+            except Exception:
+                pass
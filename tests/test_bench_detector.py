@@ -0,0 +1,86 @@
+import importlib
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.modules.pop("numpy", None)
+np = importlib.import_module("numpy")
+
+pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+
+
+@pytest.fixture
+def bench(monkeypatch):
+    """Moduł benchmarku z prawdziwym cv2 (inne testy podmieniają go stubem)."""
+    import agent
+    import recorder
+
+    fresh = ("agent.detector", "recorder.frame_source", "tools.bench_detector")
+    # import podmienia też atrybuty pakietów – przywracane po teście
+    for pkg, name in ((agent, "detector"), (recorder, "frame_source")):
+        monkeypatch.setattr(pkg, name, getattr(pkg, name, None), raising=False)
+    for name in ("cv2",) + fresh:
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    yield importlib.import_module("tools.bench_detector")
+    for name in fresh:
+        sys.modules.pop(name, None)
+
+
+def test_bench_stub_model_reports_latency_and_json(bench, tmp_path):
+    cv2 = importlib.import_module("cv2")
+    frames_dir = tmp_path / "frames"
+    frames_dir.mkdir()
+    rng = np.random.default_rng(0)
+    for i in range(5):
+        img = rng.integers(0, 255, (120, 200, 3), dtype=np.uint8)
+        cv2.imwrite(str(frames_dir / f"{i:03d}.png"), img)
+    out = tmp_path / "bench.json"
+    bench.main(
+        [
+            str(frames_dir),
+            "--imgsz",
+            "64",
+            "--batch",
+            "1",
+            "2",
+            "--warmup",
+            "1",
+            "--out",
+            str(out),
+            "--no-isolate",
+        ]
+    )
+    report = json.loads(out.read_text())
+    assert [r["batch"] for r in report["results"]] == [1, 2]
+    for r in report["results"]:
+        assert "error" not in r
+        assert r["backend"] == "onnx" and r["model"] == "stub"
+        assert r["frames"] == 5 and r["frame_size"] == [120, 200]
+        assert 0 < r["p50_ms"] <= r["p95_ms"] <= r["p99_ms"]
+        assert r["fps"] > 0 and r["model_ms"] > 0
+        assert r["peak_rss_mb"] > 0
+
+
+def test_dynamic_stub_scale_shrinks_model_input(bench, tmp_path):
+    detector = importlib.import_module("agent.detector")
+    frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+    shapes = {}
+    for dynamic in (False, True):
+        path = bench.make_stub_model(
+            tmp_path / f"m{dynamic}.onnx", 640, dynamic=dynamic
+        )
+        det = detector.ObjectDetector(str(path), shared=False, dynamic_resize=True)
+        det.resolution = detector.ResolutionController(min_scale=0.5, max_scale=0.5)
+        run = det.model.session.run
+        seen = shapes[dynamic] = []
+        det.model.session.run = lambda out, feed: seen.append(
+            next(iter(feed.values())).shape
+        ) or run(out, feed)
+        det.infer(frame)
+    # stałe wejście – regulator wyłączony; dynamiczne – połowa ``imgsz``
+    assert shapes[False] == [(1, 3, 640, 640)]
+    assert shapes[True] == [(1, 3, 192, 320)]
@@ -0,0 +1,197 @@
+import importlib
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.modules.pop("numpy", None)
+np = importlib.import_module("numpy")
+
+from agent.broker import FrameBroker
+
+
+class _Source:
+    def __init__(self):
+        self.grabs = 0
+
+    def grab_bgr(self, out=None):
+        self.grabs += 1
+        return np.full((4, 4, 3), self.grabs, dtype=np.uint8)
+
+
+class _Detector:
+    def __init__(self):
+        self.calls = 0
+
+    def infer(self, frame):
+        self.calls += 1
+        return [{"name": "metin", "bbox": [0, 0, 1, 1], "conf": 0.9}]
+
+
+def test_current_reuses_fresh_tick():
+    src, det = _Source(), _Detector()
+    broker = FrameBroker(src, det, max_age=10.0)
+    t1 = broker.tick()
+    t2 = broker.current()
+    assert t2 is t1
+    assert det.calls == 1 and src.grabs == 1
+    t3 = broker.current(max_age=-1)
+    assert t3.seq == t1.seq + 1
+    assert det.calls == 2
+
+
+def test_current_ticks_when_empty_and_notifies_subscribers():
+    broker = FrameBroker(_Source(), _Detector(), max_age=10.0)
+    seen = []
+    unsubscribe = broker.subscribe(seen.append)
+    t = broker.current()
+    assert seen == [t]
+    unsubscribe()
+    broker.tick()
+    assert len(seen) == 1
+
+
+class _SizeDetector:
+    """Zwraca cel w środku podanego obrazu (w jego współrzędnych)."""
+
+    def __init__(self):
+        self.shapes = []
+
+    def infer(self, frame, force=False):
+        self.shapes.append(frame.shape[:2])
+        h, w = frame.shape[:2]
+        cx, cy = w / 2, h / 2
+        return [{"name": "metin", "bbox": [cx - 5, cy - 5, cx + 5, cy + 5]}]
+
+
+class _BigSource:
+    def grab_bgr(self, out=None):
+        return np.zeros((600, 800, 3), dtype=np.uint8)
+
+
+def test_focus_detects_in_crop_and_maps_back():
+    det = _SizeDetector()
+    broker = FrameBroker(_BigSource(), det, roi_pad=1.0, roi_min=64, full_every=3)
+    broker.tick()
+    assert det.shapes[-1] == (600, 800)
+    broker.focus({"name": "metin", "bbox": [100, 100, 120, 120]})
+    t = broker.tick()
+    assert det.shapes[-1] == (64, 64)
+    assert broker.roi == (78, 78, 64, 64)
+    # środek wycinka w układzie okna
+    assert t.dets[0]["bbox"] == [105.0, 105.0, 115.0, 115.0]
+    broker.tick()
+    broker.tick()
+    assert det.shapes[-1] == (64, 64)
+    broker.tick()
+    assert det.shapes[-1] == (600, 800)  # pełna klatka co ``full_every`` taktów
+    assert broker.roi is None
+
+
+def test_focus_falls_back_to_full_frame_when_target_lost():
+    det = _SizeDetector()
+    broker = FrameBroker(_BigSource(), det, roi_min=64, full_every=5)
+    broker.focus({"name": "boss", "bbox": [100, 100, 120, 120]})
+    broker.tick()
+    assert det.shapes == [(64, 64), (600, 800)]
+    broker.focus(None)
+    broker.tick()
+    assert det.shapes[-1] == (600, 800)
+
+
+class _Throttled(_SizeDetector):
+    """Jak ``ObjectDetector`` z ``max_fps``: bez ``force`` – poprzedni wynik."""
+
+    def __init__(self):
+        super().__init__()
+        self.last = None
+        self.forced = []
+
+    def infer(self, frame, force=False):
+        if self.last is not None and not force:
+            return self.last
+        self.forced.append(force)
+        self.last = super().infer(frame)
+        return self.last
+
+
+def test_lost_target_full_pass_bypasses_throttle():
+    det = _Throttled()
+    broker = FrameBroker(_BigSource(), det, roi_min=64, full_every=5)
+    broker.focus({"name": "boss", "bbox": [100, 100, 120, 120]})
+    t = broker.tick()
+    # wycinek bez celu – pełna klatka liczona mimo limitu, nie wynik wycinka
+    assert det.shapes == [(64, 64), (600, 800)] and det.forced == [False, True]
+    assert t.dets[0]["bbox"] == [395.0, 295.0, 405.0, 305.0]
+    assert broker._since_full == 0
+
+
+def test_throttled_full_pass_does_not_reset_counter():
+    det = _Throttled()
+    broker = FrameBroker(_BigSource(), det, roi_min=64, full_every=1)
+    broker.focus({"name": "metin", "bbox": [100, 100, 120, 120]})
+    broker.tick()  # wycinek
+    assert det.shapes == [(64, 64)] and broker._since_full == 1
+    broker.tick()  # pełna detekcja zdławiona – wynik z pamięci
+    assert det.shapes == [(64, 64)] and broker._since_full == 1
+    det.last = None
+    broker.tick()
+    assert det.shapes[-1] == (600, 800) and broker._since_full == 0
+
+
+def test_invalidate_drops_focus():
+    det = _SizeDetector()
+    broker = FrameBroker(_BigSource(), det, roi_min=64, full_every=5)
+    broker.focus({"name": "metin", "bbox": [100, 100, 120, 120]})
+    broker.tick()
+    assert det.shapes[-1] == (64, 64)
+    broker.invalidate()
+    broker.tick()
+    assert det.shapes[-1] == (600, 800) and broker.roi is None
+
+
+class _StaticInput(_SizeDetector):
+    dynamic_input = False
+
+
+def test_roi_disabled_for_static_input_detector():
+    det = _StaticInput()
+    broker = FrameBroker(_BigSource(), det, roi_min=64, full_every=5)
+    broker.focus({"name": "metin", "bbox": [100, 100, 120, 120]})
+    broker.tick()
+    assert broker.full_every == 0 and det.shapes == [(600, 800)]
+
+
+class _AsyncLike:
+    """Zwraca stary wynik z ``infer``, świeży dopiero z ``detect``."""
+
+    def __init__(self):
+        self.stale = [{"name": "metin", "bbox": [0, 0, 1, 1], "conf": 0.9}]
+        self.detected = []
+        self.invalidated = 0
+
+    def submit(self, frame):
+        return 1
+
+    def infer(self, frame):
+        return self.stale
+
+    def detect(self, frame, timeout=None):
+        self.detected.append((int(frame[0, 0, 0]), timeout))
+        return []
+
+    def invalidate(self):
+        self.invalidated += 1
+
+
+def test_fresh_waits_for_new_frame_detections():
+    det = _AsyncLike()
+    broker = FrameBroker(_Source(), det, max_age=10.0)
+    assert broker.current().dets == det.stale
+    broker.invalidate()
+    assert det.invalidated == 1 and broker.last is None
+    t = broker.fresh(timeout=0.5)
+    assert t.dets == [] and det.detected == [(2, 0.5)]
+    assert broker.last is t
+    # zwykły detektor – ``fresh`` to nowy takt
+    plain = FrameBroker(_Source(), _Detector(), max_age=10.0)
+    assert plain.fresh().seq == 1 and plain.fresh().seq == 2
@@ -31,6 +31,13 @@ class WindowCapture:
     def grab(self):
         return np.zeros((300, 300, 4), dtype=np.uint8)
 
+    def grab_bgr(self, out=None):
+        return self.grab()[:, :, :3]
+
+    def grab_roi(self, roi):
+        x, y, w, h = roi
+        return self.grab_bgr()[y : y + h, x : x + w]
+
     def focus(self):
         pass
 
@@ -51,6 +58,9 @@ class _TM:
     def find(self, *a, **k):
         return None
 
+    def find_many(self, frame, names, **k):
+        return dict.fromkeys(names)
+
 
 tm_stub.TemplateMatcher = _TM
 sys.modules.setdefault("agent.template_matcher", tm_stub)
@@ -65,6 +75,13 @@ class DummyWin:
     def grab(self):
         return np.zeros((300, 300, 4), dtype=np.uint8)
 
+    def grab_bgr(self, out=None):
+        return self.grab()[:, :, :3]
+
+    def grab_roi(self, roi):
+        x, y, w, h = roi
+        return self.grab_bgr()[y : y + h, x : x + w]
+
     def focus(self):
         pass
 
@@ -166,6 +183,37 @@ def test_switch_uses_keys_when_not_found(tmp_path, monkeypatch):
     assert focuses, "focus should be called before sending keys"
 
 
+def test_current_channel_guess_matches_all_buttons_at_once(tmp_path, monkeypatch):
+    _setup_templates(tmp_path)
+    calls = []
+
+    class TM:
+        def __init__(self, *a, **k):
+            pass
+
+        def find_many(self, frame, names, **kw):
+            calls.append((frame.shape, list(names), kw["origin"]))
+            return {
+                n: (
+                    {"rect": (250, 30, 10, 10), "center": (255, 35), "score": 0.9}
+                    if n == "ch4"
+                    else None
+                )
+                for n in names
+            }
+
+    class Win(DummyWin):
+        def grab(self):
+            img = np.zeros((300, 300, 4), dtype=np.uint8)
+            img[35, 255, :3] = (255, 210, 0)
+            return img
+
+    monkeypatch.setattr(channel, "TemplateMatcher", TM)
+    cs = channel.ChannelSwitcher(Win(), str(tmp_path), dry=True)
+    assert cs.current_channel_guess() == 4
+    assert calls == [((240, 240, 3), [f"ch{i}" for i in range(1, 9)], (40, 20))]
+
+
 def test_next_wraps(tmp_path):
     _setup_templates(tmp_path)
     cs = channel.ChannelSwitcher(DummyWin(), str(tmp_path), dry=True)
@@ -211,3 +259,23 @@ def test_cycle_until_target_seen(tmp_path, monkeypatch):
         is True
     )
     assert switched == [2, 3]
+
+
+def test_find_button_without_frame_grabs_roi(tmp_path, monkeypatch):
+    _setup_templates(tmp_path)
+    seen = {}
+
+    class TM:
+        def __init__(self, *a, **k):
+            pass
+
+        def find(self, frame, name, **kw):
+            seen["shape"] = frame.shape
+            seen["origin"] = kw.get("origin")
+            return None
+
+    monkeypatch.setattr(channel, "TemplateMatcher", TM)
+    cs = channel.ChannelSwitcher(DummyWin(), str(tmp_path), dry=True)
+    assert cs.find_button(None, 2) is None
+    assert seen["shape"] == (240, 240, 3)
+    assert seen["origin"] == (40, 20)
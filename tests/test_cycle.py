@@ -0,0 +1,149 @@
+import importlib
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.modules.setdefault("yaml", types.ModuleType("yaml"))
+sys.modules.pop("numpy", None)
+np = importlib.import_module("numpy")
+
+pyautogui_stub = types.ModuleType("pyautogui")
+pyautogui_stub.moveTo = lambda *a, **k: None
+pyautogui_stub.click = lambda *a, **k: None
+pyautogui_stub.PAUSE = 0
+sys.modules.setdefault("pyautogui", pyautogui_stub)
+
+from agent.targets import Detection
+
+
+class _Stub:
+    def __init__(self, *a, **k):
+        pass
+
+
+@pytest.fixture
+def cycle_mod(monkeypatch):
+    """``agent.cycle`` ze stubami ``agent.teleport``/``agent.channel``.
+
+    Prawdziwe moduły wymagają PIL, easyocr i szablonów; moduły zaimportowane
+    na potrzeby testu są usuwane po nim, a poprzednie przywracane.
+    """
+    import agent
+
+    for name in ("teleport", "channel"):
+        stub = types.ModuleType(f"agent.{name}")
+        stub.Teleporter = stub.ChannelSwitcher = _Stub
+        monkeypatch.setitem(sys.modules, f"agent.{name}", stub)
+    fresh = ("agent.cycle", "agent.hunt_destroy", "agent.search")
+    for name in fresh:
+        monkeypatch.setattr(agent, name[6:], getattr(agent, name[6:], None), False)
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    yield importlib.import_module("agent.cycle")
+    for name in fresh:
+        sys.modules.pop(name, None)
+
+
+class _Win:
+    region = (0, 0, 100, 100)
+
+    def grab_bgr(self, out=None):
+        return np.zeros((100, 100, 3), dtype=np.uint8)
+
+    def is_foreground(self):
+        return True
+
+    def close(self):
+        pass
+
+
+class _Keys:
+    def __init__(self, *a, **k):
+        self.down = set()
+
+    def press(self, key):
+        self.down.add(key)
+
+    def release(self, key):
+        self.down.discard(key)
+
+    def release_all(self):
+        self.down.clear()
+
+    def stop(self):
+        pass
+
+
+class _Avoid:
+    def steer(self, frame):
+        return None
+
+
+def _farm(cycle, monkeypatch, log):
+    """``CycleFarm`` z licznikiem inferencji; zdarzenia trafiają do ``log``."""
+    hd = sys.modules["agent.hunt_destroy"]
+
+    class CountingDetector:
+        def __init__(self, *a, **k):
+            pass
+
+        def infer(self, frame):
+            log.append("infer")
+            return [Detection("metin", [40.0, 40.0, 60.0, 60.0], 0.9)]
+
+        def invalidate(self):
+            log.append("invalidate")
+
+    class Teleporter(_Stub):
+        def teleport_slot(self, slot, page_label):
+            log.append(("tp", slot))
+
+    class Switcher(_Stub):
+        def switch(self, ch, post_wait=None):
+            log.append(("switch", ch))
+
+    monkeypatch.setattr(hd, "ObjectDetector", CountingDetector)
+    monkeypatch.setattr(hd, "CollisionAvoid", _Avoid)
+    monkeypatch.setattr(hd, "KeyHold", _Keys)
+    monkeypatch.setattr(hd, "click_bbox_center", lambda *a, **k: None)
+    for mod in (hd, cycle):
+        monkeypatch.setattr(mod, "Teleporter", Teleporter)
+        monkeypatch.setattr(mod, "ChannelSwitcher", Switcher)
+    monkeypatch.setattr(cycle, "KeyHold", _Keys)
+    cfg = {
+        "paths": {"model": "", "templates_dir": ""},
+        "detector": {"classes": ["metin"], "max_age": 60.0},
+        "policy": {"desired_box_w": 0.2, "deadzone_x": 0.1},
+        "scan": {"enabled": False},
+        "cooldowns": {"slot_min": 0},
+        "dry_run": True,
+    }
+    return cycle.CycleFarm(cfg, source=_Win())
+
+
+def test_one_inference_per_hunting_tick_and_fresh_after_switch(cycle_mod, monkeypatch):
+    log = []
+    farm = _farm(cycle_mod, monkeypatch, log)
+    # zegar cyklu: po trzech taktach polowania czas na spocie mija
+    clock = {"t": 0.0}
+    monkeypatch.setattr(
+        cycle_mod, "time", types.SimpleNamespace(time=lambda: clock["t"])
+    )
+    step = farm.agent.step
+
+    def counted_step():
+        log.append("step")
+        step()
+        if log.count("step") % 3 == 0:
+            clock["t"] += 1000.0
+
+    farm.agent.step = counted_step
+    farm.run("I", 1, 2, [1], per_spot_sec=100, clear_sec=50)
+
+    # zmiana kanału i teleport unieważniają wynik detektora, decyzja
+    # o polowaniu zapada na nowej inferencji, a każdy takt polowania
+    # (``step`` + sprawdzenie celu przez ``broker.current``) to jedna inferencja
+    spot = ["invalidate", ("tp", 1), "invalidate", "infer"] + ["step", "infer"] * 3
+    assert log == [("switch", 1)] + spot + [("switch", 2)] + spot
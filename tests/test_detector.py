@@ -4,6 +4,8 @@ import sys
 import types
 from unittest.mock import patch
 
+import pytest
+
 sys.modules.pop("numpy", None)
 np = importlib.import_module("numpy")
 
@@ -13,9 +15,15 @@ sys.modules.setdefault("yaml", types.ModuleType("yaml"))
 # Provide minimal cv2 stub with ``resize`` so ObjectDetector can downscale frames
 sys.modules["cv2"] = types.SimpleNamespace(
     setNumThreads=lambda *a, **k: None,
-    resize=lambda img, size: np.zeros(
+    resize=lambda img, size, **k: np.zeros(
         (size[1], size[0], img.shape[2]), dtype=img.dtype
     ),
+    copyMakeBorder=lambda img, t, b, left, r, *a, **k: np.pad(
+        img, ((t, b), (left, r), (0, 0)), constant_values=114
+    ),
+    BORDER_CONSTANT=0,
+    INTER_LINEAR=1,
+    INTER_AREA=3,
 )
 
 # Provide a minimal ultralytics stub so agent.detector can be imported
@@ -34,6 +42,19 @@ ultra_stub.YOLO = _StubYOLO
 sys.modules.setdefault("ultralytics", ultra_stub)
 
 import agent.detector as detector
+from agent.targets import Detection
+
+
+def _plain(dets):
+    """Detekcje jako słowniki ``{"name", "bbox", "conf"}`` do porównań."""
+    return [{"name": d.name, "bbox": d.bbox, "conf": d.conf} for d in dets]
+
+
+@pytest.fixture(autouse=True)
+def _fresh_model_registry():
+    detector.clear_model_cache()
+    yield
+    detector.clear_model_cache()
 
 
 class FakeTensor:
@@ -60,13 +81,31 @@ class FakeBox:
         self.conf = FakeTensor(conf)
 
 
+class FakeBoxes(list):
+    """Mimics ``ultralytics.engine.results.Boxes`` (iterable + batched tensors)."""
+
+    @property
+    def xyxy(self):
+        return FakeTensor([b.xyxy.value[0] for b in self])
+
+    @property
+    def conf(self):
+        return FakeTensor([b.conf.value for b in self])
+
+    @property
+    def cls(self):
+        return FakeTensor([b.cls.value for b in self])
+
+
 class FakeResult:
     def __init__(self):
         self.names = {0: "metin", 1: "boss"}
-        self.boxes = [
-            FakeBox(0, [10, 20, 30, 40], 0.9),
-            FakeBox(1, [50, 60, 70, 80], 0.8),
-        ]
+        self.boxes = FakeBoxes(
+            [
+                FakeBox(0, [10, 20, 30, 40], 0.9),
+                FakeBox(1, [50, 60, 70, 80], 0.8),
+            ]
+        )
 
 
 def test_infer_filters_classes():
@@ -76,7 +115,7 @@ def test_infer_filters_classes():
         model.predict.return_value = [FakeResult()]
         det = detector.ObjectDetector("model.pt", classes=["boss"])
         out = det.infer(frame)
-    assert out == [{"name": "boss", "bbox": [50.0, 60.0, 70.0, 80.0], "conf": 0.8}]
+    assert out == [Detection("boss", [50.0, 60.0, 70.0, 80.0], 0.8, 1)]
 
 
 def test_infer_rate_limited():
@@ -87,18 +126,392 @@ def test_infer_rate_limited():
         det = detector.ObjectDetector("model.pt", max_fps=1)
         out1 = det.infer(frame)
         out2 = det.infer(frame)
-    # predict should be called only once due to FPS limiting
-    assert model.predict.call_count == 1
-    assert out1 == out2
+        # predict should be called only once due to FPS limiting
+        assert model.predict.call_count == 1
+        assert out1 == out2
+        # ``force`` omija limit (pełna detekcja po zgubieniu celu)
+        det.infer(frame, force=True)
+    assert model.predict.call_count == 2
 
 
-def test_infer_resizes_when_scaled():
-    frame = np.zeros((20, 20, 3), dtype=np.uint8)
+def test_invalidate_drops_throttled_and_gated_result():
+    frame = np.zeros((10, 10, 3), dtype=np.uint8)
+    with patch("agent.detector.YOLO") as MockYOLO:
+        model = MockYOLO.return_value
+        model.predict.return_value = [FakeResult()]
+        det = detector.ObjectDetector("model.pt", max_fps=1, gate_thr=2.0)
+        before = det.infer(frame)
+        assert det.infer(frame) is before
+        det.invalidate()
+        assert det.infer(frame) is not before
+        assert model.predict.call_count == 2
+        # bramka bez klatki odniesienia – nie zwraca wyniku sprzed zmiany sceny
+        assert (det.gate.hits, det.gate.misses) == (0, 2)
+
+
+def test_infer_batch_keeps_throttled_full_frame_result():
+    frame = np.zeros((640, 640, 3), dtype=np.uint8)
+    crops = [np.zeros((64, 64, 3), dtype=np.uint8)]
+    full = FakeResult()
+    full.boxes = FakeBoxes([FakeBox(0, [500, 300, 520, 320], 0.9)])
+    crop = FakeResult()
+    crop.boxes = FakeBoxes([FakeBox(0, [5, 5, 25, 25], 0.9)])
+    with patch("agent.detector.YOLO") as MockYOLO:
+        model = MockYOLO.return_value
+        det = detector.ObjectDetector("model.pt", max_fps=1)
+        model.predict.return_value = [full]
+        out1 = det.infer(frame)
+        model.predict.return_value = [crop]
+        assert det.infer_batch(crops)[0][0]["bbox"] == [5.0, 5.0, 25.0, 25.0]
+        out2 = det.infer(frame)
+    assert model.predict.call_count == 2
+    assert out2 == out1
+    assert out2[0]["bbox"] == [500.0, 300.0, 520.0, 320.0]
+
+
+def test_infer_scales_model_input_not_frame():
+    # skala zmienia ``imgsz`` modelu (wyrównane do 32), klatka idzie bez zmian
+    frame = np.zeros((720, 1280, 3), dtype=np.uint8)
     with patch("agent.detector.YOLO") as MockYOLO:
         model = MockYOLO.return_value
         model.predict.return_value = [FakeResult()]
         det = detector.ObjectDetector("model.pt", dynamic_resize=True)
+        det.infer(frame)
+        assert model.predict.call_args.kwargs["imgsz"] == 640
         det.scale = 0.5
-        with patch("agent.detector.cv2.resize", wraps=detector.cv2.resize) as m_resize:
-            det.infer(frame)
-            assert m_resize.called
+        with patch("agent.detector.cv2.resize") as m_resize:
+            out = det.infer(frame)
+            assert not m_resize.called
+    kwargs = model.predict.call_args.kwargs
+    assert kwargs["imgsz"] == 320 and kwargs["source"] is frame
+    # współrzędne z modelu już w układzie klatki
+    assert out[0]["bbox"] == [10.0, 20.0, 30.0, 40.0]
+
+
+def test_static_input_disables_dynamic_resize(monkeypatch):
+    pred = np.zeros((1, 6, 1), dtype=np.float32)
+    monkeypatch.setitem(sys.modules, "onnxruntime", _fake_onnxruntime(pred))
+    det = detector.ObjectDetector("model.onnx", dynamic_resize=True)
+    assert not det.dynamic_resize and det.scale == 1.0
+
+
+def test_resolution_controller_smooths_and_snaps_to_stride():
+    rc = detector.ResolutionController(target=0.1, min_scale=0.5, patience=3)
+    # pojedynczy wolny pomiar nie zmienia skali
+    rc.update(0.1)
+    rc.update(0.1)
+    rc.update(0.18)
+    assert rc.scale == 1.0
+    # pomiary w martwej strefie też nie
+    for _ in range(10):
+        rc.update(0.105)
+    assert rc.scale == 1.0 and rc.changes == 0
+    for _ in range(6):
+        rc.update(0.3)
+    assert 0.5 <= rc.scale < 1.0
+    assert rc.input_size(640) == max(32, round(640 * rc.scale / 32) * 32)
+    assert rc.input_size(640) % 32 == 0 and rc.input_size(640) < 640
+    for _ in range(100):
+        rc.update(0.01)
+    assert rc.scale == 1.0
+    assert rc.input_size(640) == 640
+    assert rc.stats["samples"] == 119
+
+
+def test_frame_gate_reuses_result_for_unchanged_frames():
+    # prawdziwe ``resize`` zastąpione uśrednianiem bloków (stub cv2 zwraca zera)
+    def _resize(img, size, **k):
+        w, h = size
+        H, W = img.shape[:2]
+        return img.reshape(h, H // h, w, W // w, -1).mean(axis=(1, 3))
+
+    frame = np.zeros((36, 64, 3), dtype=np.uint8)
+    with patch("agent.detector.YOLO") as MockYOLO, patch(
+        "agent.detector.cv2.resize", _resize
+    ), patch("agent.detector.time.time") as clock:
+        model = MockYOLO.return_value
+        model.predict.return_value = [FakeResult()]
+        det = detector.ObjectDetector("model.pt", gate_thr=2.0, gate_max_age=1.0)
+        clock.return_value = 0.0
+        first = det.infer(frame)
+        clock.return_value = 0.5
+        noisy = frame.copy()
+        noisy[0, 0] = 50  # drobna zmiana – poniżej progu
+        assert det.infer(noisy) is first
+        assert model.predict.call_count == 1
+        changed = np.full_like(frame, 40)
+        det.infer(changed)
+        assert model.predict.call_count == 2
+        clock.return_value = 2.0  # wynik za stary mimo braku zmian
+        det.infer(changed)
+        assert model.predict.call_count == 3
+    assert (det.gate.hits, det.gate.misses) == (1, 3)
+
+
+def test_detectors_share_loaded_model():
+    with patch("agent.detector.YOLO") as MockYOLO:
+        a = detector.ObjectDetector("model.pt", classes=["boss"])
+        b = detector.ObjectDetector("model.pt", classes=["metin"], conf=0.3)
+        c = detector.ObjectDetector("model.pt", device="cpu")
+        d = detector.ObjectDetector("model.pt", shared=False)
+    assert a.model is b.model
+    assert a._shared is b._shared
+    assert c.model is not None and c._shared is not a._shared
+    assert d._shared is not a._shared
+    # jedna kopia dla (model.pt, None) i jedna dla (model.pt, cpu) + prywatna
+    assert MockYOLO.call_count == 3
+    assert len(detector.loaded_models()) == 2
+
+
+def _fake_onnxruntime(output, shape=(1, 3, 64, 64), feeds=None):
+    class _Session:
+        def __init__(self, path, sess_options=None, providers=None):
+            self.providers = providers
+
+        def get_inputs(self):
+            return [
+                types.SimpleNamespace(
+                    name="images", type="tensor(float)", shape=list(shape)
+                )
+            ]
+
+        def get_modelmeta(self):
+            return types.SimpleNamespace(
+                custom_metadata_map={"names": "{0: 'metin', 1: 'boss'}"}
+            )
+
+        def run(self, outputs, inputs):
+            if feeds is None:
+                assert inputs["images"].shape == (1, 3, 64, 64)
+            else:
+                feeds.append(inputs["images"].shape)
+            return [np.repeat(output, len(inputs["images"]), axis=0)]
+
+    return types.SimpleNamespace(
+        SessionOptions=types.SimpleNamespace,
+        InferenceSession=_Session,
+        get_available_providers=lambda: ["CPUExecutionProvider"],
+    )
+
+
+def test_onnx_backend_letterbox_nms_and_filtering(monkeypatch):
+    # wyjście YOLOv8 (1, 4 + nc, N) w układzie wejścia 64x64 po letterboxie
+    pred = np.zeros((1, 6, 3), dtype=np.float32)
+    pred[0, :5, 0] = [32, 32, 20, 10, 0.9]
+    pred[0, :5, 1] = [33, 32, 20, 10, 0.8]  # nakłada się na 0 -> NMS
+    pred[0, [0, 1, 2, 3, 5], 2] = [10, 40, 8, 8, 0.7]
+    monkeypatch.setitem(sys.modules, "onnxruntime", _fake_onnxruntime(pred))
+    frame = np.zeros((32, 64, 3), dtype=np.uint8)  # pad 16 px u góry
+
+    det = detector.ObjectDetector("model.onnx")
+    assert det.backend == "onnx"
+    assert _plain(det.infer(frame)) == [
+        {"name": "metin", "bbox": [22.0, 11.0, 42.0, 21.0], "conf": 0.8999999761581421},
+        {"name": "boss", "bbox": [6.0, 20.0, 14.0, 28.0], "conf": 0.699999988079071},
+    ]
+    boss_only = detector.ObjectDetector("model.onnx", classes=["boss"])
+    assert [d["name"] for d in boss_only.infer(frame)] == ["boss"]
+
+
+def test_dynamic_onnx_input_sized_from_image(monkeypatch):
+    feeds = []
+    pred = np.zeros((1, 6, 1), dtype=np.float32)
+    shape = ("batch", 3, "height", "width")
+    monkeypatch.setitem(
+        sys.modules, "onnxruntime", _fake_onnxruntime(pred, shape, feeds)
+    )
+    det = detector.ObjectDetector("model.onnx")
+    assert det.dynamic_input and det.imgsz == 640
+    det.infer(np.zeros((720, 1280, 3), dtype=np.uint8))
+    det.infer(np.zeros((60, 100, 3), dtype=np.uint8))
+    assert feeds == [(1, 3, 384, 640), (1, 3, 96, 128)]
+    # wycinki różnej wielkości – osobne przebiegi, bez powiększania do 640
+    feeds.clear()
+    crops = [np.zeros((s, s, 3), dtype=np.uint8) for s in (160, 100, 160)]
+    assert len(det.infer_batch(crops)) == 3
+    assert sorted(feeds) == [(1, 3, 128, 128), (2, 3, 160, 160)]
+
+
+def test_static_onnx_input_keeps_model_size(monkeypatch):
+    feeds = []
+    pred = np.zeros((1, 6, 1), dtype=np.float32)
+    monkeypatch.setitem(
+        sys.modules, "onnxruntime", _fake_onnxruntime(pred, (1, 3, 64, 64), feeds)
+    )
+    det = detector.ObjectDetector("model.onnx")
+    assert not det.dynamic_input and det.imgsz == 64
+    det.infer(np.zeros((20, 30, 3), dtype=np.uint8))
+    assert feeds == [(1, 3, 64, 64)]
+
+
+def test_class_filter_and_per_class_conf_applied_before_nms(monkeypatch):
+    pred = np.zeros((1, 6, 2), dtype=np.float32)
+    pred[0, :, 0] = [32, 32, 20, 10, 0.9, 0.6]  # metin wygrywa argmax, boss 0.6
+    pred[0, [0, 1, 2, 3, 5], 1] = [10, 40, 8, 8, 0.7]
+    monkeypatch.setitem(sys.modules, "onnxruntime", _fake_onnxruntime(pred))
+    frame = np.zeros((32, 64, 3), dtype=np.uint8)
+
+    boss_only = detector.ObjectDetector("model.onnx", classes=["boss"], conf=0.5)
+    out = boss_only.infer(frame)
+    # kotwica 0 liczona jako boss (filtr klas przed argmax/NMS)
+    assert [(d["name"], round(d["conf"], 2)) for d in out] == [
+        ("boss", 0.7),
+        ("boss", 0.6),
+    ]
+    strict = detector.ObjectDetector(
+        "model.onnx", conf=0.5, class_conf={"boss": 0.75, "metin": 0.85}
+    )
+    assert [d["name"] for d in strict.infer(frame)] == ["metin"]
+
+
+def test_ultralytics_receives_class_ids_and_min_conf():
+    frame = np.zeros((10, 10, 3), dtype=np.uint8)
+    with patch("agent.detector.YOLO") as MockYOLO:
+        model = MockYOLO.return_value
+        model.names = {0: "metin", 1: "boss"}
+        model.predict.return_value = [FakeResult()]
+        det = detector.ObjectDetector(
+            "model.pt", classes=["metin", "boss"], conf=0.5, class_conf={"boss": 0.85}
+        )
+        out = det.infer(frame)
+    kwargs = model.predict.call_args.kwargs
+    assert kwargs["classes"] == [0, 1]
+    assert kwargs["conf"] == 0.5
+    # próg ``boss`` 0.85 odrzuca ramkę 0.8 po stronie Pythona
+    assert [d["name"] for d in out] == ["metin"]
+
+
+def test_nms_keeps_other_classes():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 10, 10], [0, 0, 10, 10]], float)
+    scores = np.array([0.9, 0.8, 0.7])
+    assert detector.nms(boxes, scores, 0.5).tolist() == [0]
+    cls = np.array([0, 0, 1])
+    assert detector.nms(boxes, scores, 0.5, cls).tolist() == [0, 2]
+
+
+def test_infer_batch_single_pass_per_frame_results():
+    frames = [np.zeros((128, 128, 3), dtype=np.uint8) for _ in range(3)]
+    with patch("agent.detector.YOLO") as MockYOLO:
+        model = MockYOLO.return_value
+        model.predict.return_value = [FakeResult() for _ in frames]
+        det = detector.ObjectDetector(
+            "model.pt", classes=["metin"], dynamic_resize=True
+        )
+        det.scale = 0.5
+        outs = det.infer_batch(frames)
+    assert model.predict.call_count == 1
+    assert len(model.predict.call_args.kwargs["source"]) == 3
+    assert model.predict.call_args.kwargs["imgsz"] == 64
+    assert [_plain(o) for o in outs] == [
+        [{"name": "metin", "bbox": [10.0, 20.0, 30.0, 40.0], "conf": 0.9}]
+    ] * 3
+
+
+def test_tile_grid_covers_frame_with_overlap():
+    grid = detector.tile_grid((100, 200), (1, 2), overlap=0.2)
+    assert grid == [(0, 0, 112, 100), (88, 0, 112, 100)]
+    grid = detector.tile_grid((90, 90), (3, 3), overlap=0.0)
+    assert len(grid) == 9 and grid[-1] == (60, 60, 30, 30)
+
+
+def test_tiled_infer_batches_tiles_and_merges_with_nms():
+    class _TileResult:
+        def __init__(self, boxes):
+            self.names = {0: "metin"}
+            self.boxes = FakeBoxes([FakeBox(0, b, c) for b, c in boxes])
+
+    frame = np.zeros((100, 200, 3), dtype=np.uint8)
+    with patch("agent.detector.YOLO") as MockYOLO:
+        model = MockYOLO.return_value
+        # ten sam obiekt na styku kafli + osobny cel w drugim kaflu
+        model.predict.return_value = [
+            _TileResult([([90, 10, 110, 30], 0.9)]),
+            _TileResult([([2, 10, 22, 30], 0.7), ([50, 50, 60, 60], 0.8)]),
+        ]
+        det = detector.ObjectDetector(
+            "model.pt", classes=["metin"], tiles=(1, 2), tile_min=50
+        )
+        out = det.infer(frame)
+        small = det.infer(np.zeros((40, 40, 3), dtype=np.uint8), as_array=True)
+    crops = model.predict.call_args_list[0].kwargs["source"]
+    assert [c.shape for c in crops] == [(100, 112, 3)] * 2
+    assert _plain(out) == [
+        {"name": "metin", "bbox": [90.0, 10.0, 110.0, 30.0], "conf": 0.9},
+        {"name": "metin", "bbox": [138.0, 50.0, 148.0, 60.0], "conf": 0.8},
+    ]
+    # obraz mniejszy niż ``tile_min`` idzie do modelu w całości
+    assert model.predict.call_args.kwargs["source"].shape == (40, 40, 3)
+    assert len(small) == 1
+
+
+def test_infer_as_array_matches_detections():
+    frame = np.zeros((10, 10, 3), dtype=np.uint8)
+    with patch("agent.detector.YOLO") as MockYOLO:
+        model = MockYOLO.return_value
+        model.predict.return_value = [FakeResult()]
+        det = detector.ObjectDetector("model.pt", classes=["metin", "boss"])
+        arr = det.infer(frame, as_array=True)
+        dets = det.infer(frame)
+    assert arr.dtype == detector.DET_DTYPE
+    assert arr["cls"].tolist() == [0, 1]
+    assert arr["bbox"][1].tolist() == [50.0, 60.0, 70.0, 80.0]
+    assert det.to_detections(arr) == dets
+    assert dets[0] == Detection("metin", [10.0, 20.0, 30.0, 40.0], 0.9, 0)
+    assert det.to_dicts(arr) == _plain(dets)
+
+
+def test_async_detector_tags_results_with_frame_seq():
+    import threading
+
+    gate = threading.Event()
+
+    class _SlowDetector:
+        def __init__(self):
+            self.seen = []
+
+        def infer(self, frame):
+            gate.wait(1)
+            self.seen.append(int(frame[0, 0, 0]))
+            conf = float(frame[0, 0, 0])
+            return [{"name": "metin", "bbox": [0, 0, 1, 1], "conf": conf}]
+
+    inner = _SlowDetector()
+    det = detector.AsyncDetector(inner)
+    try:
+        assert det.latest().seq == 0
+        assert det.infer(np.full((2, 2, 3), 1, dtype=np.uint8)) == []
+        # kolejne klatki czekają – wątek weźmie tylko najnowszą
+        det.submit(np.full((2, 2, 3), 2, dtype=np.uint8))
+        last = det.submit(np.full((2, 2, 3), 3, dtype=np.uint8))
+        gate.set()
+        res = det.wait_for(last, timeout=2)
+        assert res.seq == last
+        assert res.dets[0]["conf"] == 3.0
+        assert 0 <= res.age < 2
+        assert 2 not in inner.seen
+    finally:
+        det.stop()
+
+
+def test_async_detector_detect_waits_and_invalidate_drops_stale():
+    class _Echo:
+        def infer(self, frame):
+            return [
+                {"name": "metin", "bbox": [0, 0, 1, 1], "conf": float(frame[0, 0, 0])}
+            ]
+
+    det = detector.AsyncDetector(_Echo())
+    try:
+        old = det.detect(np.full((2, 2, 3), 1, dtype=np.uint8), timeout=2)
+        assert old[0]["conf"] == 1.0
+        # stary wynik zwracany przez ``infer`` aż do unieważnienia
+        assert det.infer(np.full((2, 2, 3), 2, dtype=np.uint8))
+        det.wait_for(2, timeout=2)
+        det.invalidate()
+        out = det.infer(np.full((2, 2, 3), 3, dtype=np.uint8))
+        # nigdy wynik sprzed ``invalidate`` (klatka 3 mogła już zdążyć)
+        assert out == [] or out[0]["conf"] == 3.0
+        new = det.detect(np.full((2, 2, 3), 4, dtype=np.uint8), timeout=2)
+        assert new[0]["conf"] == 4.0
+    finally:
+        det.stop()
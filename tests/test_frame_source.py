@@ -0,0 +1,76 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+# Make repository root importable and restore real numpy/cv2 replaced by stubs
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+for _mod in ("numpy", "cv2", "recorder.frame_source"):
+    sys.modules.pop(_mod, None)
+np = importlib.import_module("numpy")
+cv2 = importlib.import_module("cv2")
+
+from recorder.frame_source import FrameSource, ReplaySource
+
+
+def _write_frames(tmp_path, n=3, size=(40, 30)):
+    w, h = size
+    for i in range(n):
+        img = np.full((h, w, 3), i * 10, dtype=np.uint8)
+        cv2.imwrite(str(tmp_path / f"f{i:03d}.png"), img)
+
+
+def test_folder_replay_is_deterministic(tmp_path):
+    _write_frames(tmp_path)
+    src = ReplaySource(tmp_path)
+    assert isinstance(src, FrameSource)
+    assert src.region == (0, 0, 40, 30)
+    assert len(src) == 3
+    vals = [int(src.grab_bgr()[0, 0, 0]) for _ in range(3)]
+    assert vals == [0, 10, 20]
+    with pytest.raises(EOFError):
+        src.grab()
+
+
+def test_folder_replay_loops_and_reuses_buffer(tmp_path):
+    _write_frames(tmp_path, n=2)
+    src = ReplaySource(tmp_path, loop=True, preload=True)
+    buf = np.empty((0, 0, 3), dtype=np.uint8)
+    vals = []
+    for _ in range(5):
+        buf = src.grab_bgr(buf)
+        vals.append(int(buf[0, 0, 0]))
+    assert vals == [0, 10, 0, 10, 0]
+
+
+def test_grab_roi_crops_current_frame(tmp_path):
+    _write_frames(tmp_path, n=2)
+    src = ReplaySource(tmp_path)
+    src.grab()
+    crop = src.grab_roi((5, 5, 10, 8))
+    assert crop.shape == (8, 10, 3)
+    assert src.index == 0
+    with pytest.raises(ValueError):
+        src.grab_roi((100, 100, 5, 5))
+
+
+def test_jsonl_resolves_to_video(tmp_path):
+    video = tmp_path / "rec_x.mp4"
+    vw = cv2.VideoWriter(str(video), cv2.VideoWriter_fourcc(*"mp4v"), 15, (32, 24))
+    if not vw.isOpened():
+        pytest.skip("mp4v codec unavailable")
+    for i in range(4):
+        vw.write(np.full((24, 32, 3), 60 * i, dtype=np.uint8))
+    vw.release()
+    (tmp_path / "rec_x.jsonl").write_text("")
+    src = ReplaySource(tmp_path / "rec_x.jsonl")
+    assert src.region == (0, 0, 32, 24)
+    frames = []
+    while True:
+        try:
+            frames.append(src.grab_bgr())
+        except EOFError:
+            break
+    assert len(frames) == 4
+    src.close()
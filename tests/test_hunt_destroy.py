@@ -73,6 +73,7 @@ channel_mod.ChannelSwitcher = _DummyChannelSwitcher
 sys.modules["agent.channel"] = channel_mod
 
 import agent.hunt_destroy as hd
+from agent.targets import Detection
 
 
 class _StubKeyHold:
@@ -109,7 +110,7 @@ class _DummyDetector:
         else:
             bbox = (30, 40, 40, 60)
         self.calls += 1
-        return [{"name": "enemy", "bbox": bbox}]
+        return [Detection("enemy", bbox)]
 
 
 class _DummyAvoid:
@@ -142,6 +143,9 @@ class _DummyWin:
     def grab(self):
         return np.zeros((100, 100, 3), dtype=np.uint8)
 
+    def grab_bgr(self, out=None):
+        return self.grab()
+
     def is_foreground(self):
         return True
 
@@ -213,3 +217,39 @@ def test_scan_no_target(monkeypatch):
     assert agent.keys.down == set()
     assert agent.keys.pressed == [agent.scanner.spin_key]
     assert agent.keys.released == [agent.scanner.spin_key]
+
+
+def test_scene_change_resets_tracker_and_broker(monkeypatch):
+    monkeypatch.setattr(hd, "ObjectDetector", _DummyDetector)
+    monkeypatch.setattr(hd, "CollisionAvoid", lambda: _DummyAvoid())
+    monkeypatch.setattr(hd, "KeyHold", _StubKeyHold)
+    monkeypatch.setattr(hd, "pick_target", _pick_target)
+
+    class _MovingSearch(_StubSearch):
+        def handle_no_target(self, spin_done):
+            super().handle_no_target(spin_done)
+            return True  # teleport – nowa mapa
+
+    monkeypatch.setattr(hd, "SearchManager", _MovingSearch)
+    monkeypatch.setattr(hd, "AreaScanner", lambda *a, **k: _DummyAvoid())
+    cfg = {
+        "paths": {"model": "", "templates_dir": ""},
+        "detector": {"classes": [], "track": True, "track_max_age": 10.0},
+        "policy": {"desired_box_w": 0.2, "deadzone_x": 0.1},
+        "dry_run": True,
+    }
+    agent = hd.HuntDestroy(cfg, _DummyWin())
+    agent.step()
+    assert agent.tracker.tracks and agent.broker.last is not None
+
+    agent.invalidate()
+    assert agent.tracker.tracks == [] and agent.broker.last is None
+
+    # brak celu i ruch ``SearchManager`` – ślady z poprzedniej mapy znikają
+    agent.step()
+    assert agent.tracker.tracks
+    monkeypatch.setattr(agent.det, "infer", lambda frame: [])
+    agent.scanner.scan = lambda: None
+    agent.step()
+    assert agent.search.calls == 1
+    assert agent.tracker.tracks == [] and agent.broker.last is None
@@ -0,0 +1,143 @@
+import importlib
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+for _mod in ("numpy", "cv2", "agent.prefilter"):
+    sys.modules.pop(_mod, None)
+np = importlib.import_module("numpy")
+cv2 = importlib.import_module("cv2")
+
+from agent.prefilter import CascadeDetector, MotionColorPrefilter, merge_regions
+
+
+class _Detector:
+    def __init__(self):
+        self.full = 0
+        self.crops = []
+
+    def infer(self, frame):
+        self.full += 1
+        return [{"name": "metin", "bbox": [300, 200, 340, 240], "conf": 0.9}]
+
+    def infer_batch(self, frames):
+        self.crops.extend(f.shape[:2] for f in frames)
+        return [[{"name": "metin", "bbox": [10, 10, 50, 50], "conf": 0.8}]] * len(
+            frames
+        )
+
+
+def _frame():
+    return np.zeros((480, 640, 3), dtype=np.uint8)
+
+
+def test_merge_regions_joins_overlaps():
+    assert merge_regions([(0, 0, 10, 10), (5, 5, 10, 10), (50, 50, 5, 5)]) == [
+        (0, 0, 15, 15),
+        (50, 50, 5, 5),
+    ]
+
+
+def test_prefilter_motion_and_colour_cues():
+    pf = MotionColorPrefilter(hsv_ranges=[((0, 150, 150), (10, 255, 255))])
+    assert pf.regions(_frame()) is None  # brak poprzedniej klatki
+    assert pf.regions(_frame()) == []
+    moved = _frame()
+    moved[100:140, 200:260] = 255
+    ((x, y, w, h),) = pf.regions(moved)
+    assert x <= 200 and y <= 100 and x + w >= 260 and y + h >= 140
+    red = _frame()
+    red[300:340, 400:440] = (0, 0, 255)
+    pf.regions(red)
+    # plama koloru bez ruchu nadal jest wskazywana
+    assert len(pf.regions(red)) == 1
+    # ruch kamery (cała klatka) – filtr nie rozstrzyga
+    assert pf.regions(np.full((480, 640, 3), 200, dtype=np.uint8)) is None
+
+
+def test_cascade_skips_and_restricts_model_calls():
+    det = _Detector()
+    cas = CascadeDetector(det, full_every=100, min_side=64)
+    out = cas.infer(_frame())  # pierwsza klatka – pełna detekcja
+    assert det.full == 1 and out[0]["bbox"] == [300, 200, 340, 240]
+    # brak ruchu – tylko obszar ostatniej detekcji
+    out = cas.infer(_frame())
+    assert det.full == 1 and len(det.crops) == 1
+    assert out[0]["bbox"][0] >= 260
+    cas._last = []
+    assert cas.infer(_frame()) == []
+    assert cas.stats == {"full": 1, "regions": 1, "skipped": 1}
+
+
+def test_cascade_invalidate_forces_full_pass_and_forwards():
+    det = _Detector()
+    det.invalidated = 0
+    det.invalidate = lambda: setattr(det, "invalidated", det.invalidated + 1)
+    cas = CascadeDetector(det, full_every=100, min_side=64)
+    cas.infer(_frame())
+    cas.infer(_frame())
+    assert det.full == 1
+    cas.invalidate()
+    assert det.invalidated == 1
+    cas.infer(_frame())
+    assert det.full == 2
+
+
+def test_cascade_static_input_detector_gets_one_bounding_crop():
+    det = _Detector()
+    cas = CascadeDetector(det, full_every=100, min_side=64, max_region_cover=0.9)
+    cas.infer(_frame())
+    cas._last = []
+    moved = _frame()
+    moved[50:80, 50:80] = 255
+    moved[300:330, 500:530] = 255
+    cas.infer(moved)
+    # wejście stałe – jeden wycinek obejmujący oba obszary
+    ((h, w),) = det.crops
+    assert h >= 280 and w >= 480
+
+    det = _Detector()
+    det.dynamic_input = True
+    cas = CascadeDetector(det, full_every=100, min_side=64, max_region_cover=0.9)
+    cas.infer(_frame())
+    cas._last = []
+    cas.infer(moved)
+    assert len(det.crops) == 2 and all(max(c) < 160 for c in det.crops)
+
+
+def test_cascade_full_pass_with_throttled_detector_keeps_frame_coords(monkeypatch):
+    from types import SimpleNamespace
+
+    detector = importlib.import_module("agent.detector")
+
+    class _Model:
+        """Ramka zależna od wejścia: pełna klatka albo wycinek."""
+
+        def predict(self, source, **kw):
+            frames = source if isinstance(source, list) else [source]
+            out = []
+            for f in frames:
+                box = [500, 300, 520, 320] if f.shape[1] == 640 else [5, 5, 25, 25]
+                out.append(
+                    SimpleNamespace(
+                        xyxy=np.array([box], dtype=np.float64),
+                        conf=np.array([0.9]),
+                        cls=np.array([0]),
+                        names={0: "metin"},
+                    )
+                )
+            return out
+
+    monkeypatch.setattr(detector, "_load_model", lambda *a, **k: _Model())
+    inner = detector.ObjectDetector(
+        "stub.onnx", classes=["metin"], backend="onnx", shared=False, max_fps=0.01
+    )
+    cas = CascadeDetector(inner, full_every=2, min_side=64)
+    first = cas.infer(_frame())  # pełna detekcja
+    assert first[0]["bbox"] == [500, 300, 520, 320]
+    crops = cas.infer(_frame())  # tylko obszar ostatniej detekcji
+    assert cas.stats["regions"] == 1 and crops[0]["bbox"][0] >= 460
+    # pełny przebieg z limitem ``max_fps`` – wynik w układzie klatki
+    full = cas.infer(_frame())
+    assert cas.stats["full"] == 2
+    assert full[0]["bbox"] == [500, 300, 520, 320]
@@ -0,0 +1,77 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.modules.pop("numpy", None)
+np = importlib.import_module("numpy")
+
+pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime.quantization")
+
+
+@pytest.fixture
+def qmod(monkeypatch):
+    """``training.quantize_onnx`` z prawdziwym cv2 i yaml (inne testy stubują)."""
+    import agent
+    import training
+
+    fresh = ("agent.detector", "training.quantize_onnx", "tools.bench_detector")
+    for pkg, name in ((agent, "detector"), (training, "quantize_onnx")):
+        monkeypatch.setattr(pkg, name, getattr(pkg, name, None), raising=False)
+    for name in ("cv2", "yaml") + fresh:
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    yield importlib.import_module("training.quantize_onnx")
+    for name in fresh:
+        sys.modules.pop(name, None)
+
+
+def _images(cv2, folder, n=4):
+    folder.mkdir()
+    rng = np.random.default_rng(0)
+    for i in range(n):
+        img = rng.integers(0, 255, (120, 200, 3), dtype=np.uint8)
+        cv2.imwrite(str(folder / f"{i:03d}.png"), img)
+    return sorted(folder.iterdir())
+
+
+def test_quantized_stub_loads_in_object_detector(qmod, tmp_path):
+    bench = importlib.import_module("tools.bench_detector")
+    detector = importlib.import_module("agent.detector")
+    fp32 = bench.make_stub_model(tmp_path / "stub.onnx", imgsz=64)
+    images = _images(qmod.cv2, tmp_path / "frames")
+
+    out = qmod.quantize(fp32, tmp_path / "stub_int8.onnx", images)
+    assert out.exists() and not (tmp_path / "stub_int8_prep.onnx").exists()
+    det = detector.ObjectDetector(
+        str(out), classes=list(bench.STUB_CLASSES), backend="onnx", shared=False
+    )
+    # metadane eksportu (klasy, imgsz) przeniesione do modelu INT8
+    assert det.model.imgsz == (64, 64)
+    assert det.model.names == dict(enumerate(bench.STUB_CLASSES))
+    ops = {n.op_type for n in importlib.import_module("onnx").load(str(out)).graph.node}
+    assert "QuantizeLinear" in ops
+    assert isinstance(det.infer(qmod.cv2.imread(str(images[0]))), list)
+
+    stats = qmod.latency(out, images, warmup=1)
+    assert set(stats) == {"mean_ms", "p50_ms", "p95_ms", "fps"}
+    assert stats["fps"] > 0
+    assert qmod.latency(out, []) == {}
+
+
+def test_dataset_images_resolves_list_file_against_root(qmod, tmp_path):
+    root = tmp_path / "ds"
+    (root / "images").mkdir(parents=True)
+    (root / "train.txt").write_text("./images/a.png\n\n/abs/b.png\n")
+    (tmp_path / "data.yaml").write_text("path: ds\ntrain: train.txt\n")
+    images = qmod.dataset_images(str(tmp_path / "data.yaml"), "train")
+    assert images == [root / "images/a.png", qmod.Path("/abs/b.png")]
+
+
+def test_main_returns_nonzero_on_missing_inputs(qmod, tmp_path, caplog):
+    (tmp_path / "frames").mkdir()
+    argv = ["--weights", str(tmp_path / "m.onnx"), "--images"]
+    assert qmod.main(argv + [str(tmp_path / "frames")]) == 1
+    assert "Brak obrazów" in caplog.text
@@ -0,0 +1,62 @@
+import importlib
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.modules.pop("numpy", None)
+np = importlib.import_module("numpy")
+
+from agent.targets import Detection, pick_target, rank_table
+
+DET_DTYPE = np.dtype([("bbox", "f8", (4,)), ("conf", "f8"), ("cls", "i8")])
+
+
+def _dets():
+    return [
+        {"name": "potwory", "bbox": [480, 260, 520, 300], "conf": 0.9},
+        {"name": "metin", "bbox": [10, 10, 60, 60], "conf": 0.6},
+        {"name": "metin", "bbox": [470, 250, 530, 310], "conf": 0.5},
+        {"name": "unknown", "bbox": [490, 270, 510, 290], "conf": 0.99},
+    ]
+
+
+def test_pick_target_prefers_priority_then_centre():
+    tgt = pick_target(_dets(), (1000, 500), priority_order=["boss", "metin"])
+    assert isinstance(tgt, Detection)
+    assert tgt.name == "metin" and tgt["bbox"] == [470, 250, 530, 310]
+    assert pick_target([], (1000, 500)) is None
+    # klasa spoza listy priorytetów ma rangę 0
+    assert rank_table(("boss", "metin", "boss")) == {"boss": 3, "metin": 2}
+
+
+def test_pick_target_accepts_structured_array():
+    dets = _dets()
+    names = {0: "potwory", 1: "metin", 2: "unknown"}
+    arr = np.zeros(len(dets), dtype=DET_DTYPE)
+    arr["bbox"] = [d["bbox"] for d in dets]
+    arr["conf"] = [d["conf"] for d in dets]
+    arr["cls"] = [0, 1, 1, 2]
+    tgt = pick_target(arr, (1000, 500), ["boss", "metin"], names=names)
+    assert (tgt.name, tgt.cls, tgt.bbox) == ("metin", 1, [470.0, 250.0, 530.0, 310.0])
+
+
+def test_detection_behaves_like_a_dict():
+    d = Detection.from_dict({"name": "boss", "bbox": [1, 2, 3, 4], "track_id": 7})
+    assert d["name"] == "boss" and d.get("conf") == 0.0 and d.get("missing", 1) == 1
+    assert {**d} == {
+        "name": "boss",
+        "bbox": [1, 2, 3, 4],
+        "conf": 0.0,
+        "cls": -1,
+        "track_id": 7,
+    }
+    assert not hasattr(d, "__dict__")
+
+
+def test_pick_target_returns_detection_from_list_without_copy():
+    dets = [Detection.from_dict(d) for d in _dets()]
+    tgt = pick_target(dets, (1000, 500), priority_order=["boss", "metin"])
+    assert tgt is dets[2]
+    moved = tgt.shifted(10, 20)
+    assert moved.bbox == [480, 270, 540, 330] and tgt.bbox == [470, 250, 530, 310]
+    assert moved == Detection("metin", (480, 270, 540, 330), 0.5)
@@ -0,0 +1,187 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.modules.pop("numpy", None)
+np = importlib.import_module("numpy")
+
+
+@pytest.fixture
+def tm_mod(monkeypatch):
+    """Prawdziwy ``agent.template_matcher`` z prawdziwym cv2 (inne testy stubują)."""
+    import agent
+
+    old = getattr(agent, "template_matcher", None)
+    monkeypatch.setattr(agent, "template_matcher", old, raising=False)
+    for name in ("cv2", "agent.template_matcher"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    yield importlib.import_module("agent.template_matcher")
+    sys.modules.pop("agent.template_matcher", None)
+
+
+def _write_templates(cv2, tmp_path):
+    rng = np.random.default_rng(0)
+    tpls = {}
+    for name in ("ch1", "wczytaj"):
+        # gruboziarnisty wzór – rozmycie szablonu nie psuje dopasowania
+        img = np.kron(rng.integers(0, 255, (6, 10)), np.ones((4, 4))).astype(np.uint8)
+        cv2.imwrite(str(tmp_path / f"{name}.png"), img)
+        tpls[name] = img
+    return tpls
+
+
+def test_scaled_variants_are_cached(tm_mod, tmp_path, monkeypatch):
+    cv2 = tm_mod.cv2
+    tpls = _write_templates(cv2, tmp_path)
+    frame = np.full((120, 160, 3), 127, dtype=np.uint8)
+    frame[40:64, 50:90] = tpls["ch1"][..., None]
+
+    tm = tm_mod.TemplateMatcher(str(tmp_path))
+    calls = []
+    resize = cv2.resize
+    monkeypatch.setattr(
+        tm_mod.cv2, "resize", lambda *a, **k: calls.append(1) or resize(*a, **k)
+    )
+    for _ in range(3):
+        hit = tm.find(frame, "ch1", multi_scale=True)
+    assert hit is not None and hit["rect"][:2] == (50, 40)
+    # skala 1.0 to szablon bazowy, pozostałe skalowane tylko raz
+    assert len(calls) == 2
+    assert tm.template("ch1", 1.0) is tm.load("ch1")
+    assert tm.template("ch1", 0.9).shape == (21, 36)
+
+
+def test_preload_loads_directory_and_reports_memory(tm_mod, tmp_path):
+    _write_templates(tm_mod.cv2, tmp_path)
+    tm = tm_mod.TemplateMatcher(str(tmp_path), preload=True, scales=(1.0, 0.5))
+    info = tm.cache_info()
+    assert info["templates"] == 2 and info["variants"] == 4
+    # bazowe szablony + warianty 0.5 (wariant 1.0 nie zajmuje dodatkowej pamięci)
+    assert info["bytes"] == 2 * 24 * 40 + 2 * 12 * 20
+    tm.clear_cache()
+    assert tm.cache_info() == {"templates": 0, "variants": 0, "bytes": 0}
+
+
+def test_find_all_one_match_per_instance_sorted_by_y(tm_mod, tmp_path):
+    tpls = _write_templates(tm_mod.cv2, tmp_path)
+    frame = np.full((200, 240, 3), 127, dtype=np.uint8)
+    spots = [(150, 120), (20, 10), (90, 60), (180, 10)]
+    for x, y in spots:
+        frame[y : y + 24, x : x + 40] = tpls["ch1"][..., None]
+    tm = tm_mod.TemplateMatcher(str(tmp_path))
+    # niski próg – dużo pikseli powyżej progu wokół każdego wystąpienia
+    hits = tm.find_all(frame, "ch1", thresh=0.5)
+    assert [h["rect"] for h in hits] == [
+        (20, 10, 40, 24),
+        (180, 10, 40, 24),
+        (90, 60, 40, 24),
+        (150, 120, 40, 24),
+    ]
+    assert all(h["score"] > 0.9 for h in hits)
+    assert hits[0]["center"] == (40, 22)
+    shifted = tm.find_all(frame, "ch1", roi=(10, 0, 230, 200), origin=(5, 5))
+    assert shifted[0]["rect"] == (25, 15, 40, 24)
+
+
+def test_suppress_keeps_best_of_close_peaks(tm_mod):
+    centers = np.array([[0, 0], [5, 0], [30, 0], [33, 4]])
+    scores = np.array([0.8, 0.9, 0.7, 0.95])
+    keep = tm_mod.suppress(centers, scores, 12)
+    assert keep.tolist() == [3, 1]
+
+
+@pytest.mark.parametrize("workers", [0, 3])
+def test_find_many_matches_find(tm_mod, tmp_path, workers):
+    tpls = _write_templates(tm_mod.cv2, tmp_path)
+    frame = np.full((120, 200, 3), 127, dtype=np.uint8)
+    frame[40:64, 50:90] = tpls["ch1"][..., None]
+    frame[80:104, 120:160] = tpls["wczytaj"][..., None]
+    tm = tm_mod.TemplateMatcher(str(tmp_path), workers=workers)
+    roi, origin = (10, 20, 180, 100), (3, 4)
+    hits = tm.find_many(
+        frame, ["wczytaj", "ch1"], roi=roi, multi_scale=True, origin=origin
+    )
+    assert list(hits) == ["wczytaj", "ch1"]
+    for name in ("ch1", "wczytaj"):
+        ref = tm.find(frame, name, roi=roi, multi_scale=True, origin=origin)
+        assert hits[name] == ref
+    assert hits["ch1"]["rect"][:2] == (53, 44)
+    tm.close()
+
+
+def test_pyramid_search_agrees_with_exhaustive(tm_mod, tmp_path):
+    cv2 = tm_mod.cv2
+    tpls = _write_templates(cv2, tmp_path)
+    rng = np.random.default_rng(1)
+    tm = tm_mod.TemplateMatcher(str(tmp_path), pyramid=1)
+    for _ in range(10):
+        noise = rng.integers(0, 255, (240, 320, 3), dtype=np.uint8)
+        frame = cv2.GaussianBlur(noise, (15, 15), 0)
+        tpl = cv2.resize(tpls["wczytaj"], None, fx=1.1, fy=1.1)
+        x, y = rng.integers(0, 320 - tpl.shape[1]), rng.integers(0, 240 - tpl.shape[0])
+        frame[y : y + tpl.shape[0], x : x + tpl.shape[1]] = tpl[..., None]
+        full = tm.find(frame, "wczytaj", multi_scale=True, pyramid=0)
+        coarse = tm.find(frame, "wczytaj", multi_scale=True)
+        assert full is not None and coarse["rect"] == full["rect"]
+        assert coarse["score"] == pytest.approx(full["score"], abs=1e-4)
+    # zgrubne szablony trafiły do pamięci podręcznej
+    assert tm.coarse_template("wczytaj", 1.1, 1).shape == (13, 22)
+
+
+def test_check_template_pyramid_report(tm_mod, tmp_path):
+    tool = importlib.import_module("tools.check_template_pyramid")
+    tpls = _write_templates(tm_mod.cv2, tmp_path)
+    frame = np.full((120, 200, 3), 127, dtype=np.uint8)
+    frame[40:64, 50:90] = tpls["ch1"][..., None]
+    tm = tool.TemplateMatcher(str(tmp_path))
+    res = tool.compare([frame, frame], tm, ["ch1", "wczytaj"], levels=1)
+    assert res["ch1"]["agree"] == 1.0 and res["ch1"]["hits"] == 2
+    assert res["wczytaj"]["hits"] == 0 and res["wczytaj"]["agree"] == 1.0
+
+
+def test_hint_searches_near_last_hit_and_resets_on_region_change(tm_mod, tmp_path):
+    tpls = _write_templates(tm_mod.cv2, tmp_path)
+    frame = np.full((300, 400, 3), 127, dtype=np.uint8)
+    frame[200:224, 300:340] = tpls["ch1"][..., None]
+    tm = tm_mod.TemplateMatcher(str(tmp_path), hints=True)
+    region = (10, 10, 400, 300)
+    first = tm.find(frame, "ch1", multi_scale=True, window_region=region)
+    assert tm.last_hits[("ch1", (400, 300))] == (300, 200, 40, 24)
+    shapes = []
+    best = tm._best
+    tm._best = lambda gray, *a, **k: shapes.append(gray.shape) or best(gray, *a, **k)
+    again = tm.find(frame, "ch1", multi_scale=True, window_region=region)
+    assert again["rect"] == first["rect"]
+    assert tm.hint_stats == {"hits": 1, "misses": 0}
+    assert shapes[0][0] < 60 and shapes[0][1] < 80
+
+    # element przesunięty – chybienie w oknie, pełne ROI i nowe położenie
+    moved = np.full((300, 400, 3), 127, dtype=np.uint8)
+    moved[20:44, 30:70] = tpls["ch1"][..., None]
+    hit = tm.find(moved, "ch1", multi_scale=True, window_region=region)
+    assert hit["rect"] == (30, 20, 40, 24) and tm.hint_stats["misses"] == 1
+    tm.find(moved, "ch1", multi_scale=True, window_region=(0, 0, 400, 300))
+    assert tm.hint_stats["misses"] == 1 and tm.hint_stats["hits"] == 1
+
+
+def test_hint_falls_back_when_score_drops_below_last_accepted(tm_mod, tmp_path):
+    tpls = _write_templates(tm_mod.cv2, tmp_path)
+    region = (0, 0, 400, 300)
+    frame = np.full((300, 400, 3), 127, dtype=np.uint8)
+    frame[200:224, 300:340] = tpls["ch1"][..., None]
+    tm = tm_mod.TemplateMatcher(str(tmp_path), hints=True)
+    first = tm.find(frame, "ch1", window_region=region)
+
+    # przy starym miejscu słabszy, zaszumiony element; właściwy gdzie indziej
+    noise = np.random.default_rng(1).integers(-80, 80, tpls["ch1"].shape)
+    noisy = np.clip(tpls["ch1"] + noise, 0, 255).astype(np.uint8)
+    moved = np.full((300, 400, 3), 127, dtype=np.uint8)
+    moved[202:226, 302:342] = noisy[..., None]
+    moved[20:44, 30:70] = tpls["ch1"][..., None]
+    hit = tm.find(moved, "ch1", window_region=region)
+    assert hit["rect"] == (30, 20, 40, 24)
+    assert hit["score"] == pytest.approx(first["score"], abs=1e-4)
+    assert tm.hint_stats == {"hits": 0, "misses": 1}
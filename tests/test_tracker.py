@@ -0,0 +1,64 @@
+import importlib
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.modules.pop("numpy", None)
+np = importlib.import_module("numpy")
+
+from agent.targets import Detection
+from agent.tracker import Tracker, iou_matrix
+
+
+def _det(x, name="metin", w=20):
+    return {"name": name, "bbox": [x, 10, x + w, 30], "conf": 0.9}
+
+
+def test_ids_stable_and_prediction_extrapolates():
+    tr = Tracker(max_age=1.0)
+    a = tr.update([_det(0), _det(100, "boss")], ts=0.0)
+    b = tr.update([_det(105, "boss"), _det(5)], ts=0.1)
+    ids_a = {d["name"]: d["track_id"] for d in a}
+    ids_b = {d["name"]: d["track_id"] for d in b}
+    assert ids_a == ids_b
+    # 50 px/s w prawo -> po kolejnych 0.2 s ramka przesunięta o 10 px
+    pred = {d["name"]: d for d in tr.predict(ts=0.3)}
+    assert np.allclose(pred["metin"]["bbox"], [15, 10, 35, 30])
+    assert pred["metin"]["track_id"] == ids_a["metin"]
+
+
+def test_step_predicts_on_repeated_detection_list():
+    tr = Tracker()
+    dets = [_det(0)]
+    tr.step(dets, ts=0.0)
+    second = [_det(10)]
+    tr.step(second, ts=0.1)
+    out = tr.step(second, ts=0.2)
+    assert np.allclose(out[0]["bbox"], [20, 10, 40, 30])
+
+
+def test_tracks_expire_and_new_ids_are_assigned():
+    tr = Tracker(max_age=0.5)
+    first = tr.update([_det(0)], ts=0.0)
+    assert tr.predict(ts=1.0) == []
+    again = tr.update([_det(0)], ts=1.0)
+    assert again[0]["track_id"] != first[0]["track_id"]
+    # inna klasa w tym samym miejscu to nowy ślad
+    other = tr.update([_det(0, "boss")], ts=1.1)
+    assert other[0]["track_id"] not in {first[0]["track_id"], again[0]["track_id"]}
+
+
+def test_iou_matrix():
+    a = np.array([[0, 0, 10, 10]], float)
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]], float)
+    assert np.allclose(iou_matrix(a, b), [[1.0, 50 / 150, 0.0]])
+
+
+def test_tracker_emits_detections_and_keeps_input_untouched():
+    tr = Tracker()
+    dets = [Detection("boss", [0, 10, 20, 30], 0.8, cls=2)]
+    out = tr.update(dets, ts=0.0)
+    assert out == [Detection("boss", [0, 10, 20, 30], 0.8, 2, out[0].track_id)]
+    assert out[0].track_id is not None and dets[0].track_id is None
+    pred = tr.predict(ts=0.1)
+    assert isinstance(pred[0], Detection) and pred[0].cls == 2
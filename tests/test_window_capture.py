@@ -42,3 +42,146 @@ def test_context_manager_closes():
     with wc.WindowCapture("foo") as cap:
         assert isinstance(cap.sct, DummySct)
     assert cap.sct.closed
+
+
+class _Shot:
+    def __init__(self, w, h, val):
+        self.width = w
+        self.height = h
+        self._val = val
+
+    def __array__(self, dtype=None, copy=None):
+        import numpy as np
+
+        return np.full((self.height, self.width, 4), self._val, dtype=np.uint8)
+
+
+def test_stream_returns_latest_frame(monkeypatch):
+    import time
+
+    counter = {"n": 0}
+
+    class StreamSct(DummySct):
+        def grab(self, region):
+            counter["n"] += 1
+            return _Shot(region["width"], region["height"], counter["n"] % 256)
+
+    monkeypatch.setattr(wc.mss, "mss", lambda: StreamSct())
+    cap = wc.WindowCapture("foo")
+    cap.region = (0, 0, 4, 3)
+    assert cap.latest() is None
+    cap.start_stream(fps=None, ring_size=3)
+    try:
+        t_end = time.time() + 2
+        while (cap.latest() is None or cap.latest().seq < 5) and time.time() < t_end:
+            time.sleep(0.01)
+        fr = cap.latest(copy=True)
+        assert fr is not None and fr.seq >= 5
+        assert fr.image.shape == (3, 4, 4)
+        assert fr.ts > 0
+        assert cap.grab().shape == (3, 4, 4)
+    finally:
+        cap.close()
+    assert not cap.streaming
+
+
+def test_grab_bgr_view_and_reused_buffer(monkeypatch):
+    import numpy as np
+
+    class BgraSct(DummySct):
+        def grab(self, region):
+            return _Shot(region["width"], region["height"], 7)
+
+    monkeypatch.setattr(wc.mss, "mss", lambda: BgraSct())
+    cap = wc.WindowCapture("foo")
+    cap.region = (0, 0, 5, 2)
+    view = cap.grab_bgr()
+    assert view.shape == (2, 5, 3)
+    buf = np.empty((2, 5, 3), dtype=np.uint8)
+    out = cap.grab_bgr(buf)
+    assert out is buf
+    assert (out == 7).all()
+    # zmiana rozmiaru okna -> nowy bufor
+    cap.region = (0, 0, 3, 3)
+    out2 = cap.grab_bgr(buf)
+    assert out2 is not buf and out2.shape == (3, 3, 3)
+    cap.close()
+
+
+def test_grab_roi_captures_only_rectangle(monkeypatch):
+    import pytest
+
+    regions = []
+
+    class RoiSct(DummySct):
+        def grab(self, region):
+            regions.append(region)
+            return _Shot(region["width"], region["height"], 1)
+
+    monkeypatch.setattr(wc.mss, "mss", lambda: RoiSct())
+    cap = wc.WindowCapture("foo")
+    cap.region = (100, 50, 300, 200)
+    crop = cap.grab_roi((250, 20, 100, 40))
+    # przycięte do prawej krawędzi okna
+    assert regions[-1] == {"left": 350, "top": 70, "width": 50, "height": 40}
+    assert crop.shape == (40, 50, 3)
+    with pytest.raises(ValueError):
+        cap.grab_roi((400, 0, 10, 10))
+    cap.close()
+
+
+def test_stream_grabs_do_not_alias_ring_slots(monkeypatch):
+    import threading
+
+    import numpy as np
+
+    cap = wc.WindowCapture("foo")
+    cap.region = (0, 0, 4, 3)
+    slot = np.full((3, 4, 4), 9, dtype=np.uint8)
+    cap._ring, cap._ring_ts, cap._ring_seq = [slot], [1.0], [1]
+    cap._latest_idx = 0
+    stop = threading.Event()
+    cap._stream_thread = threading.Thread(target=stop.wait)
+    cap._stream_thread.start()
+    try:
+        assert cap.streaming
+        for arr in (cap.grab(), cap.grab_bgr(), cap.grab_roi((1, 1, 2, 2))):
+            assert not np.shares_memory(arr, slot) and (arr == 9).all()
+        assert cap.grab_bgr().shape == (3, 4, 3)
+    finally:
+        stop.set()
+        cap._stream_thread.join()
+    cap.close()
+
+
+def test_stop_stream_keeps_thread_that_did_not_exit():
+    import threading
+
+    cap = wc.WindowCapture("foo")
+    release = threading.Event()
+    t = threading.Thread(target=release.wait)
+    t.start()
+    cap._stream_thread = t
+    cap.stop_stream(timeout=0.01)
+    # wątek nadal działa – referencja zostaje, nowy strumień nie startuje
+    assert cap._stream_thread is t and not cap.streaming
+    cap.start_stream()
+    assert cap._stream_thread is t
+    release.set()
+    t.join()
+    cap.stop_stream()
+    assert cap._stream_thread is None
+    cap.close()
+
+
+def test_apply_stream_cfg_starts_stream_only_when_enabled(monkeypatch):
+    cap = wc.WindowCapture("foo")
+    started = []
+    monkeypatch.setattr(cap, "start_stream", lambda fps=30.0: started.append(fps))
+    assert cap.apply_stream_cfg(None) is False
+    cap.apply_stream_cfg({"stream": False, "stream_fps": 60})
+    assert started == []
+    cap.apply_stream_cfg({"stream": True, "stream_fps": 20})
+    cap.apply_stream_cfg({"stream": True})
+    assert started == [20, 30]
+    cap.close()
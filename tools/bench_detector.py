@@ -0,0 +1,362 @@
+"""Benchmark :class:`agent.detector.ObjectDetector` on recorded frames.
+
+Runs the detector over a folder of frames or a recording (anything
+:class:`recorder.frame_source.ReplaySource` accepts) for every combination
+of backend, input scale, batch size and thread count, and reports latency
+percentiles, throughput, the share of time spent outside the model
+(pre/post-processing) and peak RSS.  Results are written as JSON so they can
+be diffed between commits::
+
+    python -m tools.bench_detector data/recordings/rec_x.mp4 \\
+        --model runs/detect/train/weights/best.onnx --scale 1 0.5 --batch 1 4
+
+``--model stub`` generates a tiny random YOLO-shaped ONNX model, so the
+pipeline overhead can be measured on a CPU-only Linux box without torch or
+trained weights.  Each configuration runs in a fresh process (``--no-isolate``
+disables this), so peak RSS is reported per configuration.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+
+STUB_CLASSES = ("metin", "boss", "potwory")
+
+
+def make_stub_model(
+    path: str | Path,
+    imgsz: int = 640,
+    classes=STUB_CLASSES,
+    seed: int = 0,
+    dynamic: bool = False,
+) -> Path:
+    """Zapisz losowy model ONNX o wyjściu jak YOLOv8 ``(B, 4 + nc, N)``.
+
+    Jedna warstwa konwolucji (stride 8) zamiast sieci – koszt modelu jest
+    pomijalny, a pre/post-processing (letterbox, NMS, filtr klas) działa
+    jak dla prawdziwego eksportu.  ``dynamic=True`` – wejście o dowolnym
+    rozmiarze (jak eksport z ``dynamic=True``), ``imgsz`` tylko w metadanych.
+    """
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+
+    rng = np.random.default_rng(seed)
+    nc = len(classes)
+    w = (rng.standard_normal((4 + nc, 3, 8, 8)) * 0.05).astype(np.float32)
+    inits = [
+        numpy_helper.from_array(w, "W"),
+        numpy_helper.from_array(np.array([0, 4 + nc, -1], dtype=np.int64), "shape"),
+        numpy_helper.from_array(np.array([4, nc], dtype=np.int64), "split"),
+        numpy_helper.from_array(np.array(imgsz / 4, dtype=np.float32), "box_gain"),
+        numpy_helper.from_array(np.array(-1.5, dtype=np.float32), "cls_bias"),
+    ]
+    nodes = [
+        helper.make_node("Conv", ["images", "W"], ["feat"], strides=[8, 8]),
+        helper.make_node("Reshape", ["feat", "shape"], ["flat"]),
+        helper.make_node("Split", ["flat", "split"], ["box_raw", "cls_raw"], axis=1),
+        helper.make_node("Abs", ["box_raw"], ["box_abs"]),
+        helper.make_node("Mul", ["box_abs", "box_gain"], ["box"]),
+        helper.make_node("Add", ["cls_raw", "cls_bias"], ["cls_logit"]),
+        helper.make_node("Sigmoid", ["cls_logit"], ["cls"]),
+        helper.make_node("Concat", ["box", "cls"], ["output0"], axis=1),
+    ]
+    hw = ["height", "width"] if dynamic else [imgsz, imgsz]
+    graph = helper.make_graph(
+        nodes,
+        "stub_yolo",
+        [helper.make_tensor_value_info("images", TensorProto.FLOAT, ["batch", 3, *hw])],
+        [
+            helper.make_tensor_value_info(
+                "output0", TensorProto.FLOAT, ["batch", 4 + nc, "anchors"]
+            )
+        ],
+        inits,
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    names = {i: n for i, n in enumerate(classes)}
+    model.metadata_props.add(key="names", value=str(names))
+    model.metadata_props.add(key="imgsz", value=str([imgsz, imgsz]))
+    path = Path(path)
+    onnx.save(model, str(path))
+    return path
+
+
+def load_frames(source: str, limit: int | None = None) -> list[np.ndarray]:
+    """Klatki z katalogu lub nagrania (kopie, w kolejności odtwarzania)."""
+    from recorder.frame_source import ReplaySource
+
+    frames: list[np.ndarray] = []
+    with ReplaySource(source) as src:
+        while limit is None or len(frames) < limit:
+            try:
+                frames.append(src.grab_bgr().copy())
+            except EOFError:
+                break
+    return frames
+
+
+def peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:  # pragma: no cover - Windows
+        return None
+    # Linux zwraca KiB, macOS bajty
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (2**20 if platform.system() == "Darwin" else 2**10)
+
+
+def _percentiles(ms: list[float]) -> dict:
+    if not ms:
+        return {}
+    t = np.asarray(ms)
+    return {
+        "mean_ms": float(t.mean()),
+        "p50_ms": float(np.percentile(t, 50)),
+        "p95_ms": float(np.percentile(t, 95)),
+        "p99_ms": float(np.percentile(t, 99)),
+    }
+
+
+class _TimedSession:
+    """Mierzy czas ``session.run`` (sam model, bez pre/post-processingu)."""
+
+    def __init__(self, session):
+        self._session = session
+        self.total = 0.0
+
+    def run(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return self._session.run(*args, **kwargs)
+        finally:
+            self.total += time.perf_counter() - t0
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+def run_config(
+    frames: list[np.ndarray],
+    model: str,
+    backend: str = "auto",
+    scale: float = 1.0,
+    batch: int = 1,
+    threads: int | None = None,
+    warmup: int = 3,
+    conf: float = 0.5,
+    classes: list[str] | None = None,
+) -> dict:
+    """Zmierz jedną konfigurację; zwraca słownik wyników (czasy w ms)."""
+    from agent.detector import ObjectDetector, ResolutionController
+
+    if threads and backend != "onnx" and not model.endswith(".onnx"):
+        try:
+            import torch
+
+            torch.set_num_threads(int(threads))
+        except ImportError:
+            pass
+    det = ObjectDetector(
+        model,
+        classes=classes,
+        conf=conf,
+        backend=backend,
+        shared=False,
+        threads=threads,
+        dynamic_resize=scale < 1.0,
+    )
+    # stała skala wejścia zamiast regulacji w trakcie pomiaru
+    det.resolution = ResolutionController(min_scale=scale, max_scale=scale)
+    timed = None
+    if hasattr(det.model, "session"):
+        timed = det.model.session = _TimedSession(det.model.session)
+
+    def _call(chunk):
+        if batch == 1:
+            return [det.infer(chunk[0])]
+        return det.infer_batch(chunk)
+
+    chunks = [frames[i : i + batch] for i in range(0, len(frames), batch)]
+    for chunk in chunks[:warmup]:
+        _call(chunk)
+    if timed is not None:
+        timed.total = 0.0
+    per_frame: list[float] = []
+    n_dets = 0
+    start = time.perf_counter()
+    for chunk in chunks:
+        t0 = time.perf_counter()
+        out = _call(chunk)
+        dt = (time.perf_counter() - t0) * 1000 / len(chunk)
+        per_frame.extend([dt] * len(chunk))
+        n_dets += sum(len(d) for d in out)
+    total = time.perf_counter() - start
+    res = {
+        "backend": det.backend,
+        "model": str(model),
+        "scale": scale,
+        "batch": batch,
+        "threads": threads,
+        "frames": len(frames),
+        "frame_size": list(frames[0].shape[:2]) if frames else None,
+        # skala faktycznie użyta (1.0, gdy model ma stałe wejście)
+        "input_scale": det.scale,
+        "dynamic_input": det.dynamic_input,
+        "fps": len(frames) / total if total > 0 else None,
+        "dets_per_frame": n_dets / max(1, len(frames)),
+    }
+    res.update(_percentiles(per_frame))
+    if timed is not None and frames:
+        model_ms = timed.total * 1000 / len(frames)
+        res["model_ms"] = model_ms
+        res["overhead_ms"] = res["mean_ms"] - model_ms
+    res["peak_rss_mb"] = peak_rss_mb()
+    return res
+
+
+def _run_isolated(source: str, limit: int | None, kwargs: dict) -> dict:
+    return run_config(load_frames(source, limit), **kwargs)
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        )
+        return out.stdout.strip()
+    except Exception:
+        return None
+
+
+def run(
+    source: str,
+    model: str,
+    backends=("auto",),
+    scales=(1.0,),
+    batches=(1,),
+    threads=(None,),
+    limit: int | None = 100,
+    warmup: int = 3,
+    conf: float = 0.5,
+    isolate: bool = True,
+) -> dict:
+    """Wszystkie kombinacje parametrów; wynik gotowy do zapisu jako JSON."""
+    frames = None if isolate else load_frames(source, limit)
+    results = []
+    for backend, scale, batch, th in itertools.product(
+        backends, scales, batches, threads
+    ):
+        kwargs = dict(
+            model=model,
+            backend=backend,
+            scale=scale,
+            batch=batch,
+            threads=th,
+            warmup=warmup,
+            conf=conf,
+        )
+        try:
+            if isolate:
+                ctx = get_context("spawn")
+                with ProcessPoolExecutor(1, mp_context=ctx) as ex:
+                    r = ex.submit(_run_isolated, source, limit, kwargs).result()
+            else:
+                r = run_config(frames, **kwargs)
+        except Exception as exc:
+            logging.error("Konfiguracja %s nieudana: %s", kwargs, exc)
+            r = {**kwargs, "error": str(exc)}
+        results.append(r)
+        if "error" not in r:
+            logging.info(
+                "%-11s scale=%.2f batch=%d threads=%s: p50 %.1f ms, p95 %.1f ms, "
+                "p99 %.1f ms, %.1f FPS, RSS %.0f MB",
+                r["backend"],
+                scale,
+                batch,
+                th,
+                r["p50_ms"],
+                r["p95_ms"],
+                r["p99_ms"],
+                r["fps"],
+                r["peak_rss_mb"] or 0,
+            )
+    return {
+        "meta": {
+            "source": str(source),
+            "commit": _git_commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Benchmark ObjectDetector na klatkach")
+    ap.add_argument("source", help="Katalog klatek, nagranie .mp4 lub .jsonl")
+    ap.add_argument(
+        "--model",
+        default="stub",
+        help="Wagi .pt/.onnx albo 'stub' (losowy model ONNX, tylko CPU)",
+    )
+    ap.add_argument("--imgsz", type=int, default=640, help="Wejście modelu 'stub'")
+    ap.add_argument(
+        "--dynamic", action="store_true", help="Model 'stub' z dynamicznym wejściem"
+    )
+    ap.add_argument("--backend", nargs="+", default=["auto"])
+    ap.add_argument("--scale", nargs="+", type=float, default=[1.0])
+    ap.add_argument("--batch", nargs="+", type=int, default=[1])
+    ap.add_argument("--threads", nargs="+", type=int, default=[0], help="0 – domyślnie")
+    ap.add_argument("--frames", type=int, default=100, help="Limit klatek")
+    ap.add_argument("--warmup", type=int, default=3)
+    ap.add_argument("--conf", type=float, default=0.5)
+    ap.add_argument("--out", default="bench_detector.json", help="Plik JSON")
+    ap.add_argument(
+        "--no-isolate", action="store_true", help="Wszystko w jednym procesie"
+    )
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model = args.model
+        if model == "stub":
+            path = Path(tmp) / "stub_yolo.onnx"
+            model = str(make_stub_model(path, args.imgsz, dynamic=args.dynamic))
+        report = run(
+            args.source,
+            model,
+            backends=args.backend,
+            scales=args.scale,
+            batches=args.batch,
+            threads=[t or None for t in args.threads],
+            limit=args.frames,
+            warmup=args.warmup,
+            conf=args.conf,
+            isolate=not args.no_isolate,
+        )
+    if args.model == "stub":
+        for r in report["results"]:
+            r["model"] = "stub"
+    Path(args.out).write_text(json.dumps(report, indent=2))
+    logging.info("Wyniki zapisane w %s", args.out)
+
+
+if __name__ == "__main__":
+    main()
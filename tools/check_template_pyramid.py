@@ -0,0 +1,111 @@
+"""Compare coarse-to-fine template search with the exhaustive one.
+
+Runs :meth:`agent.template_matcher.TemplateMatcher.find` on every frame of a
+folder or recording twice – with ``pyramid=0`` (full search) and with the
+requested number of pyramid levels – and reports per template how often both
+agree (same hit or both ``None``) and the mean time of each mode::
+
+    python -m tools.check_template_pyramid data/recordings/rec_x.mp4 \\
+        --names wczytaj strona_I --levels 1 2
+
+Exit status is 1 when agreement of any template drops below ``--min-agree``,
+so the check can guard a ``templates.pyramid`` change.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+
+from agent.template_matcher import TemplateMatcher
+from tools.bench_detector import load_frames
+
+logging.basicConfig(level=logging.INFO)
+
+
+def _same(a, b, tol: int = 1) -> bool:
+    if a is None or b is None:
+        return a is None and b is None
+    return all(abs(p - q) <= tol for p, q in zip(a["rect"], b["rect"]))
+
+
+def compare(
+    frames,
+    tm: TemplateMatcher,
+    names: list[str],
+    levels: int,
+    thresh: float = 0.8,
+    multi_scale: bool = True,
+) -> dict:
+    """Zgodność i czasy ``find`` dla ``pyramid=levels`` względem ``pyramid=0``."""
+    out = {}
+    for name in names:
+        agree = hits = 0
+        t_full = t_pyr = 0.0
+        for f in frames:
+            t0 = time.perf_counter()
+            ref = tm.find(f, name, thresh, multi_scale=multi_scale, pyramid=0)
+            t1 = time.perf_counter()
+            got = tm.find(f, name, thresh, multi_scale=multi_scale, pyramid=levels)
+            t2 = time.perf_counter()
+            t_full += t1 - t0
+            t_pyr += t2 - t1
+            agree += _same(ref, got)
+            hits += ref is not None
+        n = max(1, len(frames))
+        out[name] = {
+            "frames": len(frames),
+            "hits": hits,
+            "agree": agree / n,
+            "full_ms": t_full * 1000 / n,
+            "pyramid_ms": t_pyr * 1000 / n,
+        }
+    return out
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(
+        description="Zgodność wyszukiwania piramidowego z pełnym"
+    )
+    ap.add_argument("source", help="Katalog klatek, nagranie .mp4 lub .jsonl")
+    ap.add_argument("--templates", default="assets/templates")
+    ap.add_argument(
+        "--names", nargs="*", help="Szablony (domyślnie wszystkie z katalogu)"
+    )
+    ap.add_argument("--levels", nargs="+", type=int, default=[1])
+    ap.add_argument("--thresh", type=float, default=0.8)
+    ap.add_argument("--frames", type=int, default=100, help="Limit klatek")
+    ap.add_argument("--min-agree", type=float, default=0.99)
+    ap.add_argument("--out", help="Zapisz raport JSON")
+    args = ap.parse_args(argv)
+
+    frames = load_frames(args.source, args.frames)
+    tm = TemplateMatcher(args.templates)
+    names = args.names or sorted(p.stem for p in Path(args.templates).glob("*.png"))
+    report = {}
+    ok = True
+    for levels in args.levels:
+        res = compare(frames, tm, names, levels, args.thresh)
+        report[str(levels)] = res
+        for name, r in res.items():
+            logging.info(
+                "pyramid=%d %-12s zgodność %.1f%% (%d trafień), %.1f → %.1f ms",
+                levels,
+                name,
+                r["agree"] * 100,
+                r["hits"],
+                r["full_ms"],
+                r["pyramid_ms"],
+            )
+            ok &= r["agree"] >= args.min_agree
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import argparse
+import logging
+
+from ultralytics import YOLO
+
+logging.basicConfig(level=logging.INFO)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(
+        description="Eksport wag YOLO (.pt) do ONNX dla backendu onnxruntime"
+    )
+    ap.add_argument(
+        "--weights",
+        default="runs/detect/train/weights/best.pt",
+        help="Wagi z training/train_yolo.py",
+    )
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--opset", type=int, default=12)
+    ap.add_argument(
+        "--dynamic",
+        action="store_true",
+        help="Dynamiczny batch/rozmiar wejścia (wymagane przez infer_batch)",
+    )
+    ap.add_argument(
+        "--no-simplify", action="store_true", help="Nie upraszczaj grafu (onnxslim)"
+    )
+    args = ap.parse_args()
+
+    try:
+        logging.info("Eksportuję %s do ONNX (imgsz=%d)", args.weights, args.imgsz)
+        y = YOLO(args.weights)
+        out = y.export(
+            format="onnx",
+            imgsz=args.imgsz,
+            opset=args.opset,
+            simplify=not args.no_simplify,
+            dynamic=args.dynamic,
+            nms=False,
+        )
+        logging.info("Zapisano model ONNX: %s", out)
+    except Exception as exc:
+        logging.error("Błąd podczas eksportu ONNX: %s", exc)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from agent.detector import OnnxYOLO
+
+logging.basicConfig(level=logging.INFO)
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+def dataset_images(data_yaml: str, split: str = "val") -> list[Path]:
+    """Obrazy z podziału ``split`` zbioru opisanego w ``data.yaml`` (Ultralytics)."""
+    import yaml
+
+    data_yaml = Path(data_yaml)
+    with open(data_yaml, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+    root = Path(data.get("path") or data_yaml.parent)
+    if not root.is_absolute():
+        root = data_yaml.parent / root
+    entries = data.get(split) or data.get("train") or []
+    if isinstance(entries, str):
+        entries = [entries]
+    images: list[Path] = []
+    for e in entries:
+        p = Path(e) if Path(e).is_absolute() else root / e
+        if p.is_dir():
+            images += sorted(q for q in p.rglob("*") if q.suffix.lower() in IMAGE_EXTS)
+        elif p.suffix == ".txt" and p.exists():
+            # ścieżki względne w pliku listy liczone od katalogu zbioru
+            lines = (line.strip() for line in p.read_text().splitlines())
+            images += [root / q for q in lines if q]
+    return images
+
+
+def folder_images(folder: str) -> list[Path]:
+    return sorted(p for p in Path(folder).rglob("*") if p.suffix.lower() in IMAGE_EXTS)
+
+
+class YoloCalibrationReader:
+    """Podaje kalibratorowi onnxruntime klatki z preprocessingiem jak w agencie."""
+
+    def __init__(self, model: OnnxYOLO, images: list[Path]):
+        self.model = model
+        self._it = iter(images)
+
+    def get_next(self):
+        for p in self._it:
+            img = cv2.imread(str(p), cv2.IMREAD_COLOR)
+            if img is None:
+                continue
+            blob, _, _ = self.model.preprocess(img)
+            return {self.model.input_name: blob}
+        return None
+
+    def rewind(self) -> None:  # pragma: no cover - wymagane przez API
+        pass
+
+
+def export_fp32(weights: str, imgsz: int, opset: int) -> Path:
+    from ultralytics import YOLO
+
+    logging.info("Eksportuję %s do ONNX fp32 (imgsz=%d)", weights, imgsz)
+    out = YOLO(weights).export(
+        format="onnx", imgsz=imgsz, opset=opset, simplify=True, nms=False
+    )
+    return Path(out)
+
+
+def quantize(
+    fp32: Path,
+    out: Path,
+    images: list[Path],
+    per_channel: bool = True,
+    exclude: list[str] | None = None,
+) -> Path:
+    """Kwantyzacja statyczna INT8 (QDQ) z kalibracją na ``images``."""
+    import onnx
+    from onnxruntime.quantization import (
+        CalibrationMethod,
+        QuantFormat,
+        QuantType,
+        quantize_static,
+    )
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    src = onnx.load(str(fp32))
+    nodes = [
+        n.name for n in src.graph.node if any(pat in n.name for pat in exclude or [])
+    ]
+    if nodes:
+        logging.info("Bez kwantyzacji: %d węzłów (%s…)", len(nodes), nodes[0])
+    prep = out.with_name(out.stem + "_prep.onnx")
+    try:
+        quant_pre_process(str(fp32), str(prep), skip_symbolic_shape=True)
+    except Exception as exc:
+        logging.warning("Pominięto preprocessing grafu: %s", exc)
+        prep = fp32
+    quantize_static(
+        str(prep),
+        str(out),
+        YoloCalibrationReader(OnnxYOLO(str(fp32)), images),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=per_channel,
+        calibrate_method=CalibrationMethod.MinMax,
+        nodes_to_exclude=nodes,
+    )
+    if prep != fp32:
+        prep.unlink(missing_ok=True)
+    # nazwy klas i imgsz z eksportu Ultralytics – czyta je OnnxYOLO
+    q = onnx.load(str(out))
+    have = {p.key for p in q.metadata_props}
+    for p in src.metadata_props:
+        if p.key not in have:
+            q.metadata_props.add(key=p.key, value=p.value)
+    onnx.save(q, str(out))
+    return out
+
+
+def latency(model_path: Path, images: list[Path], warmup: int = 3) -> dict:
+    """Czas ``OnnxYOLO.predict`` na klatkę (z pre- i postprocessingiem)."""
+    model = OnnxYOLO(str(model_path))
+    frames = [f for f in (cv2.imread(str(p)) for p in images) if f is not None]
+    if not frames:
+        return {}
+    for f in frames[:warmup]:
+        model.predict(f)
+    times = []
+    for f in frames:
+        t0 = time.perf_counter()
+        model.predict(f)
+        times.append((time.perf_counter() - t0) * 1000)
+    t = np.asarray(times)
+    return {
+        "mean_ms": float(t.mean()),
+        "p50_ms": float(np.percentile(t, 50)),
+        "p95_ms": float(np.percentile(t, 95)),
+        "fps": float(1000 / t.mean()),
+    }
+
+
+def accuracy(model_path: Path, data: str, imgsz: int) -> dict:
+    """mAP z walidacji Ultralytics na modelu ONNX."""
+    from ultralytics import YOLO
+
+    m = YOLO(str(model_path), task="detect").val(
+        data=data, imgsz=imgsz, batch=1, device="cpu", verbose=False, plots=False
+    )
+    return {"map50": float(m.box.map50), "map50_95": float(m.box.map)}
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(
+        description="Kwantyzacja INT8 modelu YOLO (ONNX) i raport mAP/latencji"
+    )
+    ap.add_argument(
+        "--weights",
+        default="runs/detect/train/weights/best.pt",
+        help="Wagi .pt (zostaną wyeksportowane) lub gotowy model .onnx fp32",
+    )
+    ap.add_argument("--data", help="data.yaml – kalibracja i mAP")
+    ap.add_argument("--images", help="Katalog klatek do kalibracji (zamiast --data)")
+    ap.add_argument("--calib", type=int, default=200, help="Liczba klatek kalibracji")
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--opset", type=int, default=13)
+    ap.add_argument("--out", help="Plik wyjściowy (domyślnie <wagi>_int8.onnx)")
+    ap.add_argument(
+        "--exclude",
+        nargs="*",
+        default=[],
+        help="Fragmenty nazw węzłów pozostawionych w fp32 (np. /model.22/dfl)",
+    )
+    ap.add_argument("--per-tensor", action="store_true", help="Wagi per-tensor")
+    ap.add_argument("--bench", type=int, default=50, help="Klatki do pomiaru czasu")
+    ap.add_argument("--report", help="Zapisz raport JSON")
+    args = ap.parse_args(argv)
+
+    if not args.data and not args.images:
+        ap.error("podaj --data lub --images")
+    try:
+        weights = Path(args.weights)
+        fp32 = weights if weights.suffix == ".onnx" else None
+        if fp32 is None:
+            fp32 = export_fp32(str(weights), args.imgsz, args.opset)
+        out = Path(args.out) if args.out else fp32.with_name(fp32.stem + "_int8.onnx")
+        if args.images:
+            images = folder_images(args.images)
+        else:
+            images = dataset_images(args.data, "train")
+        if not images:
+            raise FileNotFoundError("Brak obrazów do kalibracji")
+        rng = np.random.default_rng(0)
+        calib = [images[i] for i in rng.permutation(len(images))[: args.calib]]
+        logging.info("Kalibracja INT8 na %d klatkach", len(calib))
+        quantize(fp32, out, calib, not args.per_tensor, args.exclude)
+        logging.info("Zapisano model INT8: %s", out)
+
+        # czas mierzony na walidacji (jeśli jest), inaczej na klatkach kalibracji
+        val = dataset_images(args.data, "val") if args.data else []
+        bench = (val or calib)[: args.bench]
+        report = {}
+        for name, path in (("fp32", fp32), ("int8", out)):
+            row = {"model": str(path), "size_mb": path.stat().st_size / 2**20}
+            row.update(latency(path, bench))
+            if args.data:
+                try:
+                    row.update(accuracy(path, args.data, args.imgsz))
+                except Exception as exc:
+                    logging.warning("mAP dla %s niedostępne: %s", name, exc)
+            report[name] = row
+        for name, row in report.items():
+            logging.info(
+                "%s: %.1f MB, %.1f ms/klatkę (p95 %.1f), mAP50 %s, mAP50-95 %s",
+                name,
+                row["size_mb"],
+                row.get("mean_ms", float("nan")),
+                row.get("p95_ms", float("nan")),
+                f"{row['map50']:.3f}" if "map50" in row else "-",
+                f"{row['map50_95']:.3f}" if "map50_95" in row else "-",
+            )
+        if args.report:
+            Path(args.report).write_text(json.dumps(report, indent=2))
+            logging.info("Raport zapisany w %s", args.report)
+    except (OSError, ImportError, ValueError) as exc:
+        logging.error("Błąd podczas kwantyzacji: %s", exc)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())